@@ -1,28 +1,46 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import base64
 import numpy as np
-import cv2
 import torch
 import os
+import hmac
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from io import BytesIO
 from PIL import Image
 from typing import Optional, Tuple, Any, Dict
 
 # Import inference utilities
 from inference_utils import (
-    infer_single_image,
-    infer_images_sorted_by_score,
-    body_yolo_model,
-    face_yolo_model,
-    beauty_scorer_model,
+    ImageContext,
+    DecompressionBombError,
+    detect_image_contexts,
+    score_scorer_samples,
+    infer_images_batched,
+    create_annotated_image,
+    SCORE_WEIGHTS,
     image_transform,
     mask_transform,
     device
 )
+from model_runtime import ModelRuntime
+from batching import MicroBatcher
+from preprocessing import BatchBuffers
+from result_cache import ResultCache, PersistentResultStore, compute_model_fingerprint
+from instrumentation import (
+    stage,
+    add_stage_hook,
+    begin_request_timings,
+    end_request_timings,
+    enable_request_timings
+)
+import metrics
+from profiling import ProfilerCapture
+from memory import MemoryAccounting, RssWatchdog, TracemallocDumps
 
 app = Flask(__name__)
-CORS(app)
+# Let browser code read the per-request Server-Timing header cross-origin
+CORS(app, expose_headers=['Server-Timing'])
 
 # Model paths configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -32,44 +50,389 @@ MODEL_PATHS = {
     'scorer_model': os.path.join(BASE_DIR, 'models/scorer/best_camel_beauty_all_data_model.pth')
 }
 
-# Temporary upload directory
-UPLOAD_FOLDER = '/tmp/camel_uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Load the models on a background thread at startup (the port opens right away;
+# /health/ready reports when they are loaded). Otherwise they load on first use.
+EAGER_MODEL_LOAD = os.environ.get('CAMEL_EAGER_MODEL_LOAD', '1') == '1'
+MODEL_WARMUP = os.environ.get('CAMEL_MODEL_WARMUP', '1') == '1'
+# 1: construct the scorer ViTs via from_pretrained (needs network / HF cache)
+# instead of the bundled config; the checkpoint overwrites those weights anyway
+SCORER_PRETRAINED_BACKBONE = os.environ.get('CAMEL_SCORER_PRETRAINED_BACKBONE', '0') == '1'
+# Check model files against their .sha256 sidecars (when present) before loading
+VERIFY_CHECKSUMS = os.environ.get('CAMEL_VERIFY_CHECKSUMS', '1') == '1'
+# fp32 | int8 (dynamic INT8 quantization, CPU only; cached next to the checkpoint
+# or in CAMEL_QUANTIZED_CACHE_DIR) | bf16 (bfloat16 autocast)
+SCORER_PRECISION = os.environ.get('CAMEL_SCORER_PRECISION', 'fp32')
+QUANTIZED_CACHE_DIR = os.environ.get('CAMEL_QUANTIZED_CACHE_DIR') or None
+# Half precision YOLO (CUDA only)
+YOLO_HALF = os.environ.get('CAMEL_YOLO_HALF', '0') == '1'
+# Reduced-precision modes are refused (fp32 is used) when, against fp32, any
+# total_score_0_100 moves by more than this or too many categories flip.
+# Set CAMEL_PRECISION_MAX_TOTAL_DRIFT to an empty string to skip the check.
+PRECISION_MAX_TOTAL_DRIFT = os.environ.get('CAMEL_PRECISION_MAX_TOTAL_DRIFT', '2.0')
+PRECISION_MAX_CATEGORY_FLIP_RATE = float(os.environ.get('CAMEL_PRECISION_MAX_CATEGORY_FLIP_RATE', '0'))
+# Camel images to run that comparison on (synthetic inputs otherwise)
+PRECISION_REFERENCE_DIR = os.environ.get('CAMEL_PRECISION_REFERENCE_DIR', '')
+
+# torch | onnxruntime (CPU, fp32; exported next to the checkpoint, named after
+# its SHA-256, if missing)
+SCORER_BACKEND = os.environ.get('CAMEL_SCORER_BACKEND', 'torch')
+ONNX_MODEL_PATH = os.environ.get('CAMEL_ONNX_MODEL_PATH') or None
+ORT_INTRA_OP_THREADS = int(os.environ.get('CAMEL_ORT_INTRA_OP_THREADS', '0'))
+ORT_INTER_OP_THREADS = int(os.environ.get('CAMEL_ORT_INTER_OP_THREADS', '0'))
+# ultralytics | onnxruntime (body/face YOLO exported to best.<sha256>.onnx next
+# to best.pt)
+YOLO_BACKEND = os.environ.get('CAMEL_YOLO_BACKEND', 'ultralytics')
+# '' (eager) | compile (torch.compile) | torchscript: fixed batch-size buckets
+# 1/2/4/8/16 compiled at startup, eager fallback on failure
+SCORER_COMPILE = os.environ.get('CAMEL_SCORER_COMPILE', '')
+
+# Max number of crops per CamelBeautyScorer forward in the batch endpoint
+SCORER_MAX_BATCH_SIZE = int(os.environ.get('CAMEL_SCORER_MAX_BATCH_SIZE', '16'))
+# Max number of images / body crops per YOLO predict call in the batch endpoint
+DETECTION_BATCH_SIZE = int(os.environ.get('CAMEL_DETECTION_BATCH_SIZE', '8'))
+
+# Opt-in: decode uploads to at most this many px on the longer side using the
+# decoder's reduced-size modes (0, the default: native resolution). When set,
+# boxes and annotations are in decoded coordinates; responses report the
+# scale ('decode')
+DECODE_MAX_SIDE = int(os.environ.get('CAMEL_DECODE_MAX_SIDE', '0')) or None
+# Uploads whose header declares more pixels are rejected before decoding
+DECODE_MAX_PIXELS = int(float(os.environ.get('CAMEL_DECODE_MAX_PIXELS', '150e6')))
+
+# Dynamic batching of concurrent /detect/single requests into one scorer forward
+DYNAMIC_BATCHING = os.environ.get('CAMEL_DYNAMIC_BATCHING', '1') == '1'
+BATCH_WINDOW_MS = float(os.environ.get('CAMEL_BATCH_WINDOW_MS', '15'))
+BATCH_MAX_SIZE = int(os.environ.get('CAMEL_BATCH_MAX_SIZE', '8'))
+
+# Content-addressed result cache (SHA-256 of the upload + model fingerprint)
+RESULT_CACHE = os.environ.get('CAMEL_RESULT_CACHE', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.environ.get('CAMEL_CACHE_MAX_ENTRIES', '1024'))
+CACHE_TTL_SECONDS = float(os.environ.get('CAMEL_CACHE_TTL_SECONDS', '3600'))
+# Optional persistent store under this directory (survives restarts)
+RESULT_STORE_DIR = os.environ.get('CAMEL_RESULT_STORE_DIR', '')
+RESULT_STORE_MAX_MB = float(os.environ.get('CAMEL_RESULT_STORE_MAX_MB', '512'))
+# Longest a request waits for an identical upload another request is computing;
+# past it the image fails (batch) or the request gets a 503 (single)
+CACHE_WAIT_TIMEOUT_S = float(os.environ.get('CAMEL_CACHE_WAIT_TIMEOUT_S', '120'))
+
+# Prometheus metrics on /metrics (per-stage histograms, request counters, RSS)
+METRICS_ENABLED = os.environ.get('CAMEL_METRICS', '1') == '1'
+
+# Per-request timing breakdown (response 'timings' + Server-Timing header),
+# for requests sending this header or ?timings=1
+TIMINGS_HEADER = 'X-Camel-Timings'
+TIMED_ENDPOINTS = ('detect_single', 'detect_batch')
+
+# Admin endpoints (/api/v1/admin/*) need this value in the X-Admin-Token
+# header; they are disabled while it is unset
+ADMIN_TOKEN = os.environ.get('CAMEL_ADMIN_TOKEN', '')
+# torch.profiler captures armed through /api/v1/admin/profile: gzipped Chrome
+# traces, oldest deleted beyond PROFILE_MAX_MB
+PROFILE_DIR = os.environ.get('CAMEL_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_MAX_MB = float(os.environ.get('CAMEL_PROFILE_MAX_MB', '512'))
+PROFILE_WITH_STACK = os.environ.get('CAMEL_PROFILE_WITH_STACK', '0') == '1'
+
+# Opt-in: RSS (and CUDA allocator) deltas per stage and detection request.
+# Off by default, like the timing breakdown: it samples /proc around every stage
+MEMORY_ACCOUNTING = os.environ.get('CAMEL_MEMORY_ACCOUNTING', '0') == '1'
+# Watchdog flagging sustained RSS growth across requests (interval 0 = off)
+MEMORY_WATCHDOG_INTERVAL_S = float(os.environ.get('CAMEL_MEMORY_WATCHDOG_INTERVAL_S', '30'))
+MEMORY_WATCHDOG_WINDOW = int(os.environ.get('CAMEL_MEMORY_WATCHDOG_WINDOW', '10'))
+MEMORY_WATCHDOG_MIN_GROWTH_MB = float(os.environ.get('CAMEL_MEMORY_WATCHDOG_MIN_GROWTH_MB', '64'))
+
+
+class InvalidImageError(ValueError):
+    """Raised when an upload cannot be decoded as an image"""
+
+
+runtime = ModelRuntime(
+    body_model_path=MODEL_PATHS['body_model'],
+    face_model_path=MODEL_PATHS['face_model'],
+    scorer_checkpoint_path=MODEL_PATHS['scorer_model'],
+    device=device,
+    warmup=MODEL_WARMUP,
+    pretrained_backbone=SCORER_PRETRAINED_BACKBONE,
+    verify_checksums=VERIFY_CHECKSUMS,
+    scorer_precision=SCORER_PRECISION,
+    quantized_cache_dir=QUANTIZED_CACHE_DIR,
+    yolo_half=YOLO_HALF,
+    max_total_drift=float(PRECISION_MAX_TOTAL_DRIFT) if PRECISION_MAX_TOTAL_DRIFT else None,
+    max_category_flip_rate=PRECISION_MAX_CATEGORY_FLIP_RATE,
+    precision_reference_images=sorted(
+        os.path.join(PRECISION_REFERENCE_DIR, name) for name in os.listdir(PRECISION_REFERENCE_DIR)
+    ) if PRECISION_REFERENCE_DIR else None,
+    scorer_backend=SCORER_BACKEND,
+    onnx_path=ONNX_MODEL_PATH,
+    ort_intra_op_threads=ORT_INTRA_OP_THREADS,
+    ort_inter_op_threads=ORT_INTER_OP_THREADS,
+    yolo_backend=YOLO_BACKEND,
+    scorer_compile=SCORER_COMPILE
+)
+
+
+def score_samples(samples, buffers=None):
+    """Score a list of scorer samples in one (or a few) CamelBeautyScorer forwards"""
+    return score_scorer_samples(
+        samples, runtime.beauty_scorer_model,
+        device=device, max_batch_size=SCORER_MAX_BATCH_SIZE, buffers=buffers
+    )
+
+
+# The batcher's single worker thread reuses one set of preallocated input tensors
+batcher_buffers = BatchBuffers(BATCH_MAX_SIZE, device=device) if DYNAMIC_BATCHING else None
+
+scoring_batcher = MicroBatcher(
+    lambda samples: score_samples(samples, buffers=batcher_buffers),
+    max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS
+) if DYNAMIC_BATCHING else None
+
+def model_fingerprint():
+    """Result-cache fingerprint of the model files and settings actually served (loads the models)"""
+    served = runtime.served_artifacts()
+    extra = {name: value for name, value in served.items() if name != 'files'}
+    extra['decode_max_side'] = DECODE_MAX_SIDE
+    return compute_model_fingerprint(served['files'], SCORE_WEIGHTS, extra=extra)
+
+
+result_cache = None
+if RESULT_CACHE:
+    result_store = None
+    if RESULT_STORE_DIR:
+        result_store = PersistentResultStore(
+            RESULT_STORE_DIR, max_bytes=int(RESULT_STORE_MAX_MB * 1024 * 1024)
+        )
+
+    # The fingerprint hashes the served model files, so it is resolved once the
+    # models are loaded (after the background load, or on first use); the store
+    # then drops older models' results and the cache warms up from it
+    result_cache = ResultCache(
+        model_fingerprint,
+        max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+        store=result_store, wait_timeout_s=CACHE_WAIT_TIMEOUT_S
+    )
+
+if EAGER_MODEL_LOAD:
+    runtime.start_background_load(on_loaded=result_cache.prepare if result_cache is not None else None)
 
-def image_to_base64(image_array):
-    """Convert numpy array to base64 string"""
-    _, buffer = cv2.imencode('.png', image_array)
-    return base64.b64encode(buffer).decode('utf-8')
+if METRICS_ENABLED:
+    metrics.enable_stage_metrics()
 
-def create_annotated_image(image_path, body_bbox, face_bbox=None):
-    """Create annotated image with bounding boxes"""
-    image = cv2.imread(image_path)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
 
-    if body_bbox:
-        x1, y1, x2, y2 = body_bbox
-        cv2.rectangle(image_rgb, (x1, y1), (x2, y2), (0, 255, 0), 3)
-        cv2.putText(image_rgb, "Body", (x1, y1 - 10),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    @app.after_request
+    def record_request_metrics(response):
+        endpoint = request.endpoint or 'unknown'
+        metrics.REQUESTS.inc(endpoint=endpoint, outcome=metrics.request_outcome(response.status_code))
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, endpoint=endpoint)
+        return response
 
-    if face_bbox:
-        x1, y1, x2, y2 = face_bbox
-        cv2.rectangle(image_rgb, (x1, y1), (x2, y2), (255, 0, 0), 3)
-        cv2.putText(image_rgb, "Face", (x1, y1 - 10),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+    @app.teardown_request
+    def end_request_metrics(exc):
+        metrics.IN_FLIGHT.dec()
 
-    return image_to_base64(cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR))
+
+enable_request_timings()
+
+profiler_capture = ProfilerCapture(
+    PROFILE_DIR, max_bytes=int(PROFILE_MAX_MB * 1024 * 1024), with_stack=PROFILE_WITH_STACK
+)
+
+
+@app.before_request
+def start_request_profile():
+    if profiler_capture.armed and request.endpoint in TIMED_ENDPOINTS:
+        profiler = profiler_capture.begin()
+        if profiler is not None:
+            g.profiler = profiler
+
+
+@app.teardown_request
+def finish_request_profile(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        path = profiler_capture.finish(profiler, request.endpoint)
+        if path is not None:
+            print(f"Wrote profile trace {path}")
+
+
+memory_accounting = None
+if MEMORY_ACCOUNTING:
+    memory_accounting = MemoryAccounting(device)
+    add_stage_hook(memory_accounting.stage_hook)
+
+    @app.before_request
+    def start_request_memory():
+        if request.endpoint in TIMED_ENDPOINTS:
+            g.memory_begin = memory_accounting.begin_request()
+
+    @app.teardown_request
+    def end_request_memory(exc):
+        begin = g.pop('memory_begin', None)
+        if begin is not None:
+            memory_accounting.end_request(begin, request.endpoint)
+
+memory_watchdog = None
+if MEMORY_WATCHDOG_INTERVAL_S > 0:
+    memory_watchdog = RssWatchdog(
+        interval_s=MEMORY_WATCHDOG_INTERVAL_S,
+        window=MEMORY_WATCHDOG_WINDOW,
+        min_growth_mb=MEMORY_WATCHDOG_MIN_GROWTH_MB
+    ).start()
+
+    @app.teardown_request
+    def count_request_for_watchdog(exc):
+        if request.endpoint in TIMED_ENDPOINTS:
+            memory_watchdog.request_finished()
+
+tracemalloc_dumps = TracemallocDumps()
+
+
+@app.before_request
+def start_request_timings():
+    if request.endpoint in TIMED_ENDPOINTS and (
+            request.headers.get(TIMINGS_HEADER) == '1' or request.args.get('timings') == '1'):
+        g.request_timings, g.request_timings_token = begin_request_timings()
+
+
+@app.after_request
+def add_server_timing(response):
+    timings = g.get('request_timings')
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+
+@app.teardown_request
+def stop_request_timings(exc):
+    token = g.pop('request_timings_token', None)
+    if token is not None:
+        end_request_timings(token)
+
+
+def run_single_pipeline(ctx):
+    """Detection + scoring for one decoded image; returns (body_bbox, result)"""
+    # Run detection + cropping in the request thread
+    detect_image_contexts([ctx], runtime.body_yolo_model, runtime.face_yolo_model)
+    if METRICS_ENABLED:
+        metrics.record_detection(ctx.body is not None, ctx.face is not None)
+    sample = ctx.scorer_sample(image_transform, mask_transform)
+    if sample is None:
+        return None, None
+
+    # Score, sharing one forward with concurrent requests when batching is on
+    # (a profiled request scores in its own thread, where the profiler runs)
+    if scoring_batcher is not None and g.get('profiler') is None:
+        result = scoring_batcher.score(sample)
+    else:
+        result = score_samples([sample])[0]
+    return ctx.body_bbox, result
 
 @app.route('/health', methods=['GET'])
 def health():
-    """Health check endpoint"""
+    """Liveness check (200 as soon as the server is up) plus model readiness"""
+    status = runtime.status()
     return jsonify({
         'status': 'ok',
         'service': 'CamelBeauty ML API',
         'device': str(device),
-        'models_loaded': True
+        'live': True,
+        'ready': status['ready'],
+        'models_loaded': status['ready'],
+        'runtime': status
+    }), 200
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness check: 503 until every model is loaded and warmed up"""
+    status = runtime.status()
+    return jsonify({
+        'ready': status['ready'],
+        'runtime': status
+    }), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics in the text exposition format"""
+    if not METRICS_ENABLED:
+        return jsonify({'success': False, 'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def check_admin_token():
+    """Error response for a request without the admin token, None when it may proceed"""
+    if not ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Admin endpoints are disabled'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    return None
+
+@app.route('/api/v1/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """Arm (POST), inspect (GET) or disarm (DELETE) torch.profiler capture of detection requests"""
+    denied = check_admin_token()
+    if denied is not None:
+        return denied
+
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            status = profiler_capture.arm(
+                requests=body.get('requests', 0),
+                sample_rate=body.get('sample_rate', 0.0),
+                duration_s=body.get('duration_s')
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    elif request.method == 'DELETE':
+        status = profiler_capture.disarm()
+    else:
+        status = profiler_capture.status()
+
+    return jsonify({'success': True, 'profiler': status}), 200
+
+@app.route('/api/v1/admin/memory', methods=['GET'])
+def admin_memory():
+    """RSS / CUDA accounting per stage and recent request, watchdog and tracemalloc status"""
+    denied = check_admin_token()
+    if denied is not None:
+        return denied
+    return jsonify({
+        'success': True,
+        'accounting': memory_accounting.stats() if memory_accounting is not None else None,
+        'watchdog': memory_watchdog.status() if memory_watchdog is not None else None,
+        'tracemalloc': tracemalloc_dumps.status()
     }), 200
 
+@app.route('/api/v1/admin/memory/tracemalloc', methods=['POST'])
+def admin_tracemalloc():
+    """Start, dump (top allocation sites + change since the last dump) or stop tracemalloc"""
+    denied = check_admin_token()
+    if denied is not None:
+        return denied
+
+    body = request.get_json(silent=True) or {}
+    action = body.get('action', 'snapshot')
+    try:
+        if action == 'start':
+            result = tracemalloc_dumps.start(frames=body.get('frames', 10))
+        elif action == 'snapshot':
+            result = tracemalloc_dumps.snapshot(
+                limit=int(body.get('limit', 25)), key_type=body.get('key_type', 'lineno')
+            )
+        elif action == 'stop':
+            result = tracemalloc_dumps.stop()
+        else:
+            return jsonify({'success': False, 'error': f'Unknown action: {action}'}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+
+    return jsonify({'success': True, 'tracemalloc': result}), 200
+
 @app.route('/api/v1/config/models', methods=['GET'])
 def get_model_paths():
     """Get model paths configuration"""
@@ -78,6 +441,24 @@ def get_model_paths():
         'models': MODEL_PATHS
     }), 200
 
+@app.route('/api/v1/stats/batching', methods=['GET'])
+def get_batching_stats():
+    """Dynamic batching queue statistics"""
+    return jsonify({
+        'success': True,
+        'enabled': scoring_batcher is not None,
+        'stats': scoring_batcher.stats() if scoring_batcher is not None else None
+    }), 200
+
+@app.route('/api/v1/stats/cache', methods=['GET'])
+def get_cache_stats():
+    """Result cache statistics"""
+    return jsonify({
+        'success': True,
+        'enabled': result_cache is not None,
+        'stats': result_cache.stats() if result_cache is not None else None
+    }), 200
+
 @app.route('/api/v1/detect/single', methods=['POST'])
 def detect_single():
     """Single image beauty detection"""
@@ -89,30 +470,48 @@ def detect_single():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'Empty filename'}), 400
 
-        # Save uploaded file
-        temp_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(temp_path)
-
-        # Run inference
-        body_bbox, result = infer_single_image(
-            image_path=temp_path,
-            body_yolo_model=body_yolo_model,
-            face_yolo_model=face_yolo_model,
-            beauty_scorer_model=beauty_scorer_model,
-            image_transform=image_transform,
-            mask_transform=mask_transform,
-            device=device
-        )
+        data = file.read()
+        ctx = None
+
+        def compute():
+            nonlocal ctx
+            # Decode the upload once, straight from memory
+            ctx = ImageContext.from_source(data, DECODE_MAX_SIDE, DECODE_MAX_PIXELS)
+            if ctx is None:
+                raise InvalidImageError('Invalid image file')
+            return run_single_pipeline(ctx)
+
+        # Identical uploads (also concurrent ones) are only computed once
+        try:
+            if result_cache is not None:
+                (body_bbox, result), computed_here = result_cache.get_or_compute(
+                    result_cache.key(data), compute
+                )
+                if g.get('request_timings') is not None:
+                    g.request_timings.record_cache(hits=int(not computed_here), misses=int(computed_here))
+            else:
+                body_bbox, result = compute()
+        except InvalidImageError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except DecompressionBombError as e:
+            return jsonify({'success': False, 'error': f'Image too large: {e}'}), 413
+        except FutureTimeoutError:
+            return jsonify({
+                'success': False,
+                'error': 'Timed out waiting for an identical request in progress'
+            }), 503
 
         if body_bbox is None or result is None:
-            os.remove(temp_path)
             return jsonify({
                 'success': False,
                 'error': 'No camel body detected in the image'
             }), 400
 
-        # Create annotated image
-        image_b64 = create_annotated_image(temp_path, body_bbox, None)
+        # Create annotated image (cache hits still need the pixels for drawing)
+        if ctx is None:
+            ctx = ImageContext.from_source(data, DECODE_MAX_SIDE, DECODE_MAX_PIXELS)
+        decode_info = ctx.decode_info
+        image_b64 = create_annotated_image(ctx, body_bbox, None)
 
         # Prepare response
         response = {
@@ -120,11 +519,12 @@ def detect_single():
             'body_bbox': list(body_bbox),
             'face_bbox': None,
             'results': result,
-            'image_base64': image_b64
+            'image_base64': image_b64,
+            'decode': decode_info
         }
+        if g.get('request_timings') is not None:
+            response['timings'] = g.request_timings.as_dict()
 
-        # Cleanup
-        os.remove(temp_path)
         return jsonify(response), 200
 
     except Exception as e:
@@ -144,64 +544,148 @@ def detect_batch():
         if len(files) == 0:
             return jsonify({'success': False, 'error': 'No images in request'}), 400
 
-        temp_paths = []
+        # Keep the encoded uploads in memory; they are decoded chunk by chunk
+        uploads = [file.read() for file in files if file.filename != '']
 
-        # Save all uploaded files
-        for idx, file in enumerate(files):
-            if file.filename == '':
-                continue
-            temp_path = os.path.join(UPLOAD_FOLDER, f'batch_{idx}_{file.filename}')
-            file.save(temp_path)
-            temp_paths.append(temp_path)
-
-        if len(temp_paths) == 0:
+        if len(uploads) == 0:
             return jsonify({'success': False, 'error': 'No valid images uploaded'}), 400
-
-        # Run batch inference (returns sorted results)
-        bboxes_sorted, results_sorted = infer_images_sorted_by_score(
-            image_paths=temp_paths,
-            body_yolo_model=body_yolo_model,
-            face_yolo_model=face_yolo_model,
-            beauty_scorer_model=beauty_scorer_model,
-            image_transform=image_transform,
-            mask_transform=mask_transform,
-            device=device
+        if METRICS_ENABLED:
+            metrics.BATCH_IMAGES.observe(len(uploads))
+
+        # Resolve repeated images from the result cache; only the first upload
+        # of each not-yet-cached image is computed (and owned) by this request
+        per_image = [(None, None)] * len(uploads)
+        keys = [result_cache.key(data) for data in uploads] if result_cache is not None else None
+        owned = {}       # key -> index of the upload this request computes
+        waiting = []     # (index, future) of images cached or computed elsewhere
+        to_compute = []
+
+        for idx in range(len(uploads)):
+            if result_cache is None:
+                to_compute.append(idx)
+                continue
+            key = keys[idx]
+            if key in owned:
+                continue
+            future, is_owner = result_cache.claim(key)
+            if is_owner:
+                owned[key] = idx
+                to_compute.append(idx)
+            else:
+                waiting.append((idx, future))
+
+        # Annotate each image while its decoded pixels are still around,
+        # so no upload is decoded twice
+        annotations = {}
+        decode_infos = {}
+
+        def annotate(pos, ctx):
+            if METRICS_ENABLED:
+                metrics.record_detection(True, ctx.face is not None)
+            decode_infos[to_compute[pos]] = ctx.decode_info
+            annotations[to_compute[pos]] = create_annotated_image(ctx, ctx.body_bbox, None)
+
+        # Run batch inference (one (bbox, result) per upload, in upload order)
+        try:
+            computed = infer_images_batched(
+                images=[uploads[idx] for idx in to_compute],
+                body_yolo_model=runtime.body_yolo_model,
+                face_yolo_model=runtime.face_yolo_model,
+                beauty_scorer_model=runtime.beauty_scorer_model,
+                image_transform=image_transform,
+                mask_transform=mask_transform,
+                device=device,
+                max_batch_size=SCORER_MAX_BATCH_SIZE,
+                detection_batch_size=DETECTION_BATCH_SIZE,
+                on_detected=annotate,
+                decode_max_side=DECODE_MAX_SIDE,
+                decode_max_pixels=DECODE_MAX_PIXELS
+            )
+        except Exception as e:
+            for key in owned:
+                result_cache.fail(key, e)
+            raise
+
+        for idx, value in zip(to_compute, computed):
+            per_image[idx] = value
+            if METRICS_ENABLED and value[0] is None:
+                metrics.record_detection(False)
+        for key, idx in owned.items():
+            result_cache.resolve(key, per_image[idx])
+
+        # One deadline for all of them, so a batch waits CACHE_WAIT_TIMEOUT_S
+        # at most, not that long per image
+        errors = []
+        wait_deadline = time.monotonic() + CACHE_WAIT_TIMEOUT_S
+        for idx, future in waiting:
+            try:
+                per_image[idx] = future.result(timeout=max(0.0, wait_deadline - time.monotonic()))
+            except Exception as e:
+                # Another request computing this image failed or is still at it;
+                # errors are not cached, so only this image counts as failed
+                if isinstance(e, FutureTimeoutError):
+                    error = 'Timed out waiting for an identical request in progress'
+                else:
+                    error = f'Failed in an identical request: {e}'
+                app.logger.warning("Batch image %d: %s", idx, error)
+                errors.append({'index': idx, 'error': error})
+
+        if result_cache is not None and g.get('request_timings') is not None:
+            g.request_timings.record_cache(hits=len(uploads) - len(to_compute), misses=len(to_compute))
+
+        # Duplicates inside this request share the first upload's result
+        if result_cache is not None:
+            for idx, key in enumerate(keys):
+                if key in owned and owned[key] != idx:
+                    per_image[idx] = per_image[owned[key]]
+                    if owned[key] in annotations:
+                        annotations[idx] = annotations[owned[key]]
+                        decode_infos[idx] = decode_infos[owned[key]]
+
+        # Annotations for images that were not computed here
+        for idx, (bbox, result) in enumerate(per_image):
+            if bbox is not None and result is not None and idx not in annotations:
+                ctx = ImageContext.from_source(uploads[idx], DECODE_MAX_SIDE, DECODE_MAX_PIXELS)
+                decode_infos[idx] = ctx.decode_info
+                annotations[idx] = create_annotated_image(ctx, bbox, None)
+        del uploads
+
+        # Sort by total score (descending), keeping track of the source upload
+        scored = sorted(
+            [(idx, bbox, result) for idx, (bbox, result) in enumerate(per_image)
+             if bbox is not None and result is not None],
+            key=lambda item: item[2]['total_score_0_100'],
+            reverse=True
         )
 
         # Prepare response
         batch_results = []
-        for rank, (bbox, result, path) in enumerate(
-            zip(bboxes_sorted, results_sorted, temp_paths[:len(bboxes_sorted)]), 1
-        ):
-            image_b64 = create_annotated_image(path, bbox, None)
+        for rank, (idx, bbox, result) in enumerate(scored, 1):
+            image_b64 = annotations[idx]
             batch_results.append({
                 'image_id': f'camel_{rank:03d}',
                 'body_bbox': list(bbox),
                 'face_bbox': None,
                 'results': result,
                 'rank': rank,
-                'image_base64': image_b64
+                'image_base64': image_b64,
+                'decode': decode_infos[idx]
             })
 
-        # Cleanup
-        for path in temp_paths:
-            if os.path.exists(path):
-                os.remove(path)
-
-        return jsonify({
+        response = {
             'success': True,
             'total_images': len(files),
             'successful': len(batch_results),
             'failed': len(files) - len(batch_results),
+            'errors': errors,
             'results': batch_results
-        }), 200
+        }
+        if g.get('request_timings') is not None:
+            response['timings'] = g.request_timings.as_dict()
 
-    except Exception as e:
-        # Cleanup on error
-        for path in temp_paths:
-            if os.path.exists(path):
-                os.remove(path)
+        return jsonify(response), 200
 
+    except Exception as e:
         return jsonify({
             'success': False,
             'error': f'Batch inference error: {str(e)}'
@@ -211,8 +695,22 @@ if __name__ == '__main__':
     print("=" * 60)
     print("CamelBeauty ML API Server")
     print("=" * 60)
-    print(f"Device: {device}")
-    print(f"Models loaded successfully")
-    print(f"Upload folder: {UPLOAD_FOLDER}")
+    print(f"Device: {device}, scorer backend: {SCORER_BACKEND}, YOLO backend: {YOLO_BACKEND}, "
+          f"scorer precision: {SCORER_PRECISION}, YOLO half: {YOLO_HALF}")
+    if EAGER_MODEL_LOAD:
+        print("Models: loading in the background (see /health/ready)")
+    else:
+        print("Models: loaded on first request")
+    if scoring_batcher is not None:
+        print(f"Dynamic batching: window {BATCH_WINDOW_MS} ms, max batch {BATCH_MAX_SIZE}")
+    else:
+        print("Dynamic batching: disabled")
+    if result_cache is not None:
+        print(f"Result cache: {CACHE_MAX_ENTRIES} entries, TTL {CACHE_TTL_SECONDS} s, "
+              f"fingerprinted once the models are loaded")
+        if result_cache.store is not None:
+            print(f"Result store: {result_cache.store.path}")
+    else:
+        print("Result cache: disabled")
     print("=" * 60)
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -1,18 +1,16 @@
 import gradio as gr
-import numpy as np
 from PIL import Image
 import cv2
 from inference_utils import (
-    infer_single_image,
-    body_yolo_model,
-    face_yolo_model,
-    beauty_scorer_model,
+    ImageContext,
+    infer_image_context,
     image_transform,
     mask_transform,
     device
 )
-import tempfile
-import os
+from model_runtime import ModelRuntime
+
+runtime = ModelRuntime(device=device)
 
 def predict_camel_beauty(image):
     """
@@ -21,16 +19,15 @@ def predict_camel_beauty(image):
     if image is None:
         return "Please upload an image", None
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-        image.save(tmp_file.name)
-        temp_path = tmp_file.name
-
     try:
-        body_bbox, result = infer_single_image(
-            image_path=temp_path,
-            body_yolo_model=body_yolo_model,
-            face_yolo_model=face_yolo_model,
-            beauty_scorer_model=beauty_scorer_model,
+        # Decode once; detection, scoring and drawing all share these pixels
+        ctx = ImageContext.from_pil(image)
+
+        body_bbox, result = infer_image_context(
+            ctx,
+            body_yolo_model=runtime.body_yolo_model,
+            face_yolo_model=runtime.face_yolo_model,
+            beauty_scorer_model=runtime.beauty_scorer_model,
             image_transform=image_transform,
             mask_transform=mask_transform,
             device=device
@@ -39,8 +36,7 @@ def predict_camel_beauty(image):
         if body_bbox is None or result is None:
             return "❌ No camel detected in the image. Please upload a clear image of a camel.", None
 
-        img_cv = cv2.imread(temp_path)
-        img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
+        img_rgb = ctx.rgb.copy()
         x1, y1, x2, y2 = body_bbox
         cv2.rectangle(img_rgb, (x1, y1), (x2, y2), (0, 255, 0), 3)
         cv2.putText(img_rgb, "Camel Body", (x1, y1 - 10),
@@ -83,10 +79,6 @@ def predict_camel_beauty(image):
     except Exception as e:
         return f"❌ Error processing image: {str(e)}", None
 
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
 css = """
 .gradio-container {
     font-family: 'IBM Plex Sans', sans-serif;
@@ -139,6 +131,7 @@ if __name__ == "__main__":
     print("🐫 CamelBeauty AI - Gradio Interface")
     print("=" * 60)
     print(f"Device: {device}")
+    runtime.load()
     print("Models loaded successfully!")
     print("=" * 60)
     demo.launch(server_name="0.0.0.0", server_port=7860)
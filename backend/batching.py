@@ -0,0 +1,185 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from instrumentation import attribute_timings, tracked_request_timings
+
+
+# ==========================================================
+# DYNAMIC (MICRO-)BATCHING FOR CONCURRENT SCORER REQUESTS
+# ==========================================================
+
+class MicroBatcher:
+    """
+    In-process micro-batching scheduler.
+
+    Request threads call score(sample); a single worker thread collects the
+    samples that arrive within max_wait_ms of the first one (or until
+    max_batch_size are queued), runs score_fn once on the whole list and
+    hands every caller back only its own result.
+
+    score_fn: callable(List[sample]) -> List[result], same length and order.
+
+    Callers that track per-request timings (instrumentation.RequestTimings)
+    get their queue wait added, and the stages score_fn runs attributed to them.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 15.0,
+        stats_window: int = 1000
+    ):
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._wait_ms = deque(maxlen=stats_window)
+        self._max_queue_depth = 0
+        self._total_requests = 0
+        self._total_batches = 0
+
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run, name='camel-micro-batcher', daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, sample: Any) -> Future:
+        """Queue one sample and return a Future for its result."""
+        if self._stopped.is_set():
+            raise RuntimeError('MicroBatcher has been shut down')
+
+        future = Future()
+        self._queue.put((sample, future, time.perf_counter(), tracked_request_timings()))
+
+        with self._stats_lock:
+            self._total_requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+        return future
+
+    def score(self, sample: Any, timeout: Optional[float] = 60.0) -> Any:
+        """
+        Blocking helper: submit a sample and wait for its result. Raises
+        concurrent.futures.TimeoutError after `timeout` seconds (None: wait forever).
+        """
+        return self.submit(sample).result(timeout=timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        self._queue.put(None)
+        self._worker.join(timeout=timeout)
+
+    def _collect_batch(self, first) -> List[tuple]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: put it back for the outer loop
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = self._collect_batch(first)
+            started = time.perf_counter()
+
+            with self._stats_lock:
+                self._total_batches += 1
+                self._batch_sizes[len(batch)] += 1
+                for _, _, enqueued, _ in batch:
+                    self._wait_ms.append((started - enqueued) * 1000.0)
+
+            tracked = []
+            for _, _, enqueued, timings in batch:
+                for t in timings:
+                    t.add_queue_wait(started - enqueued)
+                    tracked.append(t)
+
+            samples = [sample for sample, _, _, _ in batch]
+            try:
+                if tracked:
+                    with attribute_timings(tracked):
+                        results = self.score_fn(samples)
+                else:
+                    results = self.score_fn(samples)
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            if len(results) != len(batch):
+                error = RuntimeError(
+                    f'score_fn returned {len(results)} results for {len(batch)} samples'
+                )
+                for _, future, _, _ in batch:
+                    future.set_exception(error)
+                continue
+
+            for (_, future, _, _), res in zip(batch, results):
+                future.set_result(res)
+
+        # Fail anything still queued after shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError('MicroBatcher has been shut down'))
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, batch-size distribution and added wait time (ms)."""
+        with self._stats_lock:
+            waits = sorted(self._wait_ms)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            total_batches = self._total_batches
+            total_requests = self._total_requests
+            max_depth = self._max_queue_depth
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(round(p / 100.0 * (len(waits) - 1))))]
+
+        batched_items = sum(size * count for size, count in batch_sizes.items())
+
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_s * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': max_depth,
+            'total_requests': total_requests,
+            'total_batches': total_batches,
+            'mean_batch_size': (batched_items / total_batches) if total_batches else 0.0,
+            'batch_size_histogram': batch_sizes,
+            'wait_ms': {
+                'mean': (sum(waits) / len(waits)) if waits else 0.0,
+                'p50': percentile(50),
+                'p95': percentile(95),
+                'p99': percentile(99),
+                'max': waits[-1] if waits else 0.0
+            }
+        }
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Offline per-stage latency benchmark of the camel evaluation pipeline.
+
+    python benchmark.py [--resolutions 640x480,1920x1080,4032x3024]
+                        [--iterations 30] [--batch-sizes 1,8] [--output bench.json]
+
+Runs every stage on synthetic images with randomly initialised models (a
+CamelBeautyScorer built from the bundled ViT config and YOLOv8-seg models
+built from their ultralytics yaml), so it needs neither the trained weights
+nor network access. Latencies are therefore representative, scores are not.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import torch
+
+from inference_utils import (
+    CamelBeautyScorer,
+    ImageContext,
+    decode_image_bounded,
+    _select_best_body,
+    _select_best_face,
+    build_scorer_sample,
+    calculate_beauty_scores_batch,
+    create_annotated_image,
+    image_transform,
+    mask_transform,
+    device as default_device
+)
+from onnx_yolo import DetectionBoxes, DetectionMasks, DetectionResults
+from precision import synthetic_scorer_samples
+from preprocessing import BatchBuffers
+
+
+# ==========================================================
+# SYNTHETIC INPUTS
+# ==========================================================
+#
+# Random-weight detectors find (almost) nothing, so the stages after
+# detection run on a fixed synthetic detection instead: one box over the
+# middle of the image (body) or of the body crop (face), with an elliptical
+# mask at YOLO's letterboxed mask resolution. The detection stages themselves
+# still time the real predict() calls with the pipeline's thresholds; with
+# next to no candidate boxes their NMS / mask decoding cost is a lower bound.
+
+STAGES = (
+    'decode',
+    'body_detection',
+    'mask_materialisation',
+    'face_detection',
+    'preprocessing',
+    'scorer_forward',
+    'calculate_beauty_scores',
+    'annotation'
+)
+DEFAULT_RESOLUTIONS = ((640, 480), (1920, 1080), (4032, 3024))
+DEFAULT_BATCH_SIZES = (1, 8)
+YOLO_IMGSZ = 640
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Smooth random RGB image (compresses and decodes like a photo, unlike pure noise)."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, size=(max(2, height // 32), max(2, width // 32), 3), dtype=np.uint8)
+    image = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    grain = rng.integers(-8, 9, size=image.shape, dtype=np.int16)
+    return np.clip(image.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+
+
+def synthetic_detection(height: int, width: int, fraction: float = 0.6) -> DetectionResults:
+    """One centred detection covering `fraction` of each side, with an elliptical mask."""
+    x1, y1 = int(width * (1 - fraction) / 2), int(height * (1 - fraction) / 2)
+    x2, y2 = width - x1, height - y1
+
+    # Mask in letterboxed YOLO_IMGSZ x YOLO_IMGSZ coordinates, like masks.data
+    gain = min(YOLO_IMGSZ / height, YOLO_IMGSZ / width)
+    pad_x, pad_y = (YOLO_IMGSZ - width * gain) / 2, (YOLO_IMGSZ - height * gain) / 2
+    mask = np.zeros((YOLO_IMGSZ, YOLO_IMGSZ), dtype=np.uint8)
+    center = (int(pad_x + (x1 + x2) / 2 * gain), int(pad_y + (y1 + y2) / 2 * gain))
+    axes = (max(1, int((x2 - x1) / 2 * gain)), max(1, int((y2 - y1) / 2 * gain)))
+    cv2.ellipse(mask, center, axes, 0, 0, 360, 1, -1)
+
+    return DetectionResults(
+        DetectionBoxes(
+            np.array([[x1, y1, x2, y2]], dtype=np.float32),
+            np.array([0.9], dtype=np.float32),
+            np.array([0.0], dtype=np.float32)
+        ),
+        DetectionMasks(mask[None].astype(np.float32)),
+        orig_shape=(height, width),
+        names={0: 'camel'}
+    )
+
+
+# ==========================================================
+# TIMING
+# ==========================================================
+
+def _synchronize(run_device: torch.device) -> None:
+    if run_device.type == 'cuda':
+        torch.cuda.synchronize(run_device)
+
+
+def time_stage(
+    fn: Callable[[], Any],
+    iterations: int,
+    warmup: int,
+    run_device: torch.device
+) -> List[float]:
+    """Wall-clock latencies (ms) of `iterations` calls of fn, after `warmup` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    _synchronize(run_device)
+
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        _synchronize(run_device)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return latencies
+
+
+def latency_stats(latencies_ms: Sequence[float], items_per_call: int = 1) -> Dict[str, float]:
+    """p50/p95/p99/mean/min/max latency (ms per call) and throughput (items/s at the mean)."""
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    mean = float(values.mean())
+    return {
+        'iterations': int(values.size),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': mean,
+        'min_ms': float(values.min()),
+        'max_ms': float(values.max()),
+        'items_per_call': items_per_call,
+        'throughput_per_s': items_per_call * 1000.0 / mean if mean > 0 else float('inf')
+    }
+
+
+# ==========================================================
+# MODELS
+# ==========================================================
+
+def build_random_scorer(run_device: torch.device, seed: int = 0) -> CamelBeautyScorer:
+    torch.manual_seed(seed)
+    return CamelBeautyScorer(pretrained=False).to(run_device).eval()
+
+
+def build_random_yolo(config: str):
+    """YOLO-seg model with random weights, built from an ultralytics model yaml."""
+    from ultralytics import YOLO
+    return YOLO(config)
+
+
+# ==========================================================
+# BENCHMARKS
+# ==========================================================
+
+def benchmark_resolution(
+    width: int,
+    height: int,
+    body_model,
+    face_model,
+    iterations: int,
+    warmup: int,
+    run_device: torch.device,
+    jpeg_quality: int = 90,
+    seed: int = 0,
+    decode_max_side: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Per-image stages (decode .. preprocessing, annotation) at one resolution;
+    the later stages run on the image as decoded with decode_max_side.
+    """
+    rgb = synthetic_image(width, height, seed)
+    ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR),
+                               [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    if not ok:
+        raise RuntimeError(f'Could not encode a {width}x{height} test image')
+    data = encoded.tobytes()
+
+    rgb, decode_info = decode_image_bounded(data, decode_max_side)
+    ctx = ImageContext(rgb, decode_info=decode_info)
+    body_results = synthetic_detection(ctx.height, ctx.width)
+    ctx.body = _select_best_body(ctx.rgb, body_results)
+    face_results = synthetic_detection(*ctx.body_crop.shape[:2])
+    ctx.face = _select_best_face(ctx.body_crop, face_results)
+
+    def materialise_masks():
+        body = _select_best_body(ctx.rgb, body_results)
+        _select_best_face(body['body_crop'], face_results)
+
+    stages = {
+        'decode': lambda: decode_image_bounded(data, decode_max_side),
+        'body_detection': lambda: body_model.predict(ctx.rgb, conf=0.5, iou=0.5, verbose=False),
+        'mask_materialisation': materialise_masks,
+        'face_detection': lambda: face_model.predict(ctx.body_crop, conf=0.25, iou=0.5, verbose=False),
+        'preprocessing': lambda: build_scorer_sample(
+            ctx.body_crop, ctx.body_mask_crop, ctx.face_crop, ctx.face_mask_crop,
+            image_transform, mask_transform
+        ),
+        'annotation': lambda: create_annotated_image(ctx, ctx.body_bbox, ctx.face_bbox)
+    }
+
+    report = {'width': width, 'height': height, 'encoded_bytes': len(data),
+              'decode': decode_info, 'stages': {}}
+    for name, fn in stages.items():
+        report['stages'][name] = latency_stats(time_stage(fn, iterations, warmup, run_device))
+    return report
+
+
+def benchmark_scorer(
+    scorer: CamelBeautyScorer,
+    batch_sizes: Sequence[int],
+    iterations: int,
+    warmup: int,
+    run_device: torch.device
+) -> Dict[str, Any]:
+    """scorer_forward and calculate_beauty_scores per batch size (inputs are always 224x224)."""
+    report = {}
+    for batch_size in batch_sizes:
+        samples = synthetic_scorer_samples(count=batch_size)
+        batch = {
+            key: torch.stack([s[key] for s in samples]).to(run_device)
+            for key in BatchBuffers.KEYS
+        }
+
+        def forward():
+            with torch.no_grad():
+                return scorer(**batch)
+
+        outputs = forward()
+        report[f'batch_{batch_size}'] = {
+            'scorer_forward': latency_stats(
+                time_stage(forward, iterations, warmup, run_device), batch_size
+            ),
+            'calculate_beauty_scores': latency_stats(
+                time_stage(lambda: calculate_beauty_scores_batch(outputs),
+                           iterations, warmup, run_device),
+                batch_size
+            )
+        }
+    return report
+
+
+def environment_info(run_device: torch.device) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    info = {
+        'git_commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'opencv': cv2.__version__,
+        'device': str(run_device)
+    }
+    if run_device.type == 'cuda':
+        info['cuda_device'] = torch.cuda.get_device_name(run_device)
+    try:
+        import ultralytics
+        info['ultralytics'] = ultralytics.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def parse_resolutions(text: str) -> List[Tuple[int, int]]:
+    resolutions = []
+    for item in text.split(','):
+        width, height = item.lower().split('x')
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark with random-weight models")
+    parser.add_argument("--resolutions", default=','.join(f'{w}x{h}' for w, h in DEFAULT_RESOLUTIONS),
+                        help="comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--batch-sizes", default=','.join(map(str, DEFAULT_BATCH_SIZES)),
+                        help="scorer batch sizes, comma-separated")
+    parser.add_argument("--yolo-config", default='yolov8n-seg.yaml',
+                        help="ultralytics model yaml for both random detectors")
+    parser.add_argument("--device", default=None, help="defaults to cuda when available")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--decode-max-side", type=int, default=0,
+                        help="decode to at most this many px on the longer side (0 = native)")
+    parser.add_argument("--output", default=None, help="write the report as JSON here")
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    run_device = torch.device(args.device) if args.device else default_device
+
+    scorer = build_random_scorer(run_device, seed=args.seed)
+    body_model = build_random_yolo(args.yolo_config)
+    face_model = build_random_yolo(args.yolo_config)
+
+    report = {
+        'environment': environment_info(run_device),
+        'config': {
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'yolo_config': args.yolo_config,
+            'seed': args.seed,
+            'decode_max_side': args.decode_max_side,
+            'stages': list(STAGES)
+        },
+        'resolutions': {},
+        'scorer': {}
+    }
+
+    for width, height in parse_resolutions(args.resolutions):
+        print(f"Benchmarking {width}x{height} ...")
+        report['resolutions'][f'{width}x{height}'] = benchmark_resolution(
+            width, height, body_model, face_model,
+            args.iterations, args.warmup, run_device, seed=args.seed,
+            decode_max_side=args.decode_max_side or None
+        )
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',') if b]
+    print(f"Benchmarking scorer at batch sizes {batch_sizes} ...")
+    report['scorer'] = benchmark_scorer(scorer, batch_sizes, args.iterations, args.warmup, run_device)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
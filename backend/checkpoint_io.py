@@ -0,0 +1,155 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Any, Dict, Optional, Tuple, Union
+
+import torch
+
+from result_cache import sha256_file
+
+
+# ==========================================================
+# SAFETENSORS CHECKPOINTS: CONVERSION, CHECKSUMS, MMAP LOADING
+# ==========================================================
+#
+# load_safetensors_mmap() maps the file copy-on-write and returns tensors that
+# are views into the mapping, so on CPU the weights are never copied: every
+# worker process on a host reads the same page-cache pages. Assign them to a
+# meta-initialised module with load_state_dict(assign=True) to keep it that way.
+
+_SAFETENSORS_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool
+}
+
+
+def checksum_path(path: str) -> str:
+    """Sidecar file holding the SHA-256 of path (sha256sum format)."""
+    return path + '.sha256'
+
+
+# Digests this process computed itself from the file bytes, per file version.
+# verify_checksum deliberately ignores result_cache's on-disk '.sha256-cache':
+# whoever can replace a model file can usually rewrite that cache too.
+_verified_digests: Dict[Tuple[str, int, int], str] = {}
+_verified_digests_lock = threading.Lock()
+
+
+def _verified_sha256(path: str) -> str:
+    st = os.stat(path)
+    version = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _verified_digests_lock:
+        digest = _verified_digests.get(version)
+    if digest is None:
+        digest = sha256_file(path)
+        with _verified_digests_lock:
+            _verified_digests[version] = digest
+    return digest
+
+
+def write_checksum(path: str) -> str:
+    digest = _verified_sha256(path)
+    with open(checksum_path(path), 'w') as f:
+        f.write(f'{digest}  {os.path.basename(path)}\n')
+    return digest
+
+
+def verify_checksum(path: str, expected: Optional[str] = None) -> bool:
+    """
+    Compare the SHA-256 of path with `expected` or, if not given, with its
+    .sha256 sidecar. Returns False when there is nothing to compare against;
+    raises ValueError on a mismatch.
+
+    The file's bytes are hashed by every process that verifies it (once per
+    size and mtime within that process), never taken from the on-disk digest
+    cache. Within one process, a rewrite that keeps size and mtime is missed.
+    """
+    if expected is None:
+        sidecar = checksum_path(path)
+        if not os.path.exists(sidecar):
+            return False
+        with open(sidecar) as f:
+            expected = f.read().split()[0]
+
+    actual = _verified_sha256(path)
+    if actual.lower() != expected.lower():
+        raise ValueError(f'Checksum mismatch for {path}: expected {expected}, got {actual}')
+    return True
+
+
+def extract_state_dict(ckpt: Dict[str, Any]) -> Dict[str, torch.Tensor]:
+    return ckpt['model_state_dict'] if 'model_state_dict' in ckpt else ckpt
+
+
+def convert_checkpoint_to_safetensors(src_path: str, dst_path: Optional[str] = None) -> str:
+    """
+    Convert a torch.save'd state dict (optionally wrapped in
+    {'model_state_dict': ...}) to safetensors and write its .sha256 sidecar.
+    Returns the path of the new file.
+    """
+    from safetensors.torch import save_file
+
+    if dst_path is None:
+        dst_path = os.path.splitext(src_path)[0] + '.safetensors'
+
+    state_dict = extract_state_dict(torch.load(src_path, map_location='cpu'))
+    # safetensors refuses shared or non-contiguous storage
+    state_dict = {name: t.detach().contiguous().clone() for name, t in state_dict.items()}
+
+    tmp_path = dst_path + '.tmp'
+    save_file(state_dict, tmp_path, metadata={'source': os.path.basename(src_path)})
+    os.replace(tmp_path, dst_path)
+    write_checksum(dst_path)
+    return dst_path
+
+
+def load_safetensors_mmap(
+    path: str,
+    device: Union[str, torch.device] = 'cpu',
+    verify: bool = True
+) -> Dict[str, torch.Tensor]:
+    """
+    Memory-map a .safetensors file and return its tensors.
+
+    On CPU the tensors are zero-copy views into a copy-on-write mapping; on
+    other devices they are copied once from the mapping. With verify=True the
+    file is checked against its .sha256 sidecar first (if there is one); that
+    reads the whole file once per version of it in this process.
+    """
+    if verify:
+        verify_checksum(path)
+
+    with open(path, 'rb') as f:
+        header_len = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_len))
+        # ACCESS_COPY (MAP_PRIVATE): pages stay shared until written to
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header.pop('__metadata__', None)
+
+    data_start = 8 + header_len
+    file_bytes = torch.frombuffer(mapped, dtype=torch.uint8)
+    device = torch.device(device)
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = _SAFETENSORS_DTYPES[info['dtype']]
+        start, end = info['data_offsets']
+        raw = file_bytes[data_start + start:data_start + end]
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        if (data_start + start) % itemsize:
+            # Misaligned for a zero-copy view: copy this tensor only
+            raw = raw.clone()
+        tensor = raw.view(dtype).reshape(info['shape'])
+        tensors[name] = tensor if device.type == 'cpu' else tensor.to(device)
+
+    return tensors
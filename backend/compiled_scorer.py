@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import torch
+import torch.nn as nn
+
+from inference_utils import CamelBeautyScorer
+from onnx_backend import SCORER_INPUTS, SCORER_OUTPUTS, TraceableScorer
+
+
+# ==========================================================
+# FIXED-SHAPE (BUCKETED) COMPILED SCORER
+# ==========================================================
+#
+# CamelBeautyScorer.forward uses boolean indexing on body_present /
+# face_present, whose shapes depend on the data and break graph capture.
+# BucketedCompiledScorer compiles the branch-free forward_dense instead, once
+# per fixed batch size: a batch of n samples is zero-padded (present=False)
+# to the smallest bucket >= n, larger batches are split into max-bucket
+# chunks, and the padded rows are dropped from the outputs.
+
+DEFAULT_BUCKETS = (1, 2, 4, 8, 16)
+
+
+class BucketedCompiledScorer(nn.Module):
+    """
+    Drop-in scorer (keyword tensors in, dict of logits out) running a
+    torch.compile'd or TorchScript-traced forward_dense at fixed batch sizes.
+
+    mode: 'compile' (torch.compile, inductor) or 'torchscript' (torch.jit.trace
+    + freeze per bucket). If compiling or running a bucket fails, the scorer
+    permanently falls back to the eager forward and records the error.
+    """
+
+    def __init__(
+        self,
+        model: CamelBeautyScorer,
+        mode: str = 'compile',
+        buckets: Tuple[int, ...] = DEFAULT_BUCKETS,
+        image_size=(224, 224)
+    ):
+        super().__init__()
+        if mode not in ('compile', 'torchscript'):
+            raise ValueError(f'Unknown compile mode: {mode}')
+        self.model = model
+        self.mode = mode
+        self.buckets = tuple(sorted(set(int(b) for b in buckets)))
+        self.image_size = tuple(image_size)
+
+        self._traceable = TraceableScorer(model).eval()
+        self._compiled = torch.compile(self._traceable, dynamic=False) if mode == 'compile' else None
+        self._traced = {}              # bucket -> ScriptModule (torchscript mode)
+        self._ready_buckets = set()
+        self._lock = threading.Lock()
+        self.fallback_error: Optional[str] = None
+        self.compile_seconds: Dict[int, float] = {}
+
+    def _bucket_for(self, n: int) -> int:
+        for bucket in self.buckets:
+            if bucket >= n:
+                return bucket
+        return self.buckets[-1]
+
+    def _dummy_inputs(self, batch: int, device: torch.device) -> Dict[str, torch.Tensor]:
+        h, w = self.image_size
+        return {
+            'body_image': torch.zeros(batch, 3, h, w, device=device),
+            'body_mask': torch.zeros(batch, 1, h, w, device=device),
+            'body_present': torch.zeros(batch, dtype=torch.bool, device=device),
+            'face_image': torch.zeros(batch, 3, h, w, device=device),
+            'face_mask': torch.zeros(batch, 1, h, w, device=device),
+            'face_present': torch.zeros(batch, dtype=torch.bool, device=device)
+        }
+
+    def _pad(self, inputs: Dict[str, torch.Tensor], bucket: int) -> Tuple[torch.Tensor, ...]:
+        n = inputs['body_image'].shape[0]
+        padded = []
+        for name in SCORER_INPUTS:
+            t = inputs[name]
+            if n < bucket:
+                t = torch.cat([t, t.new_zeros((bucket - n,) + tuple(t.shape[1:]))])
+            padded.append(t)
+        return tuple(padded)
+
+    def _run_bucket(self, args: Tuple[torch.Tensor, ...], bucket: int) -> Tuple[torch.Tensor, ...]:
+        if self.mode == 'torchscript':
+            traced = self._traced.get(bucket)
+            if traced is None:
+                traced = torch.jit.freeze(torch.jit.trace(self._traceable, args, check_trace=False))
+                self._traced[bucket] = traced
+            return traced(*args)
+        return self._compiled(*args)
+
+    def _forward_chunk(self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        n = inputs['body_image'].shape[0]
+        bucket = self._bucket_for(n)
+        args = self._pad(inputs, bucket)
+
+        if bucket not in self._ready_buckets:
+            # First call of a bucket compiles it; keep that single-threaded
+            with self._lock:
+                started = time.perf_counter()
+                outputs = self._run_bucket(args, bucket)
+                if bucket not in self._ready_buckets:
+                    self.compile_seconds[bucket] = time.perf_counter() - started
+                    self._ready_buckets.add(bucket)
+        else:
+            outputs = self._run_bucket(args, bucket)
+
+        return {name: out[:n] for name, out in zip(SCORER_OUTPUTS, outputs)}
+
+    def forward(self, **inputs: torch.Tensor) -> Dict[str, torch.Tensor]:
+        if self.fallback_error is None:
+            try:
+                n = inputs['body_image'].shape[0]
+                step = self.buckets[-1]
+                if n <= step:
+                    return self._forward_chunk(inputs)
+                chunks = [
+                    self._forward_chunk({name: t[start:start + step] for name, t in inputs.items()})
+                    for start in range(0, n, step)
+                ]
+                return {name: torch.cat([c[name] for c in chunks]) for name in SCORER_OUTPUTS}
+            except Exception as e:
+                self.fallback_error = f'{type(e).__name__}: {e}'
+                print(f"Compiled scorer failed, falling back to eager: {self.fallback_error}")
+        return self.model(**inputs)
+
+    def warm_up(self) -> Dict[int, float]:
+        """Compile every bucket now instead of on its first request."""
+        device = next(self.model.parameters()).device
+        with torch.no_grad():
+            for bucket in self.buckets:
+                self(**self._dummy_inputs(bucket, device))
+        return dict(self.compile_seconds)
@@ -2,8 +2,13 @@
 """
 CamelBeauty ML Models Download Script
 Downloads all required ML models from Google Drive using gdown
+
+    python download_models.py                    # download
+    python download_models.py --to-safetensors   # download, then convert the scorer
+    python download_models.py --convert-only     # only convert an existing scorer checkpoint
 """
 
+import argparse
 import os
 import subprocess
 import sys
@@ -24,6 +29,9 @@ MODELS = [
     
 ]
 
+# Downloaded separately (see MODEL_SETUP.md); converted by --to-safetensors
+SCORER_CHECKPOINT = "models/scorer/best_camel_beauty_all_data_model.pth"
+
 
 def print_header(text: str) -> None:
     print("=" * 60)
@@ -113,7 +121,7 @@ def print_summary(results: list[tuple[dict, bool]]) -> None:
         print("\n[OK] All models downloaded successfully!")
         print("\nNext steps:")
         print("  1. Install dependencies: pip install -r requirements.txt")
-        print("  2. Test setup: python -c 'from inference_utils import *; print(\"OK\")'")
+        print("  2. Test setup: python -c 'import inference_utils; print(\"OK\")'")
         print("  3. Run Flask server: python app.py")
     else:
         print("\n[WARN] Some models failed to download.")
@@ -130,9 +138,41 @@ def get_file_size_from_bytes(size: int) -> str:
     return f"{size:.2f} TB"
 
 
+def convert_scorer_to_safetensors() -> bool:
+    """Write models/scorer/*.safetensors (+ .sha256) next to the scorer checkpoint."""
+    print(f"\nConverting {SCORER_CHECKPOINT} to safetensors...")
+    if not os.path.exists(SCORER_CHECKPOINT):
+        print(f"  [FAIL] {SCORER_CHECKPOINT} not found")
+        return False
+
+    try:
+        from checkpoint_io import convert_checkpoint_to_safetensors
+
+        output = convert_checkpoint_to_safetensors(SCORER_CHECKPOINT)
+    except Exception as e:
+        print(f"  [FAIL] Conversion error: {e}")
+        return False
+
+    print(f"  [OK] {output} ({get_file_size(output)}), checksum in {output}.sha256")
+    return True
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download CamelBeauty ML models")
+    parser.add_argument("--to-safetensors", action="store_true",
+                        help="convert the scorer checkpoint to memory-mappable safetensors")
+    parser.add_argument("--convert-only", action="store_true",
+                        help="skip downloads, only convert the scorer checkpoint")
+    return parser.parse_args()
+
+
 def main() -> int:
+    args = parse_args()
     print_header("CamelBeauty ML Models Download Script")
 
+    if args.convert_only:
+        return 0 if convert_scorer_to_safetensors() else 1
+
     if not check_gdown():
         print("Cannot proceed without gdown. Exiting.")
         return 1
@@ -149,6 +189,8 @@ def main() -> int:
     print_summary(results)
 
     failed = [r for r in results if not r[1]]
+    if args.to_safetensors and not convert_scorer_to_safetensors():
+        return 1
     return 1 if failed else 0
 
 
@@ -74,6 +74,6 @@ echo ""
 echo "Next steps:"
 echo "1. Update model paths in inference_utils.py"
 echo "2. Install dependencies: pip install -r requirements.txt"
-echo "3. Test setup: python -c 'from inference_utils import *; print(\"Models loaded!\")'"
+echo "3. Test setup: python -c 'from model_runtime import ModelRuntime; ModelRuntime().load(); print(\"Models loaded!\")'"
 echo "4. Run Flask server: python app.py"
 echo "============================================================"
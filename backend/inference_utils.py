@@ -1,15 +1,30 @@
+from __future__ import annotations
+
 import os
+import io
+import base64
 import cv2
 import torch
-import json
 import numpy as np
 import torch.nn as nn
 import torch.nn.functional as F
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Optional, Union
 from PIL import Image
-from torchvision import transforms
-from transformers import ViTModel
-from ultralytics import YOLO
+
+if TYPE_CHECKING:
+    # Only for annotations; model_runtime.ModelRuntime imports ultralytics when loading
+    from ultralytics import YOLO
+
+from preprocessing import (
+    ImageTransform,
+    MaskTransform,
+    BatchBuffers,
+    pil_nearest_indices,
+    IMAGENET_MEAN,
+    IMAGENET_STD
+)
+from checkpoint_io import extract_state_dict, load_safetensors_mmap, verify_checksum
+from instrumentation import stage
 
 # ====================================================
 # PART 1: HELPER FUNCTIONS FOR YOLO & MASK PROCESSING
@@ -82,6 +97,42 @@ def transform_face_coords_to_original(face_results, crop_bbox, original_img_shap
     return transformed_boxes, transformed_masks, transformed_confidences, transformed_class_ids
 
 
+def _cv2_nearest_indices(dst_coords: np.ndarray, dst_len: int, src_len: int) -> np.ndarray:
+    """Source indices cv2.resize(..., INTER_NEAREST) samples for dst_coords."""
+    inv_scale = 1.0 / (dst_len / src_len)
+    return np.minimum(np.floor(dst_coords * inv_scale).astype(np.int64), src_len - 1)
+
+
+def upsample_mask_roi(
+    mask: np.ndarray,
+    target_h: int,
+    target_w: int,
+    roi: Tuple[int, int, int, int],
+    out_size: Tuple[int, int] = (224, 224),
+    threshold: float = 0.5
+) -> np.ndarray:
+    """
+    Materialise only the region of interest of a low-resolution YOLO mask,
+    directly at the scorer input resolution.
+
+    Equivalent to resizing `mask` to (target_w, target_h) with INTER_NEAREST,
+    thresholding, cropping roi=(x1, y1, x2, y2) and NEAREST-resizing the crop
+    to out_size=(w, h) the way mask_transform does -- but only out_size pixels
+    are ever gathered, instead of the whole target frame.
+    Returns a uint8 0/1 array of shape (out_h, out_w).
+    """
+    x1, y1, x2, y2 = map(int, roi)
+    out_w, out_h = out_size
+    if x2 <= x1 or y2 <= y1:
+        return np.zeros((out_h, out_w), dtype=np.uint8)
+
+    src_h, src_w = mask.shape[:2]
+    rows = _cv2_nearest_indices(y1 + pil_nearest_indices(out_h, y2 - y1), target_h, src_h)
+    cols = _cv2_nearest_indices(x1 + pil_nearest_indices(out_w, x2 - x1), target_w, src_w)
+
+    return (mask[np.ix_(rows, cols)] > threshold).astype(np.uint8)
+
+
 def get_instance_crops_from_image(
     image_path,
     body_seg_model,
@@ -210,16 +261,44 @@ def get_instance_crops_from_image(
 # PART 2: MASKENHANCEDVIT, FUSION, AND SCORER (UNCHANGED)
 # ============================================================
 
+# Architecture of google/vit-base-patch16-224, bundled so the scorer can be
+# built without downloading (or reading the Hugging Face cache for) weights
+# that the CamelBeautyScorer checkpoint overwrites anyway.
+VIT_BASE_PATCH16_224_CONFIG = {
+    'hidden_size': 768,
+    'num_hidden_layers': 12,
+    'num_attention_heads': 12,
+    'intermediate_size': 3072,
+    'hidden_act': 'gelu',
+    'hidden_dropout_prob': 0.0,
+    'attention_probs_dropout_prob': 0.0,
+    'initializer_range': 0.02,
+    'layer_norm_eps': 1e-12,
+    'image_size': 224,
+    'patch_size': 16,
+    'num_channels': 3,
+    'qkv_bias': True,
+    'encoder_stride': 16
+}
+
+
 class MaskEnhancedViT(nn.Module):
     """
     Stronger mask-guided ViT:
     - uses standard ViT encoder
     - adds a separate mask-guided pooled token
     - fuses CLS + foreground tokens via MLP
+    With vit_config (a dict of ViTConfig fields) the encoder is built from the
+    config alone, without loading pretrained weights.
     """
-    def __init__(self, pretrained_name='google/vit-base-patch16-224', out_dim=256):
+    def __init__(self, pretrained_name='google/vit-base-patch16-224', out_dim=256, vit_config=None):
         super().__init__()
-        self.vit = ViTModel.from_pretrained(pretrained_name)
+        from transformers import ViTConfig, ViTModel
+
+        if vit_config is not None:
+            self.vit = ViTModel(ViTConfig(**vit_config))
+        else:
+            self.vit = ViTModel.from_pretrained(pretrained_name)
         self.hidden_size = self.vit.config.hidden_size
 
         self.mask_encoder = nn.Sequential(
@@ -313,14 +392,20 @@ class CamelBeautyScorer(nn.Module):
 
         print("Initializing Camel Beauty Scorer with MaskEnhancedViT...")
 
+        # pretrained=False: build both ViTs from the bundled config (offline);
+        # only meaningful when a checkpoint is loaded afterwards
+        vit_config = None if pretrained else VIT_BASE_PATCH16_224_CONFIG
+
         self.body_encoder = MaskEnhancedViT(
             pretrained_name=vit_model,
-            out_dim=feature_dim
+            out_dim=feature_dim,
+            vit_config=vit_config
         )
 
         self.face_encoder = MaskEnhancedViT(
             pretrained_name=vit_model,
-            out_dim=feature_dim
+            out_dim=feature_dim,
+            vit_config=vit_config
         )
 
         self.empty_body_embedding = nn.Parameter(torch.randn(feature_dim))
@@ -399,6 +484,97 @@ class CamelBeautyScorer(nn.Module):
 
         return scores
 
+    def forward_dense(
+        self,
+        body_image: torch.Tensor,
+        face_image: torch.Tensor,
+        body_mask: torch.Tensor,
+        face_mask: torch.Tensor,
+        body_present: torch.Tensor,
+        face_present: torch.Tensor
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Same outputs as forward(), without data-dependent shapes (traceable,
+        e.g. for ONNX export): both encoders run on every sample and
+        torch.where picks the empty embedding where a part is absent.
+        """
+        body_features = torch.where(
+            body_present.unsqueeze(1),
+            self.body_encoder(body_image, body_mask),
+            self.empty_body_embedding.unsqueeze(0)
+        )
+        face_features = torch.where(
+            face_present.unsqueeze(1),
+            self.face_encoder(face_image, face_mask),
+            self.empty_face_embedding.unsqueeze(0)
+        )
+
+        fused_features = self.fusion([body_features, face_features])
+        shared_repr = self.shared_mlp(fused_features)
+
+        return {attr_name: head(shared_repr) for attr_name, head in self.attribute_heads.items()}
+
+
+def load_camel_beauty_scorer(
+    checkpoint_path: str,
+    device: torch.device,
+    feature_dim: int = 256,
+    num_beauty_scores_classes: int = 10,
+    num_category_classes: int = 2,
+    pretrained_backbone: bool = False,
+    verify: bool = True
+) -> CamelBeautyScorer:
+    """
+    Build a CamelBeautyScorer and load checkpoint_path into it, on device and
+    in eval mode.
+
+    checkpoint_path may be a torch .pth/.pt file or a .safetensors file (see
+    checkpoint_io); the latter is memory-mapped, so on CPU the weights are
+    shared with every other process that maps the same file. With verify=True
+    the file is checked against its .sha256 sidecar, if present.
+
+    By default (pretrained_backbone=False) nothing is downloaded: both ViT
+    encoders come from VIT_BASE_PATCH16_224_CONFIG and the module is created
+    on the meta device, so no weights are allocated or randomly initialised;
+    the checkpoint tensors are then assigned in place (load_state_dict(assign=True)).
+    pretrained_backbone=True keeps the original from_pretrained construction.
+    """
+    kwargs = dict(
+        vit_model='google/vit-base-patch16-224',
+        feature_dim=feature_dim,
+        num_beauty_scores_classes=num_beauty_scores_classes,
+        num_category_classes=num_category_classes,
+        pretrained=pretrained_backbone
+    )
+
+    if checkpoint_path.endswith('.safetensors'):
+        state_dict = load_safetensors_mmap(checkpoint_path, device=device, verify=verify)
+    else:
+        if verify:
+            verify_checksum(checkpoint_path)
+        state_dict = extract_state_dict(torch.load(checkpoint_path, map_location=device))
+
+    if pretrained_backbone:
+        model = CamelBeautyScorer(**kwargs)
+        model.load_state_dict(state_dict)
+    else:
+        with torch.device('meta'):
+            model = CamelBeautyScorer(**kwargs)
+        model.load_state_dict(state_dict, assign=True)
+
+        uninitialised = [
+            name for name, t in list(model.named_parameters()) + list(model.named_buffers())
+            if t.is_meta
+        ]
+        if uninitialised:
+            raise RuntimeError(
+                f'Checkpoint {checkpoint_path} does not cover: {", ".join(uninitialised)}'
+            )
+
+    model.to(device)
+    model.eval()
+    return model
+
 
 # ===================================
 # PART 3: LABELS & TOP-3 SCORE LOGIC
@@ -420,66 +596,115 @@ SCORE_WEIGHTS = {
 }
 
 
-def calculate_beauty_scores(
+BEAUTY_ATTRIBUTES = ['head_beauty_score', 'neck_beauty_score',
+                     'body_limb_hump_beauty_score', 'body_size_beauty_score']
+
+
+def calculate_beauty_scores_batch(
     outputs: Dict[str, torch.Tensor],
     num_beauty_classes: int = 10,
     arabic_labels: Dict[str, str] = ARABIC_SCORE_LABELS,
     score_weights: Dict[str, float] = SCORE_WEIGHTS,
     top_k: int = 10
-):
-    """
-    Convert logits to per-attribute 0–100 scores using only top-K probabilities.
-    - Softmax over all classes.
-    - Take top-K classes and probabilities.
-    - Renormalize top-K probabilities so they sum to 1.
-    - Compute expected class index with only top-K.
+) -> List[Tuple[Dict[str, Any], float, float]]:
     """
-    device = next(iter(outputs.values())).device
-    scores_dict = {}
-    total_weighted = 0.0
+    Batched calculate_beauty_scores: one (scores_dict, total_score, star_rating)
+    per row of the (B, C) logits in outputs.
 
-    for attr in ['head_beauty_score', 'neck_beauty_score',
-                 'body_limb_hump_beauty_score', 'body_size_beauty_score']:
-        logits = outputs[attr]          # (1, C)
-        probs_full = torch.softmax(logits, dim=-1)[0]  # (C,)
-
-        k = min(top_k, num_beauty_classes)
-        top_probs, top_indices = torch.topk(probs_full, k=k, dim=-1)
+    The four attribute logits are stacked into one (B, 4, C) tensor, so softmax,
+    top-K renormalisation and expected class index run as a few vectorized ops,
+    and everything is copied to the host in a single transfer.
+    """
+    logits = torch.stack([outputs[attr] for attr in BEAUTY_ATTRIBUTES], dim=1)  # (B,4,C)
+    B = logits.shape[0]
+    n_attr = len(BEAUTY_ATTRIBUTES)
+    k = min(top_k, num_beauty_classes)
 
-        top_probs = top_probs / (top_probs.sum() + 1e-8)
+    probs_full = torch.softmax(logits, dim=-1)
+    top_probs, top_indices = torch.topk(probs_full, k=k, dim=-1)           # (B,4,k)
+    top_probs = top_probs / (top_probs.sum(dim=-1, keepdim=True) + 1e-8)
+    expected_idx = (top_probs * top_indices.float()).sum(dim=-1)           # (B,4)
 
-        expected_idx = (top_probs * top_indices.float()).sum()
-        raw_score_1K = expected_idx.item() + 1.0
-        score_0_100 = (raw_score_1K - 1) / (num_beauty_classes - 1) * 100.0
+    cat_logits = outputs['category_encoded']
+    cat_probs = torch.softmax(cat_logits, dim=-1)                          # (B,2)
+    cat_pred = torch.argmax(cat_logits, dim=-1)                            # (B,)
+
+    # Single device -> host transfer for the whole batch
+    packed = torch.cat([
+        expected_idx,
+        top_probs.reshape(B, -1),
+        top_indices.reshape(B, -1).float(),
+        cat_probs.float(),
+        cat_pred.unsqueeze(1).float()
+    ], dim=1).cpu().numpy()
+
+    o = 0
+    expected_np = packed[:, o:o + n_attr].astype(np.float64); o += n_attr
+    top_probs_np = packed[:, o:o + n_attr * k].reshape(B, n_attr, k); o += n_attr * k
+    top_idx_np = packed[:, o:o + n_attr * k].reshape(B, n_attr, k).astype(np.int64); o += n_attr * k
+    n_cat = cat_probs.shape[1]
+    cat_probs_np = packed[:, o:o + n_cat]; o += n_cat
+    cat_pred_np = packed[:, o].astype(np.int64)
+
+    raw_scores = expected_np + 1.0                                          # (B,4)
+    scores_0_100 = (raw_scores - 1) / (num_beauty_classes - 1) * 100.0
+
+    # Same left-to-right accumulation as the per-image formula
+    totals = np.zeros(B, dtype=np.float64)
+    for j, attr in enumerate(BEAUTY_ATTRIBUTES):
+        totals = totals + score_weights.get(attr, 0.0) * scores_0_100[:, j]
 
-        scores_dict[attr] = {
-            'raw_class_score': raw_score_1K,
-            'score_0_100': score_0_100,
-            'label_ar': arabic_labels.get(attr, attr),
-            'top_indices': top_indices.cpu().tolist(),
-            'top_probs': top_probs.cpu().tolist()
+    results = []
+    for b in range(B):
+        scores_dict = {}
+        for j, attr in enumerate(BEAUTY_ATTRIBUTES):
+            scores_dict[attr] = {
+                'raw_class_score': float(raw_scores[b, j]),
+                'score_0_100': float(scores_0_100[b, j]),
+                'label_ar': arabic_labels.get(attr, attr),
+                'top_indices': top_idx_np[b, j].tolist(),
+                'top_probs': top_probs_np[b, j].tolist()
+            }
+
+        # Category (0 = Beautiful, 1 = Ugly)
+        cat_pred_b = int(cat_pred_np[b])
+        scores_dict['category_encoded'] = {
+            'predicted_class': cat_pred_b,
+            'predicted_label': "Beautiful" if cat_pred_b == 0 else "Ugly",
+            'probs': cat_probs_np[b].tolist(),
+            'label_ar': arabic_labels.get('category_encoded', 'الفئة')
         }
 
-        w = score_weights.get(attr, 0.0)
-        total_weighted += w * score_0_100
+        total_beauty_score = float(totals[b])
+        star_rating = total_beauty_score / 20.0  # 0–5
+        results.append((scores_dict, total_beauty_score, star_rating))
 
-    # Category (0 = Beautiful, 1 = Ugly)
-    cat_logits = outputs['category_encoded']
-    cat_probs = torch.softmax(cat_logits, dim=-1)[0].cpu().numpy()
-    cat_pred = int(torch.argmax(cat_logits, dim=-1).item())
-    cat_label_txt = "Beautiful" if cat_pred == 0 else "Ugly"
-
-    scores_dict['category_encoded'] = {
-        'predicted_class': cat_pred,
-        'predicted_label': cat_label_txt,
-        'probs': cat_probs.tolist(),
-        'label_ar': arabic_labels.get('category_encoded', 'الفئة')
-    }
+    return results
 
-    total_beauty_score = total_weighted
-    star_rating = total_beauty_score / 20.0  # 0–5
 
-    return scores_dict, total_beauty_score, star_rating
+def calculate_beauty_scores(
+    outputs: Dict[str, torch.Tensor],
+    num_beauty_classes: int = 10,
+    arabic_labels: Dict[str, str] = ARABIC_SCORE_LABELS,
+    score_weights: Dict[str, float] = SCORE_WEIGHTS,
+    top_k: int = 10
+):
+    """
+    Convert logits to per-attribute 0–100 scores using only top-K probabilities.
+    - Softmax over all classes.
+    - Take top-K classes and probabilities.
+    - Renormalize top-K probabilities so they sum to 1.
+    - Compute expected class index with only top-K.
+    Scores the first row of outputs; see calculate_beauty_scores_batch for all rows.
+    """
+    first_row = {name: logits[:1] for name, logits in outputs.items()}
+    return calculate_beauty_scores_batch(
+        first_row,
+        num_beauty_classes=num_beauty_classes,
+        arabic_labels=arabic_labels,
+        score_weights=score_weights,
+        top_k=top_k
+    )[0]
 
 
 # ==========================================
@@ -617,17 +842,14 @@ def run_full_inference_pipeline(
     enlarged_body_box = enlarge_bbox((bx1, by1, bx2, by2), W, H, percentage=0.05)
     ebx1, eby1, ebx2, eby2 = enlarged_body_box
 
-    body_mask_full = None
-    if body_results.masks is not None and len(body_results.masks.data) > best_body_idx:
-        m = body_results.masks.data[best_body_idx].cpu().numpy()
-        body_mask_full = cv2.resize(m, (W, H), interpolation=cv2.INTER_NEAREST)
-        body_mask_full = (body_mask_full > 0.5).astype(np.uint8)
-
     body_crop = original_image_rgb[eby1:eby2, ebx1:ebx2].copy()
-    if body_mask_full is not None:
-        body_mask_crop = body_mask_full[eby1:eby2, ebx1:ebx2]
+
+    # Body mask only materialised for the enlarged body box, at 224x224
+    if body_results.masks is not None and len(body_results.masks.data) > best_body_idx:
+        m = _unletterbox_mask(body_results.masks.data[best_body_idx].cpu().numpy(), H, W)
+        body_mask_crop = upsample_mask_roi(m, H, W, enlarged_body_box)
     else:
-        body_mask_crop = np.zeros(body_crop.shape[:2], dtype=np.uint8)
+        body_mask_crop = np.zeros((224, 224), dtype=np.uint8)
 
     face_results = face_yolo_model.predict(
         body_crop, conf=0.25, iou=0.5, verbose=False
@@ -654,30 +876,23 @@ def run_full_inference_pipeline(
         face_box_global = (ebx1 + efx1_c, eby1 + efy1_c, ebx1 + efx2_c, eby1 + efy2_c)
 
         if face_results.masks is not None and len(face_results.masks.data) > best_face_idx:
-            fm = face_results.masks.data[best_face_idx].cpu().numpy()
-            fm_full = cv2.resize(fm, (body_crop.shape[1], body_crop.shape[0]),
-                                 interpolation=cv2.INTER_NEAREST)
-            fm_full = (fm_full > 0.5).astype(np.uint8)
-            face_mask_crop = fm_full[efy1_c:efy2_c, efx1_c:efx2_c]
+            fm = _unletterbox_mask(face_results.masks.data[best_face_idx].cpu().numpy(),
+                                   body_crop.shape[0], body_crop.shape[1])
+            face_mask_crop = upsample_mask_roi(
+                fm, body_crop.shape[0], body_crop.shape[1], enlarged_face_bbox_in_crop
+            )
         else:
-            face_mask_crop = np.zeros(face_crop.shape[:2], dtype=np.uint8)
+            face_mask_crop = np.zeros((224, 224), dtype=np.uint8)
 
         face_present_flag = True
 
-    beauty_scorer_model = beauty_scorer_model.to(device)
-    beauty_scorer_model.eval()
-
     if body_crop.size == 0 or body_crop.shape[0] == 0 or body_crop.shape[1] == 0:
         body_img_t = torch.zeros(1, 3, 224, 224, device=device)
         body_mask_t = torch.zeros(1, 1, 224, 224, device=device)
         body_present = torch.tensor([False], device=device)
     else:
-        body_img_pil = Image.fromarray(body_crop)
-        body_img_t = image_transform(body_img_pil).unsqueeze(0).to(device)
-
-        body_mask_pil = Image.fromarray((body_mask_crop * 255).astype(np.uint8))
-        body_mask_t = mask_transform(body_mask_pil).unsqueeze(0).to(device)
-        body_mask_t = (body_mask_t > 0.5).float()
+        body_img_t = image_transform(body_crop).unsqueeze(0).to(device)
+        body_mask_t = mask_transform(body_mask_crop).unsqueeze(0).to(device)
         body_present = torch.tensor([True], device=device)
 
     if not face_present_flag or face_crop is None or face_crop.size == 0 \
@@ -686,12 +901,8 @@ def run_full_inference_pipeline(
         face_mask_t = torch.zeros(1, 1, 224, 224, device=device)
         face_present = torch.tensor([False], device=device)
     else:
-        face_img_pil = Image.fromarray(face_crop)
-        face_img_t = image_transform(face_img_pil).unsqueeze(0).to(device)
-
-        face_mask_pil = Image.fromarray((face_mask_crop * 255).astype(np.uint8))
-        face_mask_t = mask_transform(face_mask_pil).unsqueeze(0).to(device)
-        face_mask_t = (face_mask_t > 0.5).float()
+        face_img_t = image_transform(face_crop).unsqueeze(0).to(device)
+        face_mask_t = mask_transform(face_mask_crop).unsqueeze(0).to(device)
         face_present = torch.tensor([True], device=device)
 
     with torch.no_grad():
@@ -727,48 +938,327 @@ def run_full_inference_pipeline(
     }
 
 
+def image_to_base64(image_array):
+    """Convert numpy array to base64 string"""
+    _, buffer = cv2.imencode('.png', image_array)
+    return base64.b64encode(buffer).decode('utf-8')
+
+
+def create_annotated_image(ctx, body_bbox, face_bbox=None):
+    """Create annotated image with bounding boxes from an already decoded ImageContext"""
+    with stage('annotation'):
+        # Draw straight onto the BGR copy that gets PNG-encoded (colors are BGR)
+        image_bgr = ctx.to_bgr()
+
+        if body_bbox:
+            x1, y1, x2, y2 = body_bbox
+            cv2.rectangle(image_bgr, (x1, y1), (x2, y2), (0, 255, 0), 3)
+            cv2.putText(image_bgr, "Body", (x1, y1 - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        if face_bbox:
+            x1, y1, x2, y2 = face_bbox
+            cv2.rectangle(image_bgr, (x1, y1), (x2, y2), (0, 0, 255), 3)
+            cv2.putText(image_bgr, "Face", (x1, y1 - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+        return image_to_base64(image_bgr)
 
-from typing import Any
 
 # ==========================================================
 # PART 6: NON-VISUAL INFERENCE HELPERS
 # ==========================================================
 
-def infer_single_image(
-    image_path: str,
-    body_yolo_model: YOLO,
-    face_yolo_model: YOLO,
-    beauty_scorer_model: CamelBeautyScorer,
-    image_transform,
-    mask_transform,
-    num_beauty_classes: int = 10,
-    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[Dict[str, Any]]]:
+# Images whose header declares more pixels are rejected before decoding.
+# Pillow refuses images above 2 * Image.MAX_IMAGE_PIXELS (~179 MP) on its own.
+DEFAULT_MAX_DECODE_PIXELS = 150_000_000
+
+# Decoder-side reductions, largest first: JPEG is decoded at 1/2, 1/4 or 1/8
+# size by libjpeg's DCT scaling; other formats are decoded and then shrunk
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+_EXIF_ORIENTATION = 0x0112
+
+
+class DecompressionBombError(ValueError):
+    """Raised when an image declares more pixels than the decode limit"""
+
+
+def _apply_exif_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotate / flip decoded pixels so they display upright (EXIF orientation 1-8)."""
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def _decode_info(original_w: int, original_h: int, image: np.ndarray,
+                 reduction: int = 1, orientation: int = 1) -> Dict[str, Any]:
+    h, w = image.shape[:2]
+    return {
+        'original_size': [original_w, original_h],
+        'decoded_size': [w, h],
+        'scale': max(w, h) / max(original_w, original_h, 1),
+        'decoder_reduction': reduction,
+        'exif_orientation': orientation
+    }
+
+
+def decode_image_bounded(
+    data: bytes,
+    max_side: Optional[int] = None,
+    max_pixels: Optional[int] = DEFAULT_MAX_DECODE_PIXELS
+) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
     """
-    Run inference on a single image WITHOUT printing or visualization.
+    Decode encoded image bytes into an upright RGB array whose longer side is
+    at most max_side (None: native resolution).
+
+    Only the header is parsed first: images declaring more than max_pixels
+    pixels raise DecompressionBombError before anything is decoded. The
+    largest decoder-side reduction (1/2, 1/4, 1/8) that keeps the longer side
+    >= max_side is used, then the rest is done with an INTER_AREA resize.
+    EXIF orientation is applied to the (already small) result.
+
+    Returns (rgb, info) or None if the bytes are not a decodable image; info
+    has original_size / decoded_size ([w, h], upright) and scale (decoded /
+    original, so original coordinates = decoded coordinates / scale).
+    """
+    if not data:
+        return None
+    buf = np.frombuffer(data, dtype=np.uint8)
 
-    Returns:
-        body_bbox_global: (x1, y1, x2, y2) of the selected camel body in original image coords,
-                          or None if no body detected / error.
-        result_dict: {
-            'scores_dict': <full per-attribute dict>,
-            'total_score_0_100': float,
-            'star_rating_0_5': float
-        } or None if no result.
+    try:
+        with Image.open(io.BytesIO(data)) as header:
+            width, height = header.size
+            orientation = header.getexif().get(_EXIF_ORIENTATION, 1)
+        parsed = True
+    except Image.DecompressionBombError as e:
+        raise DecompressionBombError(str(e)) from e
+    except Exception:
+        # Not a header Pillow can parse; let OpenCV try it at full size
+        parsed = False
+
+    if not parsed:
+        image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        if max_pixels is not None and width * height > max_pixels:
+            raise DecompressionBombError(f'Image has {width * height} pixels (limit {max_pixels})')
+        orientation, reduction = 1, 1
+    else:
+        if max_pixels is not None and width * height > max_pixels:
+            raise DecompressionBombError(f'Image has {width * height} pixels (limit {max_pixels})')
+        if orientation not in range(1, 9):
+            orientation = 1
+
+        flags, reduction = cv2.IMREAD_COLOR, 1
+        if max_side is not None:
+            for factor, reduced_flags in _REDUCED_DECODE_FLAGS:
+                if max(width, height) // factor >= max_side:
+                    flags, reduction = reduced_flags, factor
+                    break
+        # Orientation is applied below, after shrinking
+        image = cv2.imdecode(buf, flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is None:
+            return None
+
+    if max_side is not None and max(image.shape[:2]) > max_side:
+        h, w = image.shape[:2]
+        ratio = max_side / max(h, w)
+        image = cv2.resize(
+            image, (max(1, round(w * ratio)), max(1, round(h * ratio))),
+            interpolation=cv2.INTER_AREA
+        )
+
+    image = _apply_exif_orientation(image, orientation)
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    return image, _decode_info(width, height, image, reduction, orientation)
+
+
+def load_image_bounded(
+    source: Union[str, bytes, np.ndarray],
+    max_side: Optional[int] = None,
+    max_pixels: Optional[int] = DEFAULT_MAX_DECODE_PIXELS
+) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
     """
-    original_image = cv2.imread(image_path)
-    if original_image is None:
-        return None, None
+    decode_image_bounded for a file path, encoded image bytes or an RGB array
+    (returned as-is, scale 1). Returns None if the image cannot be read.
+    """
+    if isinstance(source, np.ndarray):
+        h, w = source.shape[:2]
+        return source, _decode_info(w, h, source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image_bounded(bytes(source), max_side, max_pixels)
 
-    original_image_rgb = cv2.cvtColor(original_image, cv2.COLOR_BGR2RGB)
-    H, W, _ = original_image_rgb.shape
+    try:
+        with open(source, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return decode_image_bounded(data, max_side, max_pixels)
+
+
+def load_image_rgb(source: Union[str, bytes, np.ndarray]) -> Optional[np.ndarray]:
+    """
+    Get an RGB array from a file path, encoded image bytes or an RGB array
+    (returned as-is). Returns None if the image cannot be read.
+    """
+    loaded = load_image_bounded(source)
+    return loaded[0] if loaded is not None else None
 
-    body_results = body_yolo_model.predict(
-        original_image_rgb, conf=0.5, iou=0.5, verbose=False
-    )[0]
+
+class ImageContext:
+    """
+    One decoded image shared by every pipeline stage (detection, scoring, annotation).
+
+    The pixels are decoded exactly once into `rgb`; detection fills `body` and
+    `face` (see _select_best_body / _select_best_face), whose crops are views
+    into `rgb` rather than copies. The scorer sample is built lazily and cached.
+    `decode_info` describes the decode (see decode_image_bounded); boxes are in
+    the coordinates of `rgb`, i.e. scaled by decode_info['scale'].
+    """
+
+    def __init__(self, rgb: np.ndarray, source: Any = None, decode_info: Optional[Dict[str, Any]] = None):
+        self.rgb = rgb
+        self.source = source
+        self.decode_info = decode_info if decode_info is not None else \
+            _decode_info(rgb.shape[1], rgb.shape[0], rgb)
+        self.body = None
+        self.face = None
+        self._scorer_sample = None
+
+    @classmethod
+    def from_source(
+        cls,
+        source: Union[str, bytes, np.ndarray],
+        max_side: Optional[int] = None,
+        max_pixels: Optional[int] = DEFAULT_MAX_DECODE_PIXELS
+    ) -> Optional['ImageContext']:
+        """
+        Build from a path, encoded bytes or RGB array, decoded to at most
+        max_side px (see decode_image_bounded); None if undecodable.
+        """
+        with stage('decode'):
+            loaded = load_image_bounded(source, max_side, max_pixels)
+        if loaded is None:
+            return None
+        rgb, info = loaded
+        return cls(rgb, source=source if isinstance(source, str) else None, decode_info=info)
+
+    @classmethod
+    def from_pil(cls, image: Image.Image) -> 'ImageContext':
+        return cls(np.asarray(image.convert('RGB')))
+
+    @property
+    def height(self) -> int:
+        return self.rgb.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.rgb.shape[1]
+
+    @property
+    def body_bbox(self) -> Optional[Tuple[int, int, int, int]]:
+        return self.body['body_bbox'] if self.body is not None else None
+
+    @property
+    def body_crop(self) -> Optional[np.ndarray]:
+        return self.body['body_crop'] if self.body is not None else None
+
+    @property
+    def body_mask_crop(self) -> Optional[np.ndarray]:
+        return self.body['body_mask_crop'] if self.body is not None else None
+
+    @property
+    def face_crop(self) -> Optional[np.ndarray]:
+        return self.face['face_crop'] if self.face is not None else None
+
+    @property
+    def face_mask_crop(self) -> Optional[np.ndarray]:
+        return self.face['face_mask_crop'] if self.face is not None else None
+
+    @property
+    def face_bbox(self) -> Optional[Tuple[int, int, int, int]]:
+        """Enlarged face box in original image coords, or None if no face."""
+        if self.body is None or self.face is None:
+            return None
+        ebx1, eby1, _, _ = self.body['enlarged_body_bbox']
+        efx1, efy1, efx2, efy2 = self.face['enlarged_face_bbox_in_crop']
+        return (ebx1 + efx1, eby1 + efy1, ebx1 + efx2, eby1 + efy2)
+
+    def scorer_sample(self, image_transform, mask_transform) -> Optional[Dict[str, torch.Tensor]]:
+        """CamelBeautyScorer sample for this image (cached), or None if no body."""
+        if self.body is None:
+            return None
+        if self._scorer_sample is None:
+            with stage('preprocessing'):
+                self._scorer_sample = build_scorer_sample(
+                    self.body_crop, self.body_mask_crop,
+                    self.face_crop, self.face_mask_crop,
+                    image_transform, mask_transform
+                )
+        return self._scorer_sample
+
+    def to_bgr(self) -> np.ndarray:
+        """Fresh BGR copy of the pixels (for cv2 drawing / encoding)."""
+        return cv2.cvtColor(self.rgb, cv2.COLOR_RGB2BGR)
+
+    def release_pixels(self) -> None:
+        """Drop the full-size pixels and crop views once they are no longer needed."""
+        self.rgb = None
+        self.body = None
+        self.face = None
+
+
+def _unletterbox_mask(mask: np.ndarray, target_h: int, target_w: int) -> np.ndarray:
+    """
+    Strip the letterbox padding YOLO added around the image from a masks.data map,
+    so that the remaining region maps 1:1 onto a target_h x target_w image.
+    Batched predict() pads differently shaped inputs to a common square, so
+    masks can no longer be resized straight to the image size.
+    """
+    mh, mw = mask.shape[:2]
+    gain = min(mh / target_h, mw / target_w)
+    # Same rounding as the letterbox itself (ultralytics LetterBox, onnx_yolo.letterbox)
+    new_w, new_h = int(round(target_w * gain)), int(round(target_h * gain))
+    top = int(round((mh - new_h) / 2 - 0.1))
+    left = int(round((mw - new_w) / 2 - 0.1))
+    return mask[top:top + new_h, left:left + new_w]
+
+
+def _select_best_body(
+    original_image_rgb: np.ndarray,
+    body_results
+) -> Optional[Dict[str, Any]]:
+    """
+    Pick the most confident body detection and cut its enlarged crop + mask.
+
+    Returns None when no body was detected, otherwise a dict with
+    'body_bbox' (raw YOLO box), 'enlarged_body_bbox', 'body_crop' and
+    'body_mask_crop' (uint8 0/1 mask of the crop, already at the 224x224
+    scorer resolution -- see upsample_mask_roi).
+    """
+    H, W, _ = original_image_rgb.shape
 
     if body_results.boxes is None or len(body_results.boxes) == 0:
-        return None, None
+        return None
 
     best_body_idx = int(torch.argmax(body_results.boxes.conf).item())
     best_body_box = body_results.boxes.xyxy[best_body_idx].cpu().numpy()
@@ -777,104 +1267,394 @@ def infer_single_image(
     enlarged_body_box = enlarge_bbox((bx1, by1, bx2, by2), W, H, percentage=0.05)
     ebx1, eby1, ebx2, eby2 = enlarged_body_box
 
-    body_mask_full = None
-    if body_results.masks is not None and len(body_results.masks.data) > best_body_idx:
-        m = body_results.masks.data[best_body_idx].cpu().numpy()
-        body_mask_full = cv2.resize(m, (W, H), interpolation=cv2.INTER_NEAREST)
-        body_mask_full = (body_mask_full > 0.5).astype(np.uint8)
+    # View into the decoded image; crops are never written to
+    body_crop = original_image_rgb[eby1:eby2, ebx1:ebx2]
 
-    body_crop = original_image_rgb[eby1:eby2, ebx1:ebx2].copy()
-    if body_mask_full is not None:
-        body_mask_crop = body_mask_full[eby1:eby2, ebx1:ebx2]
+    if body_results.masks is not None and len(body_results.masks.data) > best_body_idx:
+        m = _unletterbox_mask(body_results.masks.data[best_body_idx].cpu().numpy(), H, W)
+        body_mask_crop = upsample_mask_roi(m, H, W, enlarged_body_box)
     else:
-        body_mask_crop = None
+        body_mask_crop = np.zeros((224, 224), dtype=np.uint8)
 
-    face_results = face_yolo_model.predict(
-        body_crop, conf=0.25, iou=0.5, verbose=False
-    )[0]
+    return {
+        'body_bbox': (bx1, by1, bx2, by2),
+        'enlarged_body_bbox': enlarged_body_box,
+        'body_crop': body_crop,
+        'body_mask_crop': body_mask_crop
+    }
 
-    face_present_flag = False
-    face_crop = None
-    face_mask_crop = None
 
-    if face_results.boxes is not None and len(face_results.boxes) > 0:
-        best_face_idx = int(torch.argmax(face_results.boxes.conf).item())
-        fbox_crop = face_results.boxes.xyxy[best_face_idx].cpu().numpy()
-        fx1_c, fy1_c, fx2_c, fy2_c = map(int, fbox_crop)
+def _select_best_face(
+    body_crop: np.ndarray,
+    face_results
+) -> Optional[Dict[str, Any]]:
+    """
+    Pick the most confident face detection inside a body crop.
 
-        enlarged_face_bbox_in_crop = enlarge_bbox(
-            (fx1_c, fy1_c, fx2_c, fy2_c),
-            body_crop.shape[1], body_crop.shape[0],
-            percentage=0.05
+    Returns None when no face was found, otherwise a dict with
+    'enlarged_face_bbox_in_crop', 'face_crop' and 'face_mask_crop'
+    (224x224, like 'body_mask_crop').
+    """
+    if face_results.boxes is None or len(face_results.boxes) == 0:
+        return None
+
+    best_face_idx = int(torch.argmax(face_results.boxes.conf).item())
+    fbox_crop = face_results.boxes.xyxy[best_face_idx].cpu().numpy()
+    fx1_c, fy1_c, fx2_c, fy2_c = map(int, fbox_crop)
+
+    enlarged_face_bbox_in_crop = enlarge_bbox(
+        (fx1_c, fy1_c, fx2_c, fy2_c),
+        body_crop.shape[1], body_crop.shape[0],
+        percentage=0.05
+    )
+    efx1_c, efy1_c, efx2_c, efy2_c = enlarged_face_bbox_in_crop
+
+    face_crop = body_crop[efy1_c:efy2_c, efx1_c:efx2_c]
+
+    if face_results.masks is not None and len(face_results.masks.data) > best_face_idx:
+        fm = _unletterbox_mask(face_results.masks.data[best_face_idx].cpu().numpy(),
+                               body_crop.shape[0], body_crop.shape[1])
+        face_mask_crop = upsample_mask_roi(
+            fm, body_crop.shape[0], body_crop.shape[1], enlarged_face_bbox_in_crop
         )
-        efx1_c, efy1_c, efx2_c, efy2_c = enlarged_face_bbox_in_crop
+    else:
+        face_mask_crop = np.zeros((224, 224), dtype=np.uint8)
 
-        face_crop = body_crop[efy1_c:efy2_c, efx1_c:efx2_c].copy()
+    return {
+        'enlarged_face_bbox_in_crop': enlarged_face_bbox_in_crop,
+        'face_crop': face_crop,
+        'face_mask_crop': face_mask_crop
+    }
 
-        if face_results.masks is not None and len(face_results.masks.data) > best_face_idx:
-            fm = face_results.masks.data[best_face_idx].cpu().numpy()
-            fm_full = cv2.resize(fm, (body_crop.shape[1], body_crop.shape[0]),
-                                 interpolation=cv2.INTER_NEAREST)
-            fm_full = (fm_full > 0.5).astype(np.uint8)
-            face_mask_crop = fm_full[efy1_c:efy2_c, efx1_c:efx2_c]
-        else:
-            face_mask_crop = None
 
-        face_present_flag = True
+def build_scorer_sample(
+    body_crop: Optional[np.ndarray],
+    body_mask_crop: Optional[np.ndarray],
+    face_crop: Optional[np.ndarray],
+    face_mask_crop: Optional[np.ndarray],
+    image_transform,
+    mask_transform
+) -> Dict[str, torch.Tensor]:
+    """
+    Turn body/face crops + masks into one (unbatched) CamelBeautyScorer sample:
+    {'body_image': (3,224,224), 'body_mask': (1,224,224), 'body_present': bool tensor,
+     'face_image': (3,224,224), 'face_mask': (1,224,224), 'face_present': bool tensor}
+    Missing or empty crops become zero tensors with the present flag cleared.
+    Masks may come at crop size or already at 224x224 (mask_transform's NEAREST
+    resize is then a no-op).
+    """
+    sample = {}
+    for prefix, crop, mask_crop in (('body', body_crop, body_mask_crop),
+                                    ('face', face_crop, face_mask_crop)):
+        if crop is None or crop.size == 0 or crop.shape[0] == 0 or crop.shape[1] == 0:
+            sample[f'{prefix}_image'] = torch.zeros(3, 224, 224)
+            sample[f'{prefix}_mask'] = torch.zeros(1, 224, 224)
+            sample[f'{prefix}_present'] = torch.tensor(False)
+            continue
 
-    beauty_scorer_model = beauty_scorer_model.to(device)
-    beauty_scorer_model.eval()
+        if mask_crop is None:
+            mask_crop = np.zeros(crop.shape[:2], dtype=np.uint8)
 
-    if body_crop.size == 0 or body_crop.shape[0] == 0 or body_crop.shape[1] == 0:
-        body_img_t = torch.zeros(1, 3, 224, 224, device=device)
-        body_mask_t = torch.zeros(1, 1, 224, 224, device=device)
-        body_present = torch.tensor([False], device=device)
-    else:
-        body_img_pil = Image.fromarray(body_crop)
-        body_img_t = image_transform(body_img_pil).unsqueeze(0).to(device)
+        # image_transform / mask_transform take uint8 NumPy arrays directly
+        # (see preprocessing.py); masks come out already binarised.
+        sample[f'{prefix}_image'] = image_transform(crop)
+        sample[f'{prefix}_mask'] = mask_transform(mask_crop)
+        sample[f'{prefix}_present'] = torch.tensor(True)
 
-        body_mask_pil = Image.fromarray((body_mask_crop * 255).astype(np.uint8))
-        body_mask_t = mask_transform(body_mask_pil).unsqueeze(0).to(device)
-        body_mask_t = (body_mask_t > 0.5).float()
-        body_present = torch.tensor([True], device=device)
+    return sample
 
-    if not face_present_flag or face_crop is None or face_crop.size == 0 \
-       or face_crop.shape[0] == 0 or face_crop.shape[1] == 0:
-        face_img_t = torch.zeros(1, 3, 224, 224, device=device)
-        face_mask_t = torch.zeros(1, 1, 224, 224, device=device)
-        face_present = torch.tensor([False], device=device)
-    else:
-        face_img_pil = Image.fromarray(face_crop)
-        face_img_t = image_transform(face_img_pil).unsqueeze(0).to(device)
 
-        face_mask_pil = Image.fromarray((face_mask_crop * 255).astype(np.uint8))
-        face_mask_t = mask_transform(face_mask_pil).unsqueeze(0).to(device)
-        face_mask_t = (face_mask_t > 0.5).float()
-        face_present = torch.tensor([True], device=device)
+def score_scorer_samples(
+    samples: List[Dict[str, torch.Tensor]],
+    beauty_scorer_model: CamelBeautyScorer,
+    num_beauty_classes: int = 10,
+    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu"),
+    max_batch_size: int = 16,
+    buffers: Optional[BatchBuffers] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run CamelBeautyScorer over many samples (see build_scorer_sample), stacking
+    them into mini-batches of at most max_batch_size and running one forward
+    per mini-batch. The body_present/face_present masks let a single forward
+    mix samples with and without a detected face.
+    If buffers (preallocated on device) are given, mini-batches are written
+    into them instead of freshly stacked tensors.
+
+    Returns one result_dict per sample, in input order:
+        {'scores_dict': ..., 'total_score_0_100': float, 'star_rating_0_5': float}
+    """
+    results = []
+    max_batch_size = max(1, int(max_batch_size))
+    if buffers is not None:
+        max_batch_size = min(max_batch_size, buffers.max_batch_size)
+
+    for start in range(0, len(samples), max_batch_size):
+        chunk = samples[start:start + max_batch_size]
+        with stage('scorer_forward', items=len(chunk)):
+            if buffers is not None:
+                batch = buffers.fill(chunk)
+            else:
+                batch = {
+                    key: torch.stack([s[key] for s in chunk]).to(device)
+                    for key in BatchBuffers.KEYS
+                }
+
+            with torch.no_grad():
+                outputs = beauty_scorer_model(
+                    body_image=batch['body_image'],
+                    face_image=batch['face_image'],
+                    body_mask=batch['body_mask'],
+                    face_mask=batch['face_mask'],
+                    body_present=batch['body_present'],
+                    face_present=batch['face_present']
+                )
 
-    with torch.no_grad():
-        outputs = beauty_scorer_model(
-            body_image=body_img_t,
-            face_image=face_img_t,
-            body_mask=body_mask_t,
-            face_mask=face_mask_t,
-            body_present=body_present,
-            face_present=face_present
+        with stage('scoring', items=len(chunk)):
+            for scores_dict, total_score, star_rating in calculate_beauty_scores_batch(
+                outputs, num_beauty_classes=num_beauty_classes
+            ):
+                results.append({
+                    'scores_dict': scores_dict,
+                    'total_score_0_100': float(total_score),
+                    'star_rating_0_5': float(star_rating)
+                })
+
+    return results
+
+
+def predict_in_batches(
+    yolo_model: YOLO,
+    images: List[np.ndarray],
+    batch_size: int = 8,
+    **predict_kwargs
+) -> List[Any]:
+    """
+    Run yolo_model.predict on a list of images, at most batch_size images per call.
+    Returns one Results object per input image, in input order.
+    """
+    results = []
+    batch_size = max(1, int(batch_size))
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        results.extend(yolo_model.predict(chunk, verbose=False, **predict_kwargs))
+    return results
+
+
+def detect_image_contexts(
+    contexts: List[ImageContext],
+    body_yolo_model: YOLO,
+    face_yolo_model: YOLO,
+    detection_batch_size: int = 8
+) -> None:
+    """
+    Batched detection + cropping for many images, filling ctx.body / ctx.face:
+    - body segmentation over all images (batched predict calls)
+    - face segmentation over all resulting body crops (batched predict calls)
+    Each Results object keeps its own orig_shape, so boxes stay in the frame of
+    the image / body crop they came from.
+    """
+    if not contexts:
+        return
+
+    with stage('body_yolo', items=len(contexts)):
+        body_results_list = predict_in_batches(
+            body_yolo_model, [ctx.rgb for ctx in contexts],
+            detection_batch_size, conf=0.5, iou=0.5
         )
 
-    scores_dict, total_score, star_rating = calculate_beauty_scores(
-        outputs, num_beauty_classes=num_beauty_classes
+        for ctx, body_results in zip(contexts, body_results_list):
+            ctx.body = _select_best_body(ctx.rgb, body_results)
+            ctx.face = None
+
+    with_body = [ctx for ctx in contexts if ctx.body is not None]
+    if not with_body:
+        return
+
+    with stage('face_yolo', items=len(with_body)):
+        face_results_list = predict_in_batches(
+            face_yolo_model, [ctx.body_crop for ctx in with_body],
+            detection_batch_size, conf=0.25, iou=0.5
+        )
+
+        for ctx, face_results in zip(with_body, face_results_list):
+            ctx.face = _select_best_face(ctx.body_crop, face_results)
+
+
+def prepare_images_for_scoring(
+    images_rgb: List[np.ndarray],
+    body_yolo_model: YOLO,
+    face_yolo_model: YOLO,
+    image_transform,
+    mask_transform,
+    detection_batch_size: int = 8
+) -> List[Tuple[Optional[Tuple[int, int, int, int]], Optional[Dict[str, torch.Tensor]]]]:
+    """
+    Batched detection + cropping for many RGB images (see detect_image_contexts).
+
+    Returns one (body_bbox_global, scorer_sample) pair per image, or
+    (None, None) where no body was detected.
+    """
+    contexts = [ImageContext(image_rgb) for image_rgb in images_rgb]
+    detect_image_contexts(contexts, body_yolo_model, face_yolo_model, detection_batch_size)
+
+    return [
+        (ctx.body_bbox, ctx.scorer_sample(image_transform, mask_transform))
+        if ctx.body is not None else (None, None)
+        for ctx in contexts
+    ]
+
+
+def infer_image_context(
+    ctx: ImageContext,
+    body_yolo_model: YOLO,
+    face_yolo_model: YOLO,
+    beauty_scorer_model: CamelBeautyScorer,
+    image_transform,
+    mask_transform,
+    num_beauty_classes: int = 10,
+    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[Dict[str, Any]]]:
+    """
+    Same as infer_single_image, but on an ImageContext. Detection results stay
+    on ctx (ctx.body, ctx.face, ctx.face_bbox) for later stages such as annotation.
+    """
+    detect_image_contexts([ctx], body_yolo_model, face_yolo_model)
+    sample = ctx.scorer_sample(image_transform, mask_transform)
+    if sample is None:
+        return None, None
+
+    result_dict = score_scorer_samples(
+        [sample], beauty_scorer_model,
+        num_beauty_classes=num_beauty_classes, device=device
+    )[0]
+
+    return ctx.body_bbox, result_dict
+
+
+def infer_single_image(
+    image_path: str,
+    body_yolo_model: YOLO,
+    face_yolo_model: YOLO,
+    beauty_scorer_model: CamelBeautyScorer,
+    image_transform,
+    mask_transform,
+    num_beauty_classes: int = 10,
+    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu"),
+    decode_max_side: Optional[int] = None
+) -> Tuple[Optional[Tuple[int, int, int, int]], Optional[Dict[str, Any]]]:
+    """
+    Run inference on a single image WITHOUT printing or visualization.
+    With decode_max_side the image is decoded to at most that many pixels on
+    its longer side (see decode_image_bounded).
+
+    Returns:
+        body_bbox_global: (x1, y1, x2, y2) of the selected camel body in original image coords
+                          (decoded coords when decode_max_side shrank the image),
+                          or None if no body detected / error.
+        result_dict: {
+            'scores_dict': <full per-attribute dict>,
+            'total_score_0_100': float,
+            'star_rating_0_5': float
+        } or None if no result.
+    """
+    ctx = ImageContext.from_source(image_path, max_side=decode_max_side)
+    if ctx is None:
+        return None, None
+
+    return infer_image_context(
+        ctx,
+        body_yolo_model=body_yolo_model,
+        face_yolo_model=face_yolo_model,
+        beauty_scorer_model=beauty_scorer_model,
+        image_transform=image_transform,
+        mask_transform=mask_transform,
+        num_beauty_classes=num_beauty_classes,
+        device=device
     )
 
-    body_bbox_global = (bx1, by1, bx2, by2)
 
-    result_dict = {
-        'scores_dict': scores_dict,
-        'total_score_0_100': float(total_score),
-        'star_rating_0_5': float(star_rating)
-    }
+def infer_images_batched(
+    images: List[Union[str, bytes, np.ndarray]],
+    body_yolo_model: YOLO,
+    face_yolo_model: YOLO,
+    beauty_scorer_model: CamelBeautyScorer,
+    image_transform,
+    mask_transform,
+    num_beauty_classes: int = 10,
+    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu"),
+    max_batch_size: int = 16,
+    detection_batch_size: int = 8,
+    on_detected: Optional[Callable[[int, ImageContext], None]] = None,
+    decode_max_side: Optional[int] = None,
+    decode_max_pixels: Optional[int] = DEFAULT_MAX_DECODE_PIXELS
+) -> List[Tuple[Optional[Tuple[int, int, int, int]], Optional[Dict[str, Any]]]]:
+    """
+    Cross-image batched version of infer_single_image.
+
+    Body and face YOLO run on lists of up to detection_batch_size images / body
+    crops per predict call. Body/face crops are gathered from all images first,
+    then CamelBeautyScorer runs once per mini-batch of at most max_batch_size
+    crops instead of once per image. Returns one (body_bbox_global, result_dict)
+    pair per input, in input order; both are None for unreadable images,
+    images over decode_max_pixels or images without a body.
+
+    images may be file paths, encoded image bytes or RGB arrays (see load_image_rgb),
+    decoded to at most decode_max_side px (see decode_image_bounded); boxes are
+    in decoded coordinates (ctx.decode_info['scale']).
+    on_detected(index, ctx) is called for every image with a body while its
+    decoded pixels are still available (e.g. to render annotations without
+    decoding the image again); pixels are released right after.
+    beauty_scorer_model is used as given: ModelRuntime places it on device and
+    in eval mode once at load time.
+    """
+    detection_batch_size = max(1, int(detection_batch_size))
+    per_image = [(None, None)] * len(images)
+    sample_owners = []
+    samples = []
+
+    # Decode + detect chunk by chunk so only detection_batch_size full images
+    # are held in memory at once; scorer samples are small (224x224).
+    for start in range(0, len(images), detection_batch_size):
+        chunk_indices = []
+        chunk_contexts = []
+        for idx in range(start, min(start + detection_batch_size, len(images))):
+            try:
+                ctx = ImageContext.from_source(images[idx], decode_max_side, decode_max_pixels)
+            except DecompressionBombError:
+                ctx = None
+            if ctx is None:
+                continue
+            chunk_indices.append(idx)
+            chunk_contexts.append(ctx)
+
+        detect_image_contexts(
+            chunk_contexts, body_yolo_model, face_yolo_model,
+            detection_batch_size=detection_batch_size
+        )
 
-    return body_bbox_global, result_dict
+        for idx, ctx in zip(chunk_indices, chunk_contexts):
+            sample = ctx.scorer_sample(image_transform, mask_transform)
+            if sample is not None:
+                per_image[idx] = (ctx.body_bbox, None)
+                sample_owners.append(idx)
+                samples.append(sample)
+                if on_detected is not None:
+                    on_detected(idx, ctx)
+            ctx.release_pixels()
+
+    if not samples:
+        return per_image
+
+    scored = score_scorer_samples(
+        samples, beauty_scorer_model,
+        num_beauty_classes=num_beauty_classes, device=device,
+        max_batch_size=max_batch_size
+    )
+
+    for idx, res in zip(sample_owners, scored):
+        per_image[idx] = (per_image[idx][0], res)
+
+    return per_image
 
 
 def infer_images_sorted_by_score(
@@ -885,7 +1665,9 @@ def infer_images_sorted_by_score(
     image_transform,
     mask_transform,
     num_beauty_classes: int = 10,
-    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu"),
+    max_batch_size: int = 16,
+    detection_batch_size: int = 8
 ) -> Tuple[List[Tuple[int, int, int, int]], List[Dict[str, Any]]]:
     """
     Run inference on a list of images (no printing/visualization),
@@ -893,20 +1675,24 @@ def infer_images_sorted_by_score(
       - list of body_bbox_global, sorted from highest to lowest total score
       - list of result_dict (same order as bboxes)
     Images where no body is detected are skipped.
+    Scoring is batched across images (see infer_images_batched).
     """
     results = []
 
-    for img_path in image_paths:
-        bbox, res = infer_single_image(
-            image_path=img_path,
-            body_yolo_model=body_yolo_model,
-            face_yolo_model=face_yolo_model,
-            beauty_scorer_model=beauty_scorer_model,
-            image_transform=image_transform,
-            mask_transform=mask_transform,
-            num_beauty_classes=num_beauty_classes,
-            device=device
-        )
+    per_image = infer_images_batched(
+        images=image_paths,
+        body_yolo_model=body_yolo_model,
+        face_yolo_model=face_yolo_model,
+        beauty_scorer_model=beauty_scorer_model,
+        image_transform=image_transform,
+        mask_transform=mask_transform,
+        num_beauty_classes=num_beauty_classes,
+        device=device,
+        max_batch_size=max_batch_size,
+        detection_batch_size=detection_batch_size
+    )
+
+    for img_path, (bbox, res) in zip(image_paths, per_image):
         if bbox is None or res is None:
             continue
 
@@ -930,7 +1716,7 @@ def infer_images_sorted_by_score(
 
 
 # ==========================================
-# PART 5: GLOBAL MODELS, TRANSFORMS, SETUP
+# PART 5: GLOBAL TRANSFORMS, MODEL PATHS, SETUP
 # ==========================================
 
 IMAGE_SIZE = (224, 224)
@@ -938,17 +1724,9 @@ NUM_BEAUTY_SCORES_CLASSES = 10
 NUM_CATEGORY_CLASSES = 2
 FEATURE_DIM = 256
 
-image_transform = transforms.Compose([
-    transforms.Resize(IMAGE_SIZE),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                         std=[0.229, 0.224, 0.225]),
-])
-
-mask_transform = transforms.Compose([
-    transforms.Resize(IMAGE_SIZE, interpolation=transforms.InterpolationMode.NEAREST),
-    transforms.ToTensor(),
-])
+# Tensor-native transforms used by the pipeline (accept NumPy arrays or PIL images)
+image_transform = ImageTransform(IMAGE_SIZE, mean=IMAGENET_MEAN, std=IMAGENET_STD)
+mask_transform = MaskTransform(IMAGE_SIZE)
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -956,27 +1734,8 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 body_seg_model_path = os.path.join(BASE_DIR, 'models/body/best.pt')
 face_seg_model_path = os.path.join(BASE_DIR, 'models/face/best.pt')
 beauty_scorer_checkpoint_path = os.path.join(BASE_DIR, 'models/scorer/best_camel_beauty_all_data_model.pth')
+# `python download_models.py --to-safetensors` writes a .safetensors twin next to
+# it, which model_runtime.ModelRuntime then prefers (memory-mapped)
 
-body_yolo_model = YOLO(body_seg_model_path)
-face_yolo_model = YOLO(face_seg_model_path)
-
-beauty_scorer_model = CamelBeautyScorer(
-    vit_model='google/vit-base-patch16-224',
-    feature_dim=FEATURE_DIM,
-    num_beauty_scores_classes=NUM_BEAUTY_SCORES_CLASSES,
-    num_category_classes=NUM_CATEGORY_CLASSES
-)
-
-ckpt = torch.load(beauty_scorer_checkpoint_path, map_location=device)
-if 'model_state_dict' in ckpt:
-    beauty_scorer_model.load_state_dict(ckpt['model_state_dict'])
-else:
-    beauty_scorer_model.load_state_dict(ckpt)
-
-beauty_scorer_model.to(device)
-beauty_scorer_model.eval()
-
-print(f"Loaded Body_seg YOLO model from: {body_seg_model_path}")
-print(f"Loaded Face_seg YOLO model from: {face_seg_model_path}")
-print(f"Loaded CamelBeautyScorer model from: {beauty_scorer_checkpoint_path}")
-print(f"Models ready on device: {device}")
\ No newline at end of file
+# Models are not loaded at import time: see model_runtime.ModelRuntime, which
+# loads them on first use (already on `device` and in eval mode).
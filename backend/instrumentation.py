@@ -0,0 +1,174 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# ==========================================================
+# PIPELINE STAGE HOOKS
+# ==========================================================
+#
+# Pipeline code wraps each stage in `with stage('body_yolo', items=n):`.
+# Observers (Prometheus metrics, ...) register a hook, a callable
+# (stage_name, items) -> context manager (or None) that is entered around
+# the stage. With no hook registered a stage costs one list check.
+
+STAGES = (
+    'decode',          # encoded upload -> RGB array
+    'body_yolo',       # body predict + best box / mask selection
+    'face_yolo',       # face predict on body crops + best box / mask selection
+    'preprocessing',   # crops / masks -> 224x224 scorer tensors
+    'scorer_forward',  # batch stacking + CamelBeautyScorer forward
+    'scoring',         # calculate_beauty_scores_batch
+    'annotation'       # box drawing + PNG / base64 encoding
+)
+
+StageHook = Callable[[str, int], Optional[ContextManager]]
+
+_hooks: List[StageHook] = []
+_hooks_lock = threading.Lock()
+
+
+def add_stage_hook(hook: StageHook) -> None:
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_stage_hook(hook: StageHook) -> None:
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+@contextmanager
+def stage(name: str, items: int = 1) -> Iterator[None]:
+    """Run the with-block as pipeline stage `name` covering `items` images / crops."""
+    if not _hooks:
+        yield
+        return
+    with ExitStack() as stack:
+        for hook in list(_hooks):
+            cm = hook(name, items)
+            if cm is not None:
+                stack.enter_context(cm)
+        yield
+
+
+# ==========================================================
+# PER-REQUEST TIMINGS (OPT-IN)
+# ==========================================================
+#
+# A request that asked for timings is tracked in a context variable; the
+# stages run in its thread are added to its RequestTimings. Work done on its
+# behalf elsewhere (the micro-batcher's scorer forward) is attributed with
+# attribute_timings(). Requests that did not ask are not tracked, so the
+# hook returns right away for them.
+
+_tracked: ContextVar[Tuple['RequestTimings', ...]] = ContextVar('camel_request_timings', default=())
+
+
+class RequestTimings:
+    """Milliseconds per stage, queue wait, cache outcome and scorer batch sizes of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages_ms: Dict[str, float] = {}
+        self.queue_wait_ms: Optional[float] = None
+        self.scorer_batch_sizes: List[int] = []
+        self.cache_hits: Optional[int] = None
+        self.cache_misses: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float, items: int = 1) -> None:
+        with self._lock:
+            self.stages_ms[name] = self.stages_ms.get(name, 0.0) + seconds * 1000.0
+            if name == 'scorer_forward':
+                self.scorer_batch_sizes.append(items)
+
+    def add_queue_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.queue_wait_ms = (self.queue_wait_ms or 0.0) + seconds * 1000.0
+
+    def record_cache(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.cache_hits = (self.cache_hits or 0) + hits
+            self.cache_misses = (self.cache_misses or 0) + misses
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'total_ms': round(self.total_ms(), 3),
+                'stages_ms': {name: round(ms, 3) for name, ms in self.stages_ms.items()},
+                'queue_wait_ms': round(self.queue_wait_ms, 3) if self.queue_wait_ms is not None else None,
+                'scorer_batch_sizes': list(self.scorer_batch_sizes),
+                'cache': None if self.cache_hits is None else {
+                    'hits': self.cache_hits, 'misses': self.cache_misses
+                }
+            }
+
+    def server_timing(self) -> str:
+        """The same data as a Server-Timing header value."""
+        with self._lock:
+            entries = [f'{name};dur={ms:.3f}' for name, ms in self.stages_ms.items()]
+            if self.queue_wait_ms is not None:
+                entries.append(f'queue_wait;dur={self.queue_wait_ms:.3f}')
+            if self.scorer_batch_sizes:
+                sizes = ' '.join(map(str, self.scorer_batch_sizes))
+                entries.append(f'scorer_batch;desc="{sizes}"')
+            if self.cache_hits is not None:
+                entries.append(f'cache;desc="hits={self.cache_hits} misses={self.cache_misses}"')
+        entries.append(f'total;dur={self.total_ms():.3f}')
+        return ', '.join(entries)
+
+
+def begin_request_timings() -> Tuple[RequestTimings, Token]:
+    """Track a new RequestTimings in the current context; pass the token to end_request_timings."""
+    timings = RequestTimings()
+    return timings, _tracked.set((timings,))
+
+
+def end_request_timings(token: Token) -> None:
+    _tracked.reset(token)
+
+
+def tracked_request_timings() -> Tuple[RequestTimings, ...]:
+    """The RequestTimings the current context's work is attributed to (usually none)."""
+    return _tracked.get()
+
+
+@contextmanager
+def attribute_timings(timings: Sequence[RequestTimings]) -> Iterator[None]:
+    """Attribute the stages run in the with-block to all of `timings`."""
+    token = _tracked.set(tuple(timings))
+    try:
+        yield
+    finally:
+        _tracked.reset(token)
+
+
+@contextmanager
+def _time_for(targets: Tuple[RequestTimings, ...], name: str, items: int) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for timings in targets:
+            timings.add_stage(name, elapsed, items)
+
+
+def _request_timings_hook(name: str, items: int) -> Optional[ContextManager]:
+    targets = _tracked.get()
+    if not targets:
+        return None
+    return _time_for(targets, name, items)
+
+
+def enable_request_timings() -> None:
+    """Record stages into tracked RequestTimings (see begin_request_timings)."""
+    add_stage_hook(_request_timings_hook)
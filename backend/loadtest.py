@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test of the Flask API.
+
+    python loadtest.py [--server flask|gunicorn] [--workers 2] [--concurrency 1,4,16]
+                       [--duration 30] [--mix single=0.8,batch=0.2] [--output load.json]
+    python loadtest.py --url http://host:5000 [--server-pid PID] ...
+
+starts the API locally on random-weight models (see create_stub_app) unless
+--url points at a running server, then drives /api/v1/detect/single and
+/api/v1/detect/batch at each concurrency level in turn and reports latency
+percentiles, error rates, throughput and the server's RSS over time.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+from benchmark import (
+    DEFAULT_RESOLUTIONS,
+    build_random_scorer,
+    build_random_yolo,
+    synthetic_detection,
+    synthetic_image,
+    parse_resolutions
+)
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = {
+    'single': '/api/v1/detect/single',
+    'batch': '/api/v1/detect/batch'
+}
+
+
+# ==========================================================
+# STUB SERVER (RANDOM-WEIGHT MODELS)
+# ==========================================================
+#
+# The stub server is app.py itself -- routes, batcher, cache and annotation
+# unchanged -- with the runtime's models replaced by random-weight ones. The
+# detectors run their real forward for its cost but always report one
+# synthetic camel, so every request goes through cropping, scoring and
+# annotation. Model-loading settings (precision, backends, compile) do not
+# apply; the scorer is the eager fp32 torch model.
+
+class SyntheticDetector:
+    """YOLO stand-in: runs a random-weight YOLO, returns one synthetic detection per image."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, source=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        self.model.predict(images, **kwargs)
+        return [synthetic_detection(*image.shape[:2]) for image in images]
+
+
+def create_stub_app(yolo_config: str = 'yolov8n-seg.yaml'):
+    """
+    The Flask app with random-weight models installed and warmed up.
+    Also usable as a gunicorn app factory: gunicorn 'loadtest:create_stub_app()'
+    """
+    # Nothing may load the (possibly missing) trained weights; repeated load
+    # test images should not be answered from the result cache by default
+    os.environ['CAMEL_EAGER_MODEL_LOAD'] = '0'
+    os.environ.setdefault('CAMEL_RESULT_CACHE', '0')
+    import app as api
+
+    api.runtime.install_models(
+        body_yolo_model=SyntheticDetector(build_random_yolo(yolo_config)),
+        face_yolo_model=SyntheticDetector(build_random_yolo(yolo_config)),
+        beauty_scorer_model=build_random_scorer(api.device)
+    )
+    api.runtime.load()
+    return api.app
+
+
+def start_server(kind: str, port: int, workers: int, threads: int) -> subprocess.Popen:
+    if kind == 'gunicorn':
+        cmd = [
+            sys.executable, '-m', 'gunicorn',
+            '-w', str(workers), '--threads', str(threads),
+            '-b', f'127.0.0.1:{port}', '--timeout', '300',
+            'loadtest:create_stub_app()'
+        ]
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), '--serve-stub', '--port', str(port)]
+    return subprocess.Popen(cmd, cwd=BASE_DIR)
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def wait_until_ready(host: str, port: int, timeout: float, process: Optional[subprocess.Popen] = None) -> None:
+    """Poll /health/ready until it returns 200."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode} before becoming ready')
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request('GET', '/health/ready')
+            status = conn.getresponse().status
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f'Server at {host}:{port} not ready after {timeout:.0f} s')
+
+
+# ==========================================================
+# SERVER RSS
+# ==========================================================
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """Resident set size (bytes) of pid plus all its descendants (Linux /proc), or None."""
+    children = {}
+    try:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces; ppid follows the ')'
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return None
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total, stack, found = 0, [pid], False
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+            found = True
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(current, []))
+    return total if found else None
+
+
+class RssSampler:
+    """Samples process_tree_rss(pid) every `interval` seconds on a daemon thread."""
+
+    def __init__(self, pid: Optional[int], interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Tuple[float, float]] = []   # (seconds since start, MB)
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def _sample(self) -> None:
+        rss = process_tree_rss(self.pid)
+        if rss is not None:
+            self.samples.append((round(time.monotonic() - self._started, 3), rss / (1024 * 1024)))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> 'RssSampler':
+        self._started = time.monotonic()
+        if self.pid is not None:
+            self._sample()
+            self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._sample()
+        if not self.samples:
+            return {'available': False}
+        values = [mb for _, mb in self.samples]
+        return {
+            'available': True,
+            'start_mb': values[0],
+            'end_mb': values[-1],
+            'peak_mb': max(values),
+            'samples': self.samples
+        }
+
+
+# ==========================================================
+# LOAD GENERATOR
+# ==========================================================
+
+def build_image_pool(
+    resolutions: Sequence[Tuple[int, int]],
+    per_resolution: int,
+    seed: int = 0,
+    jpeg_quality: int = 90
+) -> Dict[str, List[bytes]]:
+    """`per_resolution` distinct JPEG uploads per WIDTHxHEIGHT label."""
+    pool = {}
+    for width, height in resolutions:
+        images = []
+        for i in range(per_resolution):
+            rgb = synthetic_image(width, height, seed=seed + i)
+            ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR),
+                                       [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            if not ok:
+                raise RuntimeError(f'Could not encode a {width}x{height} test image')
+            images.append(encoded.tobytes())
+        pool[f'{width}x{height}'] = images
+    return pool
+
+
+def encode_multipart(field: str, files: List[bytes]) -> Tuple[bytes, str]:
+    """multipart/form-data body with one part per file under `field`; returns (body, content type)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, data in enumerate(files):
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="camel_{i}.jpg"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f'Unknown endpoint in mix: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def latency_summary(latencies_ms: Sequence[float]) -> Dict[str, Any]:
+    if not latencies_ms:
+        return {'count': 0}
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    return {
+        'count': int(values.size),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+        'max_ms': float(values.max())
+    }
+
+
+def _send(host: str, port: int, endpoint: str, images: List[bytes], timeout: float) -> int:
+    field = 'images' if endpoint == 'batch' else 'image'
+    body, content_type = encode_multipart(field, images)
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('POST', ENDPOINTS[endpoint], body=body, headers={'Content-Type': content_type})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def run_level(
+    host: str,
+    port: int,
+    concurrency: int,
+    duration: float,
+    mix: Dict[str, float],
+    pool: Dict[str, List[bytes]],
+    batch_images: int,
+    timeout: float,
+    server_pid: Optional[int],
+    rss_interval: float,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """`concurrency` closed-loop clients sending requests for `duration` seconds."""
+    records = []          # (endpoint, resolution, status or None, latency ms, error)
+    records_lock = threading.Lock()
+    endpoints, weights = list(mix), list(mix.values())
+    labels = list(pool)
+    deadline = time.monotonic() + duration
+
+    def client(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            label = rng.choice(labels)
+            count = batch_images if endpoint == 'batch' else 1
+            images = [rng.choice(pool[label]) for _ in range(count)]
+
+            started = time.perf_counter()
+            status, error = None, None
+            try:
+                status = _send(host, port, endpoint, images, timeout)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            latency = (time.perf_counter() - started) * 1000.0
+            with records_lock:
+                records.append((endpoint, label, status, latency, error))
+
+    sampler = RssSampler(server_pid, rss_interval).start()
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    rss = sampler.stop()
+
+    def summarize(rows) -> Dict[str, Any]:
+        ok = [r for r in rows if r[2] == 200]
+        failures = {}
+        for r in rows:
+            if r[2] != 200:
+                reason = r[4] if r[4] is not None else f'HTTP {r[2]}'
+                failures[reason] = failures.get(reason, 0) + 1
+        images = sum(batch_images if r[0] == 'batch' else 1 for r in ok)
+        return {
+            'requests': len(rows),
+            'ok': len(ok),
+            'errors': len(rows) - len(ok),
+            'error_rate': (len(rows) - len(ok)) / len(rows) if rows else 0.0,
+            'errors_by_reason': failures,
+            'throughput_rps': len(ok) / elapsed if elapsed > 0 else 0.0,
+            'images_per_s': images / elapsed if elapsed > 0 else 0.0,
+            'latency_ms': latency_summary([r[3] for r in ok])
+        }
+
+    report = {'concurrency': concurrency, 'elapsed_s': elapsed}
+    report.update(summarize(records))
+    report['endpoints'] = {
+        name: summarize([r for r in records if r[0] == name]) for name in endpoints
+    }
+    report['resolutions'] = {
+        label: summarize([r for r in records if r[1] == label]) for label in labels
+    }
+    report['server_rss'] = rss
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HTTP load test of the CamelBeauty API")
+    parser.add_argument("--url", default=None,
+                        help="load-test a running server instead of starting a stub one")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="with --url: PID of the server, for RSS sampling")
+    parser.add_argument("--server", choices=('flask', 'gunicorn'), default='flask')
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--concurrency", default='1,4,16', help="comma-separated client counts, run in turn")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", default='single=0.8,batch=0.2', help="endpoint weights")
+    parser.add_argument("--batch-images", type=int, default=4, help="images per batch request")
+    parser.add_argument("--resolutions", default=','.join(f'{w}x{h}' for w, h in DEFAULT_RESOLUTIONS),
+                        help="comma-separated WIDTHxHEIGHT upload sizes, picked uniformly")
+    parser.add_argument("--images-per-resolution", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the report as JSON here")
+    parser.add_argument("--serve-stub", action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        create_stub_app().run(host='127.0.0.1', port=args.port, debug=False, threaded=True)
+        return 0
+
+    process = None
+    if args.url:
+        target = urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+        server_pid = args.server_pid
+    else:
+        host, port = '127.0.0.1', args.port
+        print(f"Starting stub {args.server} server on port {port} ...")
+        process = start_server(args.server, port, args.workers, args.threads)
+        server_pid = process.pid
+
+    try:
+        wait_until_ready(host, port, args.startup_timeout, process)
+        pool = build_image_pool(parse_resolutions(args.resolutions),
+                                args.images_per_resolution, seed=args.seed)
+        mix = _parse_mix(args.mix)
+
+        report = {
+            'config': {
+                'target': args.url or f'stub {args.server} server',
+                'workers': args.workers if process is not None and args.server == 'gunicorn' else None,
+                'duration_s': args.duration,
+                'mix': mix,
+                'batch_images': args.batch_images,
+                'resolutions': list(pool),
+                'images_per_resolution': args.images_per_resolution
+            },
+            'levels': []
+        }
+        for concurrency in [int(c) for c in args.concurrency.split(',') if c]:
+            print(f"Concurrency {concurrency}: {args.duration:.0f} s ...")
+            level = run_level(
+                host, port, concurrency, args.duration, mix, pool,
+                args.batch_images, args.timeout, server_pid, args.rss_interval, seed=args.seed
+            )
+            print(f"  {level['throughput_rps']:.2f} req/s, error rate {level['error_rate']:.1%}, "
+                  f"p95 {level['latency_ms'].get('p95_ms', float('nan')):.0f} ms")
+            report['levels'].append(level)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+import metrics
+from metrics import process_peak_rss_bytes, process_rss_bytes
+
+if TYPE_CHECKING:
+    import torch
+
+
+# ==========================================================
+# MEMORY ACCOUNTING, RSS WATCHDOG, TRACEMALLOC DUMPS
+# ==========================================================
+#
+# - MemoryAccounting (opt-in) samples current RSS (and the CUDA allocator on
+#   GPU) around every pipeline stage and detection request and records the
+#   signed change. Concurrent requests share the process, so a call's delta
+#   includes whatever ran alongside it. The peak (VmHWM) is process-wide
+#   since start and is only reported as such, never per stage or request.
+# - RssWatchdog samples RSS between requests and flags sustained growth.
+# - TracemallocDumps lists the top Python allocation sites on demand. NumPy
+#   buffers are traced; torch CPU tensors are not.
+
+def _delta(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if before is None or after is None:
+        return None
+    return after - before
+
+
+class MemoryAccounting:
+    def __init__(self, device: 'torch.device', recent_requests: int = 100):
+        self.cuda_device = device if device.type == 'cuda' else None
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._requests = deque(maxlen=recent_requests)
+        self.completed_requests = 0
+
+    def _sample(self) -> Dict[str, Optional[float]]:
+        sample = {'rss': process_rss_bytes()}
+        if self.cuda_device is not None:
+            import torch
+            sample['cuda_allocated'] = float(torch.cuda.memory_allocated(self.cuda_device))
+        return sample
+
+    # ------------------------------------------------------------------
+    # Per stage
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _account_stage(self, name: str) -> Iterator[None]:
+        before = self._sample()
+        try:
+            yield
+        finally:
+            self._record_stage(name, before, self._sample())
+
+    def _record_stage(self, name: str, before: Dict[str, Optional[float]],
+                      after: Dict[str, Optional[float]]) -> None:
+        rss_delta = _delta(before['rss'], after['rss'])
+        cuda_delta = _delta(before.get('cuda_allocated'), after.get('cuda_allocated'))
+
+        with self._lock:
+            stats = self._stages.setdefault(name, {
+                'calls': 0, 'rss_delta_total_bytes': 0.0,
+                'rss_delta_max_bytes': 0.0, 'rss_delta_min_bytes': 0.0,
+                'cuda_delta_max_bytes': 0.0
+            })
+            stats['calls'] += 1
+            if rss_delta is not None:
+                stats['rss_delta_total_bytes'] += rss_delta
+                stats['rss_delta_max_bytes'] = max(stats['rss_delta_max_bytes'], rss_delta)
+                stats['rss_delta_min_bytes'] = min(stats['rss_delta_min_bytes'], rss_delta)
+            if cuda_delta is not None:
+                stats['cuda_delta_max_bytes'] = max(stats['cuda_delta_max_bytes'], cuda_delta)
+
+        if rss_delta is not None:
+            metrics.STAGE_RSS_DELTA.observe(rss_delta, stage=name)
+
+    def stage_hook(self, name: str, items: int):
+        """Instrumentation stage hook (see instrumentation.add_stage_hook)."""
+        return self._account_stage(name)
+
+    # ------------------------------------------------------------------
+    # Per request
+    # ------------------------------------------------------------------
+
+    def begin_request(self) -> Dict[str, Optional[float]]:
+        sample = self._sample()
+        sample['started'] = time.perf_counter()
+        return sample
+
+    def end_request(self, begin: Dict[str, Optional[float]], endpoint: str) -> Dict[str, Any]:
+        after = self._sample()
+        record = {
+            'endpoint': endpoint,
+            'finished_at': time.time(),
+            'duration_ms': (time.perf_counter() - begin['started']) * 1000.0,
+            'rss_before_bytes': begin['rss'],
+            'rss_after_bytes': after['rss'],
+            'rss_delta_bytes': _delta(begin['rss'], after['rss'])
+        }
+        if self.cuda_device is not None:
+            record['cuda_allocated_before_bytes'] = begin['cuda_allocated']
+            record['cuda_allocated_after_bytes'] = after['cuda_allocated']
+
+        with self._lock:
+            self._requests.append(record)
+            self.completed_requests += 1
+        if record['rss_delta_bytes'] is not None:
+            metrics.REQUEST_RSS_DELTA.observe(record['rss_delta_bytes'], endpoint=endpoint)
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: dict(s) for name, s in self._stages.items()}
+            requests = list(self._requests)
+            completed = self.completed_requests
+        for s in stages.values():
+            s['rss_delta_mean_bytes'] = s['rss_delta_total_bytes'] / s['calls'] if s['calls'] else 0.0
+            if self.cuda_device is None:
+                del s['cuda_delta_max_bytes']
+
+        result = {
+            'rss_bytes': process_rss_bytes(),
+            # VmHWM: the whole process since start, not any one stage or request
+            'process_peak_rss_bytes': process_peak_rss_bytes(),
+            'completed_requests': completed,
+            'stages': stages,
+            'recent_requests': requests[-20:],
+            'largest_request_growth': sorted(
+                requests, key=lambda r: r['rss_delta_bytes'] or 0.0, reverse=True
+            )[:5]
+        }
+        if self.cuda_device is not None:
+            import torch
+            result['cuda'] = {
+                'allocated_bytes': torch.cuda.memory_allocated(self.cuda_device),
+                'max_allocated_bytes': torch.cuda.max_memory_allocated(self.cuda_device),
+                'reserved_bytes': torch.cuda.memory_reserved(self.cuda_device)
+            }
+        return result
+
+
+# ==========================================================
+# RSS GROWTH WATCHDOG
+# ==========================================================
+
+class RssWatchdog:
+    """
+    Samples RSS every interval_s seconds, but only when requests completed
+    (see request_finished) since the last sample: idle time says nothing
+    about leaks. Growth is flagged when RSS rose in at least rising_fraction
+    of the steps between the last `window` samples and by more than
+    min_growth_mb overall.
+    """
+
+    def __init__(
+        self,
+        interval_s: float = 30.0,
+        window: int = 10,
+        min_growth_mb: float = 64.0,
+        rising_fraction: float = 0.8
+    ):
+        self.interval_s = interval_s
+        self.window = max(3, int(window))
+        self.min_growth_bytes = min_growth_mb * 1024 * 1024
+        self.rising_fraction = rising_fraction
+
+        self._samples = deque(maxlen=self.window)     # (unix time, requests, rss bytes)
+        self.completed_requests = 0
+        self._last_requests = None
+        self.suspected = False
+        self.alerts = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'RssWatchdog':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='camel-rss-watchdog', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self.completed_requests += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"RSS watchdog check failed: {e}")
+
+    def check(self) -> bool:
+        """Take one sample (if requests completed since the last one); returns whether growth is suspected."""
+        rss = process_rss_bytes()
+        with self._lock:
+            requests = self.completed_requests
+            if rss is None or requests == self._last_requests:
+                return self.suspected
+            self._last_requests = requests
+            self._samples.append((time.time(), requests, rss))
+            samples = list(self._samples)
+
+            suspected = False
+            if len(samples) == self.window:
+                steps = [b[2] - a[2] for a, b in zip(samples, samples[1:])]
+                rising = sum(1 for step in steps if step > 0) / len(steps)
+                growth = samples[-1][2] - samples[0][2]
+                suspected = rising >= self.rising_fraction and growth > self.min_growth_bytes
+
+            if suspected and not self.suspected:
+                self.alerts += 1
+                print(f"WARNING: RSS grew by {growth / 2 ** 20:.0f} MB over the last "
+                      f"{samples[-1][1] - samples[0][1]} requests "
+                      f"({samples[0][2] / 2 ** 20:.0f} -> {samples[-1][2] / 2 ** 20:.0f} MB); possible leak")
+            self.suspected = suspected
+        metrics.MEMORY_GROWTH_SUSPECTED.set(1.0 if suspected else 0.0)
+        return suspected
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'suspected': self.suspected,
+                'alerts': self.alerts,
+                'interval_s': self.interval_s,
+                'window': self.window,
+                'min_growth_bytes': self.min_growth_bytes,
+                'rising_fraction': self.rising_fraction,
+                'samples': [
+                    {'time': t, 'requests': n, 'rss_bytes': rss} for t, n, rss in self._samples
+                ]
+            }
+
+
+# ==========================================================
+# TRACEMALLOC DUMPS
+# ==========================================================
+
+class TracemallocDumps:
+    """Start / stop tracemalloc and list the top allocation sites, with the change since the last dump."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, int(frames)))
+            self._previous = None
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+        return self.status()
+
+    def snapshot(self, limit: int = 25, key_type: str = 'lineno') -> Dict[str, Any]:
+        if key_type not in ('lineno', 'filename', 'traceback'):
+            raise ValueError(f'Unknown key_type: {key_type}')
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError('tracemalloc is not running; start it first')
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')
+            ])
+            previous, self._previous = self._previous, snapshot
+
+        def site(stat) -> Dict[str, Any]:
+            return {'traceback': stat.traceback.format(), 'size_bytes': stat.size, 'count': stat.count}
+
+        top = [site(stat) for stat in snapshot.statistics(key_type)[:limit]]
+        diff = None
+        if previous is not None:
+            diff = [
+                dict(site(stat), size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+                for stat in snapshot.compare_to(previous, key_type)[:limit]
+            ]
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'traced_bytes': current,
+            'traced_peak_bytes': peak,
+            'top': top,
+            'diff_since_last_dump': diff
+        }
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            'tracing': tracing,
+            'frames': tracemalloc.get_traceback_limit() if tracing else None,
+            'traced_bytes': current,
+            'traced_peak_bytes': peak
+        }
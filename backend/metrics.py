@@ -0,0 +1,310 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from instrumentation import add_stage_hook
+
+
+# ==========================================================
+# PROMETHEUS METRICS (TEXT EXPOSITION FORMAT 0.0.4)
+# ==========================================================
+#
+# A small self-contained registry: counters, gauges (optionally computed at
+# scrape time) and cumulative histograms, each with a fixed set of label
+# names. Values live in the serving process, so under gunicorn every worker
+# exposes its own series; scrape each worker or run one worker per pod.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+# Signed: RSS can shrink across a call as well as grow
+MEMORY_DELTA_BUCKETS = tuple(
+    float(mb * 1024 * 1024) for mb in (-256, -64, -16, -4, -1, 0, 1, 4, 16, 64, 256, 1024)
+)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List['_Metric'] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: '_Metric') -> None:
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f'Duplicate metric: {metric.name}')
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {sorted(labels)}')
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], Optional[float]]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], Optional[float]]) -> None:
+        """Compute the (unlabelled) value at scrape time; None omits the sample."""
+        self._function = fn
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            value = self._function()
+            return [] if value is None else [f'{self.name} {_format_value(value)}']
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Failed stages are timed too
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, dict(v, counts=list(v['counts']))) for k, v in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {state["count"]}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state["sum"])}')
+            lines.append(f'{self.name}_count{labels} {state["count"]}')
+        return lines
+
+
+def process_rss_bytes() -> Optional[float]:
+    """Current resident set size of this process (Linux /proc), or None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return float(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_peak_rss_bytes() -> Optional[float]:
+    """Peak resident set size (VmHWM) of this process (Linux /proc), or None."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return float(int(line.split()[1]) * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+# ==========================================================
+# SERVICE METRICS
+# ==========================================================
+
+STAGE_SECONDS = Histogram(
+    'camel_stage_duration_seconds',
+    'Wall-clock time per pipeline stage call (a call may cover several images).',
+    ['stage']
+)
+STAGE_ITEMS = Counter(
+    'camel_stage_items_total',
+    'Images / crops processed per pipeline stage.',
+    ['stage']
+)
+REQUESTS = Counter(
+    'camel_http_requests_total',
+    'HTTP requests by endpoint and outcome (success / client_error / server_error).',
+    ['endpoint', 'outcome']
+)
+REQUEST_SECONDS = Histogram(
+    'camel_http_request_duration_seconds',
+    'HTTP request latency by endpoint.',
+    ['endpoint'],
+    buckets=REQUEST_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    'camel_http_requests_in_flight',
+    'HTTP requests currently being handled.'
+)
+BATCH_IMAGES = Histogram(
+    'camel_batch_images',
+    'Images uploaded per /api/v1/detect/batch request.',
+    buckets=BATCH_BUCKETS
+)
+DETECTIONS = Counter(
+    'camel_detections_total',
+    'Detection outcomes per computed (not cached) image: scored (body found) or '
+    'no_body (no body detected; in batches also undecodable uploads).',
+    ['result']
+)
+FACES = Counter(
+    'camel_faces_total',
+    'Face detection outcomes per image with a body: found or not_found.',
+    ['result']
+)
+PROCESS_RSS = Gauge(
+    'process_resident_memory_bytes',
+    'Resident memory size in bytes.'
+)
+PROCESS_RSS.set_function(process_rss_bytes)
+PROCESS_PEAK_RSS = Gauge(
+    'process_resident_memory_peak_bytes',
+    'Process-wide peak resident memory since start (VmHWM); not attributable to a request or stage.'
+)
+PROCESS_PEAK_RSS.set_function(process_peak_rss_bytes)
+STAGE_RSS_DELTA = Histogram(
+    'camel_stage_rss_delta_bytes',
+    'Change in process RSS across a pipeline stage call, including concurrent '
+    'work (CAMEL_MEMORY_ACCOUNTING=1 only).',
+    ['stage'],
+    buckets=MEMORY_DELTA_BUCKETS
+)
+REQUEST_RSS_DELTA = Histogram(
+    'camel_request_rss_delta_bytes',
+    'Change in process RSS across a detection request, including concurrent '
+    'work (CAMEL_MEMORY_ACCOUNTING=1 only).',
+    ['endpoint'],
+    buckets=MEMORY_DELTA_BUCKETS
+)
+MEMORY_GROWTH_SUSPECTED = Gauge(
+    'camel_memory_growth_suspected',
+    '1 while the RSS watchdog sees sustained RSS growth across requests.'
+)
+
+
+def _observe_stage(name: str, items: int):
+    STAGE_ITEMS.inc(items, stage=name)
+    return STAGE_SECONDS.time(stage=name)
+
+
+def record_detection(body_found: bool, face_found: bool = False) -> None:
+    DETECTIONS.inc(result='scored' if body_found else 'no_body')
+    if body_found:
+        FACES.inc(result='found' if face_found else 'not_found')
+
+
+def request_outcome(status_code: int) -> str:
+    if status_code >= 500:
+        return 'server_error'
+    if status_code >= 400:
+        return 'client_error'
+    return 'success'
+
+
+def enable_stage_metrics() -> None:
+    """Start recording per-stage histograms (see instrumentation.stage)."""
+    add_stage_hook(_observe_stage)
+
+
+def render() -> str:
+    return REGISTRY.render()
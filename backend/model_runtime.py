@@ -0,0 +1,518 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from inference_utils import (
+    CamelBeautyScorer,
+    load_camel_beauty_scorer,
+    score_scorer_samples,
+    IMAGE_SIZE,
+    FEATURE_DIM,
+    NUM_BEAUTY_SCORES_CLASSES,
+    NUM_CATEGORY_CLASSES,
+    body_seg_model_path,
+    face_seg_model_path,
+    beauty_scorer_checkpoint_path
+)
+from checkpoint_io import verify_checksum
+from compiled_scorer import BucketedCompiledScorer
+from quantization import load_quantized_scorer, reference_samples_from_images
+from onnx_backend import OnnxScorer, export_scorer_onnx, onnx_model_path, verify_onnx_parity
+from onnx_yolo import OnnxYOLO, export_yolo_onnx, yolo_onnx_path
+from precision import (
+    AutocastScorer,
+    HalfPrecisionYOLO,
+    check_precision_drift,
+    synthetic_scorer_samples
+)
+
+
+# ==========================================================
+# LAZY, THREAD-SAFE MODEL RUNTIME
+# ==========================================================
+
+class ModelRuntime:
+    """
+    Owns the body/face YOLO models and the CamelBeautyScorer.
+
+    Nothing is loaded at construction. Each model is loaded on first access
+    (body_yolo_model / face_yolo_model / beauty_scorer_model) under its own
+    lock, so concurrent first requests load it exactly once. The scorer is
+    moved to `device` and put in eval mode once, at load time.
+
+    load() loads everything and optionally runs a warm-up; start_background_load()
+    does the same on a daemon thread so a server can open its port first.
+    Liveness is the process itself; `ready` only turns True once every model
+    is loaded (and warmed up when warmup=True).
+
+    Reduced-precision modes (scorer_precision 'int8' / 'bf16', yolo_half) are
+    guarded: the mode's total scores and categories are compared with fp32 on
+    precision_reference_images (or synthetic scorer inputs) and the mode is
+    refused, falling back to fp32, if the drift exceeds max_total_drift /
+    max_category_flip_rate. max_total_drift=None disables the check.
+    yolo_half needs CUDA and reference images; it is checked and switched on
+    by load().
+
+    scorer_backend='onnxruntime' serves the scorer from an ONNX export
+    (onnx_backend.OnnxScorer, CPU execution provider). The export is named
+    after the SHA-256 of the scorer weights, so new weights get a new export;
+    a missing one is exported on first load and only used if it passes the
+    parity check against the torch model. An explicit onnx_path is used as is.
+    If the export cannot be written (read-only model directory) the torch
+    scorer is served instead.
+
+    yolo_backend='onnxruntime' runs both detectors as ONNX exports through
+    onnx_yolo.OnnxYOLO (NumPy pre/post-processing), so serving does not import
+    ultralytics once the exports exist next to the .pt files. Exports are
+    named after the SHA-256 of the .pt, so a new best.pt is re-exported; a
+    detector whose export cannot be written falls back to ultralytics.
+
+    scorer_compile='compile' / 'torchscript' serves the fp32 torch scorer
+    through compiled_scorer.BucketedCompiledScorer (fixed batch-size buckets,
+    compiled during warm-up, eager fallback).
+    """
+
+    def __init__(
+        self,
+        body_model_path: str = body_seg_model_path,
+        face_model_path: str = face_seg_model_path,
+        scorer_checkpoint_path: str = beauty_scorer_checkpoint_path,
+        device: Optional[torch.device] = None,
+        warmup: bool = True,
+        pretrained_backbone: bool = False,
+        verify_checksums: bool = True,
+        scorer_precision: str = 'fp32',
+        quantized_cache_dir: Optional[str] = None,
+        yolo_half: bool = False,
+        max_total_drift: Optional[float] = 2.0,
+        max_category_flip_rate: float = 0.0,
+        precision_reference_images: Optional[List[str]] = None,
+        scorer_backend: str = 'torch',
+        onnx_path: Optional[str] = None,
+        ort_intra_op_threads: int = 0,
+        ort_inter_op_threads: int = 0,
+        yolo_backend: str = 'ultralytics',
+        scorer_compile: str = ''
+    ):
+        self.body_model_path = body_model_path
+        self.face_model_path = face_model_path
+        self.scorer_checkpoint_path = scorer_checkpoint_path
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.warmup = warmup
+        # False: build the scorer offline from the bundled ViT config
+        self.pretrained_backbone = pretrained_backbone
+        self.verify_checksums = verify_checksums
+        # 'int8': dynamically quantized scorer (CPU only), cached on disk
+        # 'bf16': scorer under bfloat16 autocast
+        if scorer_precision not in ('fp32', 'int8', 'bf16'):
+            raise ValueError(f'Unknown scorer precision: {scorer_precision}')
+        if scorer_precision == 'int8' and self.device.type != 'cpu':
+            raise ValueError('INT8 scorer precision is only supported on CPU')
+        self.scorer_precision = scorer_precision
+        self.quantized_cache_dir = quantized_cache_dir
+        self.yolo_half = yolo_half
+        self.max_total_drift = max_total_drift
+        self.max_category_flip_rate = max_category_flip_rate
+        self.precision_reference_images = list(precision_reference_images or [])
+        if scorer_backend not in ('torch', 'onnxruntime'):
+            raise ValueError(f'Unknown scorer backend: {scorer_backend}')
+        if scorer_backend == 'onnxruntime' and (self.device.type != 'cpu' or scorer_precision != 'fp32'):
+            raise ValueError('The onnxruntime scorer backend runs fp32 on CPU only')
+        self.scorer_backend = scorer_backend
+        # None: onnx_model_path() of the scorer weights, resolved at load time
+        self.onnx_path = onnx_path
+        self.ort_intra_op_threads = ort_intra_op_threads
+        self.ort_inter_op_threads = ort_inter_op_threads
+        if yolo_backend not in ('ultralytics', 'onnxruntime'):
+            raise ValueError(f'Unknown YOLO backend: {yolo_backend}')
+        if yolo_backend == 'onnxruntime' and yolo_half:
+            raise ValueError('yolo_half only applies to the ultralytics YOLO backend')
+        self.yolo_backend = yolo_backend
+        if scorer_compile not in ('', 'compile', 'torchscript'):
+            raise ValueError(f'Unknown scorer compile mode: {scorer_compile}')
+        if scorer_compile and (scorer_backend != 'torch' or scorer_precision != 'fp32'):
+            raise ValueError('scorer_compile needs the fp32 torch scorer backend')
+        self.scorer_compile = scorer_compile
+        self._effective_scorer_backend = None
+        self._artifacts = {}      # model path / 'scorer' -> file actually served
+        self._precision_checks = {}
+        self._effective_scorer_precision = None
+        self._half_yolo = None
+
+        self._models = {}
+        self._model_locks = {
+            name: threading.Lock()
+            for name in ('body_yolo_model', 'face_yolo_model', 'beauty_scorer_model')
+        }
+        self._state_lock = threading.Lock()
+        self._state = 'not_loaded'
+        self._error = None
+        self._load_seconds = {}
+        self._warmup_seconds = None
+        self._loader = None
+
+    # ------------------------------------------------------------------
+    # Lazy model access
+    # ------------------------------------------------------------------
+
+    def _get(self, name: str, loader: Callable[[], Any]) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._model_locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                started = time.perf_counter()
+                model = loader()
+                self._load_seconds[name] = time.perf_counter() - started
+                self._models[name] = model
+                print(f"Loaded {name} on {self.device}")
+        return model
+
+    def install_models(self, **models: Any) -> None:
+        """
+        Serve already-built models (body_yolo_model, face_yolo_model and/or
+        beauty_scorer_model) instead of loading them from disk, e.g. the
+        random-weight models of the load-testing harness.
+        """
+        unknown = set(models) - set(self._model_locks)
+        if unknown:
+            raise ValueError(f'Unknown models: {sorted(unknown)}')
+        for name, model in models.items():
+            with self._model_locks[name]:
+                self._models[name] = model
+
+    def _load_yolo(self, path: str):
+        if self.yolo_backend == 'onnxruntime':
+            onnx_path = yolo_onnx_path(path)
+            if not os.path.exists(onnx_path):
+                if self.verify_checksums:
+                    verify_checksum(path)
+                # One-off: the export itself needs ultralytics
+                try:
+                    export_yolo_onnx(path)
+                    print(f"Exported {onnx_path}")
+                except OSError as e:
+                    # Read-only model directory: serve the .pt with ultralytics
+                    print(f"Cannot export {onnx_path} ({e}); using ultralytics for {path}")
+                    from ultralytics import YOLO
+
+                    self._artifacts[path] = path
+                    return YOLO(path)
+            elif self.verify_checksums:
+                verify_checksum(onnx_path)
+            self._artifacts[path] = onnx_path
+            return OnnxYOLO(onnx_path, self.ort_intra_op_threads, self.ort_inter_op_threads)
+
+        from ultralytics import YOLO
+
+        if self.verify_checksums:
+            verify_checksum(path)
+        self._artifacts[path] = path
+        return YOLO(path)
+
+    def scorer_weights_path(self) -> str:
+        """The .safetensors twin of the scorer checkpoint if it exists, else the checkpoint."""
+        safetensors_path = os.path.splitext(self.scorer_checkpoint_path)[0] + '.safetensors'
+        if os.path.exists(safetensors_path):
+            return safetensors_path
+        return self.scorer_checkpoint_path
+
+    def _load_scorer(self) -> CamelBeautyScorer:
+        weights_path = self.scorer_weights_path()
+        # INT8 / bf16 / compiled scorers derive from these weights; the ONNX
+        # backend replaces the entry with the .onnx file it serves
+        self._artifacts['scorer'] = weights_path
+
+        def load_fp32():
+            return load_camel_beauty_scorer(
+                weights_path,
+                self.device,
+                feature_dim=FEATURE_DIM,
+                num_beauty_scores_classes=NUM_BEAUTY_SCORES_CLASSES,
+                num_category_classes=NUM_CATEGORY_CLASSES,
+                pretrained_backbone=self.pretrained_backbone,
+                verify=self.verify_checksums
+            )
+
+        if self.scorer_backend == 'onnxruntime':
+            self._effective_scorer_precision = 'fp32'
+            return self._load_onnx_scorer(load_fp32, self.onnx_path or onnx_model_path(weights_path))
+
+        self._effective_scorer_backend = 'torch'
+        fp32 = load_fp32()
+        if self.scorer_precision == 'fp32':
+            self._effective_scorer_precision = 'fp32'
+            if self.scorer_compile:
+                return BucketedCompiledScorer(fp32, mode=self.scorer_compile)
+            return fp32
+
+        if self.max_total_drift is None:
+            candidate = self._reduced_precision_scorer(fp32, weights_path)
+            self._effective_scorer_precision = self.scorer_precision
+            return candidate
+
+        samples = self._reference_samples()
+        reference = score_scorer_samples(samples, fp32, device=self.device)
+        # int8 quantizes fp32 in place (INT8 weights from the cache if present)
+        candidate = self._reduced_precision_scorer(fp32, weights_path)
+        report = check_precision_drift(
+            reference, score_scorer_samples(samples, candidate, device=self.device),
+            self.max_total_drift, self.max_category_flip_rate
+        )
+        report['mode'] = self.scorer_precision
+        report['reference'] = 'images' if self.precision_reference_images else 'synthetic'
+        self._precision_checks['scorer'] = report
+
+        if report['accepted']:
+            self._effective_scorer_precision = self.scorer_precision
+            return candidate
+
+        print(f"Refusing {self.scorer_precision} scorer: total score drift "
+              f"{report['max_total_drift']:.3f}, category flip rate "
+              f"{report['category_flip_rate']:.3f}; using fp32")
+        self._effective_scorer_precision = 'fp32'
+        return fp32 if self.scorer_precision == 'bf16' else load_fp32()
+
+    def _load_onnx_scorer(self, load_fp32: Callable[[], CamelBeautyScorer], onnx_path: str):
+        if os.path.exists(onnx_path):
+            self._effective_scorer_backend = 'onnxruntime'
+            self._artifacts['scorer'] = onnx_path
+            return OnnxScorer(onnx_path, self.ort_intra_op_threads, self.ort_inter_op_threads)
+
+        fp32 = load_fp32()
+        try:
+            export_scorer_onnx(fp32, onnx_path)
+        except OSError as e:
+            # Read-only model directory: serve the torch model already in memory
+            print(f"Cannot export ONNX scorer to {onnx_path} ({e}); using torch")
+            self._effective_scorer_backend = 'torch'
+            return fp32
+        onnx_scorer = OnnxScorer(onnx_path, self.ort_intra_op_threads, self.ort_inter_op_threads)
+        report = verify_onnx_parity(fp32, onnx_scorer)
+        self._precision_checks['onnx'] = report
+
+        if report['passed']:
+            print(f"Exported ONNX scorer to {onnx_path}")
+            self._effective_scorer_backend = 'onnxruntime'
+            self._artifacts['scorer'] = onnx_path
+            return onnx_scorer
+
+        print(f"Refusing ONNX scorer (max abs diff {report['max_abs_diff']}); using torch")
+        os.remove(onnx_path)
+        self._effective_scorer_backend = 'torch'
+        return fp32
+
+    def _reduced_precision_scorer(self, fp32: CamelBeautyScorer, weights_path: str):
+        if self.scorer_precision == 'bf16':
+            return AutocastScorer(fp32, torch.bfloat16)
+        return load_quantized_scorer(weights_path, lambda: fp32, self.quantized_cache_dir)
+
+    def _reference_samples(self) -> List[Dict[str, torch.Tensor]]:
+        """fp32-detected samples of the reference images, else synthetic ones."""
+        if self.precision_reference_images:
+            samples = [
+                sample for sample in reference_samples_from_images(
+                    self.precision_reference_images,
+                    self._get('body_yolo_model', lambda: self._load_yolo(self.body_model_path)),
+                    self._get('face_yolo_model', lambda: self._load_yolo(self.face_model_path))
+                )
+                if sample is not None
+            ]
+            if samples:
+                return samples
+        return synthetic_scorer_samples()
+
+    def _check_yolo_half(self) -> None:
+        """Enable half precision YOLO if it keeps the end results within the thresholds."""
+        body = self._get('body_yolo_model', lambda: self._load_yolo(self.body_model_path))
+        face = self._get('face_yolo_model', lambda: self._load_yolo(self.face_model_path))
+        half_body, half_face = HalfPrecisionYOLO(body), HalfPrecisionYOLO(face)
+
+        if self.device.type != 'cuda':
+            report = {'accepted': False, 'reason': 'half precision YOLO is only supported on CUDA'}
+        elif self.max_total_drift is None:
+            report = {'accepted': True, 'reason': 'drift check disabled'}
+        elif not self.precision_reference_images:
+            report = {'accepted': False, 'reason': 'no precision reference images configured'}
+        else:
+            scorer = self.beauty_scorer_model
+
+            def score(samples):
+                present = [s for s in samples if s is not None]
+                scored = iter(score_scorer_samples(present, scorer, device=self.device))
+                return [next(scored) if s is not None else None for s in samples]
+
+            images = self.precision_reference_images
+            report = check_precision_drift(
+                score(reference_samples_from_images(images, body, face)),
+                score(reference_samples_from_images(images, half_body, half_face)),
+                self.max_total_drift, self.max_category_flip_rate
+            )
+
+        self._precision_checks['yolo'] = report
+        if report['accepted']:
+            self._half_yolo = {'body': half_body, 'face': half_face}
+        else:
+            print(f"Refusing half precision YOLO: {report.get('reason', report)}")
+
+    @property
+    def body_yolo_model(self):
+        model = self._get('body_yolo_model', lambda: self._load_yolo(self.body_model_path))
+        return self._half_yolo['body'] if self._half_yolo else model
+
+    @property
+    def face_yolo_model(self):
+        model = self._get('face_yolo_model', lambda: self._load_yolo(self.face_model_path))
+        return self._half_yolo['face'] if self._half_yolo else model
+
+    @property
+    def beauty_scorer_model(self) -> CamelBeautyScorer:
+        return self._get('beauty_scorer_model', self._load_scorer)
+
+    # ------------------------------------------------------------------
+    # Eager loading, warm-up and readiness
+    # ------------------------------------------------------------------
+
+    def warm_up(self) -> float:
+        """One YOLO predict per detector and one scorer forward on dummy inputs."""
+        started = time.perf_counter()
+        blank = np.zeros((640, 640, 3), dtype=np.uint8)
+        self.body_yolo_model.predict(source=blank, conf=0.25, verbose=False)
+        self.face_yolo_model.predict(source=blank, conf=0.25, verbose=False)
+
+        h, w = IMAGE_SIZE
+        sample = {
+            'body_image': torch.zeros(3, h, w),
+            'body_mask': torch.zeros(1, h, w),
+            'body_present': torch.tensor(True),
+            'face_image': torch.zeros(3, h, w),
+            'face_mask': torch.zeros(1, h, w),
+            'face_present': torch.tensor(False)
+        }
+        scorer = self.beauty_scorer_model
+        if isinstance(scorer, BucketedCompiledScorer):
+            # Compile every batch-size bucket before reporting ready
+            scorer.warm_up()
+        score_scorer_samples([sample], scorer, device=self.device)
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize(self.device)
+
+        self._warmup_seconds = time.perf_counter() - started
+        return self._warmup_seconds
+
+    def load(self) -> 'ModelRuntime':
+        """Load all models (and warm up); safe to call more than once."""
+        with self._state_lock:
+            if self._state == 'ready':
+                return self
+            self._state = 'loading'
+            self._error = None
+        try:
+            self.body_yolo_model
+            self.face_yolo_model
+            self.beauty_scorer_model
+            if self.yolo_half and 'yolo' not in self._precision_checks:
+                self._check_yolo_half()
+            if self.warmup:
+                self.warm_up()
+        except Exception as e:
+            with self._state_lock:
+                self._state = 'failed'
+                self._error = f'{type(e).__name__}: {e}'
+            raise
+        with self._state_lock:
+            self._state = 'ready'
+        return self
+
+    def start_background_load(self, on_loaded: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """
+        Run load() on a daemon thread, then on_loaded() (e.g. work that needs the
+        models); errors are reported through status() / printed.
+        """
+        with self._state_lock:
+            if self._loader is not None:
+                return self._loader
+
+            def run():
+                try:
+                    self.load()
+                except Exception as e:
+                    print(f"Model loading failed: {e}")
+                    return
+                if on_loaded is not None:
+                    try:
+                        on_loaded()
+                    except Exception as e:
+                        print(f"Post-load step failed: {e}")
+
+            self._loader = threading.Thread(target=run, name='camel-model-loader', daemon=True)
+            self._loader.start()
+            return self._loader
+
+    def served_artifacts(self) -> Dict[str, Any]:
+        """
+        The model files and effective settings actually being served (e.g. the
+        .safetensors or .onnx scorer rather than the configured .pt). Loads the
+        models first, waiting for a running background load so that its
+        precision checks are settled.
+        """
+        loader = self._loader
+        if loader is not None and loader is not threading.current_thread():
+            loader.join()
+        self.body_yolo_model
+        self.face_yolo_model
+        self.beauty_scorer_model
+        return {
+            'files': [
+                self._artifacts.get(self.body_model_path, self.body_model_path),
+                self._artifacts.get(self.face_model_path, self.face_model_path),
+                self._artifacts.get('scorer', self.scorer_checkpoint_path)
+            ],
+            'scorer_backend': self._effective_scorer_backend,
+            'scorer_precision': self._effective_scorer_precision,
+            'scorer_compile': self.scorer_compile,
+            'yolo_backend': self.yolo_backend,
+            'yolo_half': self._half_yolo is not None
+        }
+
+    def _compile_status(self) -> Optional[Dict[str, Any]]:
+        scorer = self._models.get('beauty_scorer_model')
+        if not isinstance(scorer, BucketedCompiledScorer):
+            return None
+        return {
+            'mode': scorer.mode,
+            'buckets': list(scorer.buckets),
+            'compile_seconds': dict(scorer.compile_seconds),
+            'eager_fallback': scorer.fallback_error
+        }
+
+    @property
+    def ready(self) -> bool:
+        return self._state == 'ready'
+
+    def status(self) -> Dict[str, Any]:
+        with self._state_lock:
+            state = self._state
+            error = self._error
+        return {
+            'state': state,
+            'ready': state == 'ready',
+            'device': str(self.device),
+            'scorer_precision': self.scorer_precision,
+            'effective_scorer_precision': self._effective_scorer_precision,
+            'scorer_backend': self.scorer_backend,
+            'effective_scorer_backend': self._effective_scorer_backend,
+            'yolo_backend': self.yolo_backend,
+            'scorer_compile': self._compile_status(),
+            'yolo_half': self._half_yolo is not None,
+            'precision_checks': dict(self._precision_checks),
+            'models_loaded': {name: name in self._models for name in self._model_locks},
+            'load_seconds': dict(self._load_seconds),
+            'warmup_seconds': self._warmup_seconds,
+            'error': error
+        }
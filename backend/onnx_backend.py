@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+ONNX export of CamelBeautyScorer and an onnxruntime inference backend.
+
+    python onnx_backend.py [--output models/scorer/best_camel_beauty_all_data_model.onnx]
+
+exports the scorer with a dynamic batch dimension and checks the five
+outputs of the exported model against the torch model.
+"""
+
+import argparse
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import torch
+import torch.nn as nn
+
+from inference_utils import CamelBeautyScorer, BEAUTY_ATTRIBUTES
+from preprocessing import BatchBuffers
+from result_cache import cached_sha256
+
+
+# ==========================================================
+# ONNX EXPORT + ONNXRUNTIME SCORER
+# ==========================================================
+
+SCORER_INPUTS = list(BatchBuffers.KEYS)
+SCORER_OUTPUTS = BEAUTY_ATTRIBUTES + ['category_encoded']
+
+
+class TraceableScorer(nn.Module):
+    """CamelBeautyScorer.forward_dense with positional inputs and tuple outputs."""
+
+    def __init__(self, scorer: CamelBeautyScorer):
+        super().__init__()
+        self.scorer = scorer
+
+    def forward(self, body_image, body_mask, body_present, face_image, face_mask, face_present):
+        outputs = self.scorer.forward_dense(
+            body_image=body_image,
+            face_image=face_image,
+            body_mask=body_mask,
+            face_mask=face_mask,
+            body_present=body_present,
+            face_present=face_present
+        )
+        return tuple(outputs[name] for name in SCORER_OUTPUTS)
+
+
+def onnx_model_path(checkpoint_path: str) -> str:
+    """ONNX export of checkpoint_path, keyed by the checkpoint's SHA-256."""
+    digest = cached_sha256(checkpoint_path)[:16]
+    return f'{os.path.splitext(checkpoint_path)[0]}.{digest}.onnx'
+
+
+def export_scorer_onnx(
+    model: CamelBeautyScorer,
+    output_path: str,
+    opset_version: int = 17,
+    image_size=(224, 224)
+) -> str:
+    """Export model (eval mode, CPU) to output_path with a dynamic batch axis."""
+    model = model.cpu().eval()
+    h, w = image_size
+    batch = 2
+    example = (
+        torch.zeros(batch, 3, h, w),
+        torch.zeros(batch, 1, h, w),
+        torch.tensor([True, False]),
+        torch.zeros(batch, 3, h, w),
+        torch.zeros(batch, 1, h, w),
+        torch.tensor([False, True])
+    )
+    dynamic_axes = {name: {0: 'batch'} for name in SCORER_INPUTS + SCORER_OUTPUTS}
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                TraceableScorer(model), example, tmp_path,
+                input_names=SCORER_INPUTS,
+                output_names=SCORER_OUTPUTS,
+                dynamic_axes=dynamic_axes,
+                opset_version=opset_version,
+                do_constant_folding=True
+            )
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_path
+
+
+class OnnxScorer:
+    """
+    CamelBeautyScorer replacement backed by an onnxruntime CPU session.
+    Called like the torch model (keyword tensors in, dict of logits out), so
+    score_scorer_samples and the micro-batcher use it unchanged.
+
+    intra_op_threads / inter_op_threads: 0 lets onnxruntime decide.
+    """
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(intra_op_threads)
+        options.inter_op_num_threads = int(inter_op_threads)
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+
+    def __call__(self, **inputs: torch.Tensor) -> Dict[str, torch.Tensor]:
+        feeds = {
+            name: inputs[name].detach().cpu().numpy()
+            for name in SCORER_INPUTS
+        }
+        outputs = self.session.run(SCORER_OUTPUTS, feeds)
+        return {name: torch.from_numpy(out) for name, out in zip(SCORER_OUTPUTS, outputs)}
+
+
+def verify_onnx_parity(
+    torch_model: CamelBeautyScorer,
+    onnx_scorer: OnnxScorer,
+    samples: Optional[List[Dict[str, torch.Tensor]]] = None,
+    atol: float = 1e-3
+) -> Dict[str, Any]:
+    """
+    Max absolute logit difference per output between the torch model
+    (eager forward) and the ONNX model on the same batch, plus
+    'passed' (all <= atol) and whether predicted classes agree.
+    """
+    if samples is None:
+        from precision import synthetic_scorer_samples
+        samples = synthetic_scorer_samples(count=8)
+
+    device = next(torch_model.parameters()).device
+    batch = {key: torch.stack([s[key] for s in samples]) for key in SCORER_INPUTS}
+    with torch.no_grad():
+        expected = torch_model(**{k: v.to(device) for k, v in batch.items()})
+    actual = onnx_scorer(**batch)
+
+    max_abs_diff = {
+        name: float((expected[name].cpu() - actual[name]).abs().max())
+        for name in SCORER_OUTPUTS
+    }
+    same_argmax = all(
+        bool((expected[name].cpu().argmax(dim=-1) == actual[name].argmax(dim=-1)).all())
+        for name in SCORER_OUTPUTS
+    )
+    return {
+        'num_samples': len(samples),
+        'max_abs_diff': max_abs_diff,
+        'argmax_agreement': same_argmax,
+        'atol': atol,
+        'passed': all(diff <= atol for diff in max_abs_diff.values())
+    }
+
+
+def main() -> int:
+    from model_runtime import ModelRuntime
+
+    parser = argparse.ArgumentParser(description="Export CamelBeautyScorer to ONNX")
+    parser.add_argument("--output", default=None,
+                        help="defaults to the checkpoint path with .<sha256 prefix>.onnx")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--atol", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    runtime = ModelRuntime(device=torch.device('cpu'), warmup=False)
+    model = runtime.beauty_scorer_model
+    output = args.output or onnx_model_path(runtime.scorer_weights_path())
+
+    export_scorer_onnx(model, output, opset_version=args.opset)
+    print(f"Exported {output}")
+
+    report = verify_onnx_parity(model, OnnxScorer(output), atol=args.atol)
+    print(report)
+    if not report['passed']:
+        print("[FAIL] ONNX outputs differ from the torch model beyond the tolerance")
+        return 1
+    print("[OK] ONNX parity check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
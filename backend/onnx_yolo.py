@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+ONNX export of the body/face YOLO segmentation models and a NumPy-based
+predictor that replaces ultralytics at serve time.
+
+    python onnx_yolo.py [--images DIR]
+
+exports models/body/best.pt and models/face/best.pt to best.<sha256>.onnx
+next to them (once per .pt version) and, with --images, compares the
+detections with ultralytics.
+"""
+
+import argparse
+import ast
+import glob
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+import torch
+
+from result_cache import cached_sha256
+
+
+# ==========================================================
+# ONNX YOLO SEGMENTATION WITHOUT ULTRALYTICS
+# ==========================================================
+#
+# OnnxYOLO.predict() returns objects with the attributes the pipeline reads
+# from ultralytics Results: boxes.xyxy / boxes.conf / boxes.cls (torch
+# tensors, boxes in original image coordinates), masks.data (0/1 masks at the
+# letterboxed network resolution, None without detections), orig_shape and
+# the model's names. Pre- and post-processing follow ultralytics 8.0.x:
+# - numpy inputs are treated as BGR (channels reversed), like ultralytics does;
+# - letterbox to imgsz x imgsz (centred, pad value 114);
+# - class-aware NMS (torchvision.ops.nms semantics), max_det 300;
+# - masks = sigmoid(coeffs @ protos), cropped to the box at proto resolution,
+#   bilinearly upsampled to the input size and thresholded at 0.5.
+
+def yolo_onnx_path(pt_path: str) -> str:
+    """ONNX export of pt_path, keyed by the .pt file's SHA-256."""
+    digest = cached_sha256(pt_path)[:16]
+    return f'{os.path.splitext(pt_path)[0]}.{digest}.onnx'
+
+
+def export_yolo_onnx(pt_path: str, imgsz: int = 640, opset: int = 17) -> str:
+    """Export a YOLO .pt to yolo_onnx_path() next to it (dynamic batch); needs ultralytics."""
+    from ultralytics import YOLO
+
+    exported = YOLO(pt_path).export(format='onnx', imgsz=imgsz, dynamic=True, opset=opset)
+    target = yolo_onnx_path(pt_path)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    return target
+
+
+class DetectionBoxes:
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = torch.from_numpy(xyxy)
+        self.conf = torch.from_numpy(conf)
+        self.cls = torch.from_numpy(cls)
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+
+class DetectionMasks:
+    def __init__(self, data: np.ndarray):
+        self.data = torch.from_numpy(data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class DetectionResults:
+    def __init__(self, boxes: DetectionBoxes, masks: Optional[DetectionMasks],
+                 orig_shape: Tuple[int, int], names: Dict[int, str]):
+        self.boxes = boxes
+        self.masks = masks
+        self.orig_shape = orig_shape
+        self.names = names
+
+
+def letterbox(image: np.ndarray, size: int) -> np.ndarray:
+    """Resize keeping aspect ratio and pad to size x size (ultralytics LetterBox)."""
+    h, w = image.shape[:2]
+    r = min(size / h, size / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    dw, dh = (size - new_w) / 2, (size - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right,
+                              cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+
+def xywh2xyxy(xywh: np.ndarray) -> np.ndarray:
+    xyxy = np.empty_like(xywh)
+    half_w, half_h = xywh[:, 2] / 2, xywh[:, 3] / 2
+    xyxy[:, 0] = xywh[:, 0] - half_w
+    xyxy[:, 1] = xywh[:, 1] - half_h
+    xyxy[:, 2] = xywh[:, 0] + half_w
+    xyxy[:, 3] = xywh[:, 1] + half_h
+    return xyxy
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy NMS; indices of kept boxes by decreasing score (torchvision.ops.nms)."""
+    order = np.argsort(-scores, kind='stable')
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def process_masks(protos: np.ndarray, coeffs: np.ndarray, boxes: np.ndarray,
+                  input_hw: Tuple[int, int]) -> np.ndarray:
+    """(N, ih, iw) float32 0/1 masks from (nm, mh, mw) protos and (N, nm) coefficients."""
+    nm, mh, mw = protos.shape
+    ih, iw = input_hw
+    masks = coeffs @ protos.reshape(nm, -1)
+    masks = (1.0 / (1.0 + np.exp(-masks))).reshape(-1, mh, mw)
+
+    # Zero everything outside each box (at proto resolution)
+    scaled = boxes * np.array([mw / iw, mh / ih, mw / iw, mh / ih], dtype=np.float32)
+    cols = np.arange(mw, dtype=np.float32)[None, None, :]
+    rows = np.arange(mh, dtype=np.float32)[None, :, None]
+    x1, y1, x2, y2 = (scaled[:, k][:, None, None] for k in range(4))
+    masks *= (cols >= x1) & (cols < x2) & (rows >= y1) & (rows < y2)
+
+    # cv2 resizes up to 512 channels at once (bilinear, half-pixel centres)
+    upsampled = np.empty((len(masks), ih, iw), dtype=np.float32)
+    for start in range(0, len(masks), 512):
+        chunk = np.ascontiguousarray(masks[start:start + 512].transpose(1, 2, 0))
+        resized = cv2.resize(chunk, (iw, ih), interpolation=cv2.INTER_LINEAR)
+        upsampled[start:start + 512] = resized.reshape(ih, iw, -1).transpose(2, 0, 1)
+    return (upsampled > 0.5).astype(np.float32)
+
+
+def scale_boxes(boxes: np.ndarray, input_hw: Tuple[int, int], orig_hw: Tuple[int, int]) -> np.ndarray:
+    """Map boxes from the letterboxed input back onto the original image."""
+    gain = min(input_hw[0] / orig_hw[0], input_hw[1] / orig_hw[1])
+    pad_x = round((input_hw[1] - orig_hw[1] * gain) / 2 - 0.1)
+    pad_y = round((input_hw[0] - orig_hw[0] * gain) / 2 - 0.1)
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] -= pad_x
+    boxes[:, [1, 3]] -= pad_y
+    boxes /= gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, orig_hw[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, orig_hw[0])
+    return boxes
+
+
+class OnnxYOLO:
+    """
+    Exported YOLO segmentation model run by onnxruntime; predict() mirrors
+    YOLO.predict for the arguments the pipeline uses (source, conf, iou,
+    max_det). half and other ultralytics arguments are ignored.
+    """
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(intra_op_threads)
+        options.inter_op_num_threads = int(inter_op_threads)
+
+        providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider')
+                     if p in ort.get_available_providers()]
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta['names']) if 'names' in meta else {}
+        imgsz = ast.literal_eval(meta['imgsz']) if 'imgsz' in meta else [640, 640]
+        self.imgsz = int(imgsz[0]) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+    def predict(
+        self,
+        source: Union[np.ndarray, List[np.ndarray]],
+        conf: float = 0.25,
+        iou: float = 0.7,
+        max_det: int = 300,
+        max_nms: int = 30000,
+        **_ignored
+    ) -> List[DetectionResults]:
+        images = source if isinstance(source, (list, tuple)) else [source]
+        if not images:
+            return []
+
+        batch = np.stack([letterbox(img, self.imgsz)[..., ::-1] for img in images])
+        batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        preds, protos = self.session.run(None, {self.input_name: batch})[:2]
+
+        input_hw = batch.shape[2:]
+        nm = protos.shape[1]
+        nc = preds.shape[1] - 4 - nm
+        results = []
+
+        for img, pred, proto in zip(images, preds, protos):
+            pred = pred.T                                    # (anchors, 4 + nc + nm)
+            class_scores = pred[:, 4:4 + nc]
+            cls = class_scores.argmax(axis=1)
+            scores = class_scores[np.arange(len(cls)), cls]
+            keep = scores > conf
+            pred, cls, scores = pred[keep], cls[keep], scores[keep]
+
+            if len(scores) > max_nms:
+                top = np.argsort(-scores, kind='stable')[:max_nms]
+                pred, cls, scores = pred[top], cls[top], scores[top]
+
+            boxes = xywh2xyxy(pred[:, :4])
+            # Class-aware NMS: shift each class into its own coordinate range
+            kept = nms(boxes + cls[:, None] * 7680.0, scores, iou)[:max_det]
+            boxes, cls, scores, coeffs = boxes[kept], cls[kept], scores[kept], pred[kept, 4 + nc:]
+
+            orig_hw = img.shape[:2]
+            masks = None
+            if len(kept):
+                masks = DetectionMasks(process_masks(proto, coeffs, boxes, input_hw))
+                boxes = scale_boxes(boxes, input_hw, orig_hw)
+
+            results.append(DetectionResults(
+                DetectionBoxes(boxes.astype(np.float32).reshape(-1, 4),
+                               scores.astype(np.float32), cls.astype(np.float32)),
+                masks, orig_hw, self.names
+            ))
+        return results
+
+
+def verify_onnx_yolo_parity(pt_path: str, onnx_yolo: OnnxYOLO, images: List[np.ndarray],
+                            conf: float = 0.25, iou: float = 0.5) -> Dict[str, Any]:
+    """
+    Compare the best detection per image with ultralytics: detection count
+    agreement, best-box IoU and best-mask pixel agreement (needs ultralytics).
+    """
+    from ultralytics import YOLO
+
+    reference = YOLO(pt_path)
+    count_agreement, box_ious, mask_agreement = [], [], []
+    for img in images:
+        ref = reference.predict(img, conf=conf, iou=iou, verbose=False)[0]
+        new = onnx_yolo.predict(img, conf=conf, iou=iou)[0]
+        count_agreement.append(float(len(ref.boxes) == len(new.boxes)))
+        if len(ref.boxes) == 0 or len(new.boxes) == 0:
+            continue
+
+        i, j = int(ref.boxes.conf.argmax()), int(new.boxes.conf.argmax())
+        a, b = ref.boxes.xyxy[i].cpu().numpy(), new.boxes.xyxy[j].numpy()
+        inter = max(0.0, min(a[2], b[2]) - max(a[0], b[0])) * max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        box_ious.append(float(inter / union) if union > 0 else 0.0)
+
+        ref_mask = ref.masks.data[i].cpu().numpy()
+        new_mask = new.masks.data[j].numpy()
+        if ref_mask.shape == new_mask.shape:
+            mask_agreement.append(float((ref_mask == new_mask).mean()))
+
+    return {
+        'num_images': len(images),
+        'count_agreement': float(np.mean(count_agreement)) if count_agreement else 0.0,
+        'min_best_box_iou': min(box_ious) if box_ious else None,
+        'mean_best_box_iou': float(np.mean(box_ious)) if box_ious else None,
+        'mean_mask_agreement': float(np.mean(mask_agreement)) if mask_agreement else None
+    }
+
+
+def main() -> int:
+    from inference_utils import body_seg_model_path, face_seg_model_path, load_image_rgb
+
+    parser = argparse.ArgumentParser(description="Export the YOLO models to ONNX")
+    parser.add_argument("--images", default=None, help="directory of images for a parity check")
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    images = []
+    if args.images:
+        paths = sorted(glob.glob(os.path.join(args.images, '*')))
+        images = [img for img in (load_image_rgb(p) for p in paths) if img is not None]
+
+    for pt_path in (body_seg_model_path, face_seg_model_path):
+        onnx_path = yolo_onnx_path(pt_path)
+        if not os.path.exists(onnx_path):
+            export_yolo_onnx(pt_path, imgsz=args.imgsz)
+        print(f"[OK] {onnx_path}")
+        if images:
+            print(verify_onnx_yolo_parity(pt_path, OnnxYOLO(onnx_path), images))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from preprocessing import ImageTransform, MaskTransform
+
+
+# ==========================================================
+# REDUCED-PRECISION MODES AND THEIR ACCURACY GUARDRAIL
+# ==========================================================
+#
+# Reduced-precision models are drop-in wrappers, so every scoring / detection
+# path (micro-batcher, batch endpoint, Gradio) uses them unchanged:
+# - AutocastScorer: CamelBeautyScorer under torch.autocast (bf16 on CPU uses
+#   AMX / AVX512-BF16 kernels where the CPU has them), outputs cast to fp32;
+# - HalfPrecisionYOLO: YOLO predict(half=True); ultralytics only honours this
+#   on CUDA.
+# check_precision_drift() compares a mode's results with fp32 results on the
+# same inputs; ModelRuntime only enables the mode when it passes.
+
+class AutocastScorer(nn.Module):
+    """Runs the wrapped scorer under autocast(dtype); returns fp32 logits."""
+
+    def __init__(self, model: nn.Module, dtype: torch.dtype = torch.bfloat16):
+        super().__init__()
+        self.model = model
+        self.dtype = dtype
+
+    def forward(self, **inputs) -> Dict[str, torch.Tensor]:
+        device_type = next(self.model.parameters()).device.type
+        with torch.autocast(device_type=device_type, dtype=self.dtype):
+            outputs = self.model(**inputs)
+        return {name: logits.float() for name, logits in outputs.items()}
+
+
+class HalfPrecisionYOLO:
+    """Delegates to a YOLO model, with half=True as the predict() default."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, *args, **kwargs):
+        kwargs.setdefault('half', True)
+        return self.model.predict(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def synthetic_scorer_samples(
+    count: int = 16,
+    seed: int = 0,
+    size=(224, 224)
+) -> List[Dict[str, torch.Tensor]]:
+    """
+    Deterministic scorer samples (smoothed noise crops, elliptical masks, every
+    other sample without a face) for drift checks when no reference images
+    are configured.
+    """
+    rng = np.random.default_rng(seed)
+    image_transform = ImageTransform(size)
+    mask_transform = MaskTransform(size)
+    h, w = size
+    yy, xx = np.mgrid[0:h, 0:w]
+
+    samples = []
+    for i in range(count):
+        sample = {}
+        for prefix, present in (('body', True), ('face', i % 2 == 0)):
+            coarse = rng.integers(0, 256, size=(h // 8, w // 8, 3), dtype=np.uint8)
+            crop = np.repeat(np.repeat(coarse, 8, axis=0), 8, axis=1)
+            cy, cx = rng.uniform(0.3, 0.7) * h, rng.uniform(0.3, 0.7) * w
+            ry, rx = rng.uniform(0.2, 0.45) * h, rng.uniform(0.2, 0.45) * w
+            mask = ((((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2) <= 1.0).astype(np.uint8)
+
+            sample[f'{prefix}_image'] = image_transform(crop)
+            sample[f'{prefix}_mask'] = mask_transform(mask)
+            sample[f'{prefix}_present'] = torch.tensor(present)
+        samples.append(sample)
+    return samples
+
+
+def check_precision_drift(
+    reference: List[Optional[Dict[str, Any]]],
+    candidate: List[Optional[Dict[str, Any]]],
+    max_total_drift: float,
+    max_category_flip_rate: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Compare result dicts (as returned by score_scorer_samples; None where no
+    camel was detected) of a reduced-precision mode with the fp32 ones.
+
+    The mode is accepted when the largest |total_score_0_100| difference is
+    <= max_total_drift and the fraction of changed category predictions is
+    <= max_category_flip_rate. An image detected in one run but not in the
+    other counts as a category flip.
+    """
+    if len(reference) != len(candidate):
+        raise ValueError('reference and candidate results differ in length')
+
+    drifts = []
+    flips = 0
+    detection_mismatches = 0
+    for ref, cand in zip(reference, candidate):
+        if ref is None and cand is None:
+            continue
+        if ref is None or cand is None:
+            detection_mismatches += 1
+            flips += 1
+            continue
+        drifts.append(abs(ref['total_score_0_100'] - cand['total_score_0_100']))
+        ref_class = ref['scores_dict']['category_encoded']['predicted_class']
+        cand_class = cand['scores_dict']['category_encoded']['predicted_class']
+        flips += int(ref_class != cand_class)
+
+    compared = len(drifts) + detection_mismatches
+    max_drift = max(drifts) if drifts else 0.0
+    flip_rate = flips / compared if compared else 0.0
+
+    return {
+        'num_compared': compared,
+        'max_total_drift': max_drift,
+        'mean_total_drift': sum(drifts) / len(drifts) if drifts else 0.0,
+        'category_flip_rate': flip_rate,
+        'detection_mismatches': detection_mismatches,
+        'thresholds': {
+            'max_total_drift': max_total_drift,
+            'max_category_flip_rate': max_category_flip_rate
+        },
+        'accepted': compared > 0 and max_drift <= max_total_drift
+                    and flip_rate <= max_category_flip_rate
+    }
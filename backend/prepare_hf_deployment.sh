@@ -23,6 +23,16 @@ cd $DEPLOY_DIR
 echo "📋 Copying necessary files..."
 cp ../app_gradio.py app.py
 cp ../inference_utils.py .
+cp ../model_runtime.py .
+cp ../preprocessing.py .
+cp ../checkpoint_io.py .
+cp ../quantization.py .
+cp ../precision.py .
+cp ../onnx_backend.py .
+cp ../onnx_yolo.py .
+cp ../compiled_scorer.py .
+cp ../result_cache.py .
+cp ../instrumentation.py .
 cp ../requirements_gradio.txt requirements.txt
 cp ../README_HUGGINGFACE.md README.md
 
@@ -253,6 +263,7 @@ echo ""
 echo "Files created:"
 echo "  - app.py (Gradio interface)"
 echo "  - inference_utils.py (ML inference code)"
+echo "  - model_runtime.py, checkpoint_io.py, quantization.py, precision.py, onnx_backend.py, onnx_yolo.py, compiled_scorer.py, preprocessing.py, result_cache.py, instrumentation.py (model loading, preprocessing)"
 echo "  - requirements.txt (Python dependencies)"
 echo "  - README.md (Space description)"
 echo "  - download_models.py (Model download script)"
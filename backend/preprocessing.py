@@ -0,0 +1,154 @@
+import numpy as np
+import torch
+import torch.nn.functional as F
+from typing import Dict, List, Optional, Tuple, Union
+from PIL import Image
+
+
+# ==========================================================
+# TENSOR-NATIVE PREPROCESSING (REPLACES PIL TRANSFORMS)
+# ==========================================================
+#
+# ImageTransform / MaskTransform take uint8 NumPy crops (or PIL images) and
+# produce the same tensors as the torchvision PIL pipelines
+#   Resize(224) -> ToTensor -> Normalize          (images)
+#   Resize(224, NEAREST) -> ToTensor -> > 0.5     (masks)
+# using vectorized torch ops, without Image.fromarray round-trips.
+#
+# Tolerance vs. the PIL pipeline:
+# - masks are identical (same NEAREST sampling positions as PIL);
+# - images: antialiased bilinear resize is rounded back to uint8 levels like
+#   PIL does, so pixels differ by at most 1 level (<= 1/255/std, ~0.018 after
+#   normalisation), and CamelBeautyScorer logits by less than 0.01.
+# tests/test_preprocessing.py checks both bounds against the PIL pipelines.
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def pil_nearest_indices(dst_len: int, src_len: int) -> np.ndarray:
+    """Source indices PIL's NEAREST resize samples (pixel centres) for src_len -> dst_len."""
+    centres = (np.arange(dst_len) + 0.5) * (src_len / dst_len)
+    return np.minimum(centres.astype(np.int64), src_len - 1)
+
+
+def _as_array(img: Union[np.ndarray, Image.Image], mode: str) -> np.ndarray:
+    if isinstance(img, Image.Image):
+        img = np.asarray(img.convert(mode))
+    if not img.flags.writeable:
+        # torch.from_numpy warns on read-only arrays
+        img = img.copy()
+    return img
+
+
+class ImageTransform:
+    """
+    uint8 RGB crop (H, W, 3) -> normalized float tensor (3, h, w), h, w = size.
+    Pass out= to write into a preallocated (3, h, w) tensor, e.g. a batch slot.
+    """
+
+    def __init__(
+        self,
+        size: Tuple[int, int] = (224, 224),
+        mean: Tuple[float, float, float] = IMAGENET_MEAN,
+        std: Tuple[float, float, float] = IMAGENET_STD
+    ):
+        self.size = tuple(size)
+        std_t = torch.tensor(std, dtype=torch.float32).view(3, 1, 1)
+        mean_t = torch.tensor(mean, dtype=torch.float32).view(3, 1, 1)
+        # (x / 255 - mean) / std  ==  x * scale + bias
+        self.scale = 1.0 / (255.0 * std_t)
+        self.bias = -mean_t / std_t
+
+    def __call__(
+        self,
+        img: Union[np.ndarray, Image.Image],
+        out: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        img = _as_array(img, 'RGB')
+        t = torch.from_numpy(img).permute(2, 0, 1).unsqueeze(0).float()   # (1,3,H,W)
+
+        if tuple(t.shape[-2:]) != self.size:
+            t = F.interpolate(t, size=self.size, mode='bilinear',
+                              align_corners=False, antialias=True)
+            t = t.round_().clamp_(0.0, 255.0)
+
+        if out is None:
+            out = torch.empty(3, *self.size, dtype=torch.float32)
+        return torch.addcmul(self.bias.to(out.device), t[0].to(out.device),
+                             self.scale.to(out.device), out=out)
+
+
+class MaskTransform:
+    """
+    Binary mask (H, W) -> float tensor (1, h, w) of 0/1, resized with PIL's
+    NEAREST sampling. uint8 masks may be 0/1 or 0/255 (any value > 0 is
+    foreground); float masks are thresholded at 0.5.
+    Pass out= to write into a preallocated (1, h, w) tensor.
+    """
+
+    def __init__(self, size: Tuple[int, int] = (224, 224)):
+        self.size = tuple(size)
+
+    def __call__(
+        self,
+        mask: Union[np.ndarray, Image.Image],
+        out: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        mask = _as_array(mask, 'L')
+        if mask.ndim == 3:
+            mask = mask[..., 0]
+
+        out_h, out_w = self.size
+        if mask.shape != (out_h, out_w):
+            rows = pil_nearest_indices(out_h, mask.shape[0])
+            cols = pil_nearest_indices(out_w, mask.shape[1])
+            mask = mask[np.ix_(rows, cols)]
+
+        binary = mask > (0 if mask.dtype == np.uint8 else 0.5)
+        t = torch.from_numpy(binary).unsqueeze(0)
+
+        if out is None:
+            return t.float()
+        out.copy_(t)
+        return out
+
+
+class BatchBuffers:
+    """
+    Preallocated CamelBeautyScorer input tensors for up to max_batch_size
+    samples, reused across forwards. Not thread-safe: give each scoring thread
+    its own instance.
+    """
+
+    KEYS = ('body_image', 'body_mask', 'body_present',
+            'face_image', 'face_mask', 'face_present')
+
+    def __init__(
+        self,
+        max_batch_size: int,
+        size: Tuple[int, int] = (224, 224),
+        device: Union[str, torch.device] = 'cpu'
+    ):
+        h, w = size
+        self.max_batch_size = max_batch_size
+        self.tensors = {
+            'body_image': torch.empty(max_batch_size, 3, h, w, device=device),
+            'body_mask': torch.empty(max_batch_size, 1, h, w, device=device),
+            'body_present': torch.empty(max_batch_size, dtype=torch.bool, device=device),
+            'face_image': torch.empty(max_batch_size, 3, h, w, device=device),
+            'face_mask': torch.empty(max_batch_size, 1, h, w, device=device),
+            'face_present': torch.empty(max_batch_size, dtype=torch.bool, device=device),
+        }
+
+    def fill(self, samples: List[Dict[str, torch.Tensor]]) -> Dict[str, torch.Tensor]:
+        """Copy samples into the buffers and return (len(samples), ...) views."""
+        n = len(samples)
+        if n > self.max_batch_size:
+            raise ValueError(f'{n} samples do not fit in buffers of size {self.max_batch_size}')
+        for key in self.KEYS:
+            buf = self.tensors[key]
+            for i, sample in enumerate(samples):
+                buf[i].copy_(sample[key])
+        return {key: self.tensors[key][:n] for key in self.KEYS}
+
@@ -0,0 +1,221 @@
+import gzip
+import os
+import random
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import torch
+
+from instrumentation import add_stage_hook, remove_stage_hook
+
+
+# ==========================================================
+# ON-DEMAND TORCH PROFILER CAPTURE OF LIVE REQUESTS
+# ==========================================================
+#
+# An admin arms the capture for the next N requests and/or a random sample
+# of requests (optionally for a limited time). Each selected request runs
+# under torch.profiler (CPU ops, memory, input shapes; CUDA too when
+# available), with a record_function span per pipeline stage, and is written
+# as a gzipped Chrome trace (chrome://tracing, Perfetto). Only one request is
+# profiled at a time. Oldest traces are deleted once the directory exceeds
+# max_bytes. While disarmed, requests only read one attribute.
+
+class ProfilerCapture:
+    def __init__(self, trace_dir: str, max_bytes: int = 512 * 1024 * 1024, with_stack: bool = False):
+        self.trace_dir = trace_dir
+        self.max_bytes = int(max_bytes)
+        self.with_stack = with_stack
+
+        self._lock = threading.Lock()
+        self.armed = False
+        self._remaining = 0
+        self._sample_rate = 0.0
+        self._deadline: Optional[float] = None
+        self._profiling = False
+        self._hooked = False
+        self._sequence = 0
+        self.captured = 0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Arming
+    # ------------------------------------------------------------------
+
+    def arm(self, requests: int = 0, sample_rate: float = 0.0, duration_s: Optional[float] = None) -> Dict[str, Any]:
+        """Profile the next `requests` requests, then each request with probability sample_rate."""
+        requests = int(requests)
+        sample_rate = float(sample_rate)
+        if requests < 0 or not 0.0 <= sample_rate <= 1.0:
+            raise ValueError('requests must be >= 0 and sample_rate within [0, 1]')
+        if requests == 0 and sample_rate == 0.0:
+            raise ValueError('Give requests > 0 and/or sample_rate > 0')
+        if duration_s is not None and float(duration_s) <= 0:
+            raise ValueError('duration_s must be positive')
+
+        with self._lock:
+            self._remaining = requests
+            self._sample_rate = sample_rate
+            self._deadline = time.monotonic() + float(duration_s) if duration_s is not None else None
+            self.armed = True
+            if not self._hooked:
+                add_stage_hook(self._stage_span)
+                self._hooked = True
+        return self.status()
+
+    def disarm(self) -> Dict[str, Any]:
+        with self._lock:
+            self._disarm_locked()
+        return self.status()
+
+    def _disarm_locked(self) -> None:
+        self.armed = False
+        self._remaining = 0
+        self._sample_rate = 0.0
+        self._deadline = None
+        if self._hooked and not self._profiling:
+            remove_stage_hook(self._stage_span)
+            self._hooked = False
+
+    # ------------------------------------------------------------------
+    # Per-request capture
+    # ------------------------------------------------------------------
+
+    def _select_locked(self) -> bool:
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            self._disarm_locked()
+            return False
+        if self._profiling:
+            return False
+        if self._remaining > 0:
+            self._remaining -= 1
+        elif random.random() >= self._sample_rate:
+            return False
+        if self._remaining == 0 and self._sample_rate == 0.0:
+            # Last request to capture; the stage hook goes once it is written
+            self.armed = False
+            self._deadline = None
+        return True
+
+    def begin(self) -> Optional[torch.profiler.profile]:
+        """Start profiling the calling request if it is selected; None otherwise."""
+        if not self.armed:
+            return None
+        with self._lock:
+            if not self.armed or not self._select_locked():
+                return None
+            self._profiling = True
+
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        try:
+            profiler = torch.profiler.profile(
+                activities=activities,
+                record_shapes=True,
+                profile_memory=True,
+                with_stack=self.with_stack
+            )
+            profiler.start()
+        except Exception as e:
+            self._end(error=f'{type(e).__name__}: {e}')
+            return None
+        return profiler
+
+    def finish(self, profiler: torch.profiler.profile, label: str) -> Optional[str]:
+        """Stop the request's profiler and write its trace; returns the trace path."""
+        path, error = None, None
+        try:
+            profiler.stop()
+            path = self._write(profiler, label)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        self._end(error, captured=path is not None)
+        return path
+
+    def _end(self, error: Optional[str] = None, captured: bool = False) -> None:
+        with self._lock:
+            self._profiling = False
+            if captured:
+                self.captured += 1
+            if error is not None:
+                self.last_error = error
+                print(f"Profiler capture failed: {error}")
+            if not self.armed and self._hooked:
+                remove_stage_hook(self._stage_span)
+                self._hooked = False
+
+    def _stage_span(self, name: str, items: int):
+        if not self._profiling:
+            return None
+        return torch.profiler.record_function(f'camel::{name}')
+
+    # ------------------------------------------------------------------
+    # Trace files
+    # ------------------------------------------------------------------
+
+    def _write(self, profiler: torch.profiler.profile, label: str) -> str:
+        os.makedirs(self.trace_dir, exist_ok=True)
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{sequence:04d}-{label}"
+        raw_path = os.path.join(self.trace_dir, stem + '.json.tmp')
+        path = os.path.join(self.trace_dir, stem + '.json.gz')
+
+        profiler.export_chrome_trace(raw_path)
+        try:
+            with open(raw_path, 'rb') as src, gzip.open(path + '.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        finally:
+            os.remove(raw_path)
+        os.replace(path + '.tmp', path)
+
+        self._rotate()
+        return path
+
+    def traces(self) -> List[Dict[str, Any]]:
+        """Trace files, newest first."""
+        if not os.path.isdir(self.trace_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.trace_dir):
+            if not name.endswith('.json.gz'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.trace_dir, name))
+            except OSError:
+                continue
+            entries.append({'name': name, 'bytes': st.st_size, 'mtime': st.st_mtime})
+        return sorted(entries, key=lambda e: e['mtime'], reverse=True)
+
+    def _rotate(self) -> None:
+        entries = self.traces()
+        total = sum(e['bytes'] for e in entries)
+        # Always keep the newest trace, even if it alone exceeds the cap
+        while total > self.max_bytes and len(entries) > 1:
+            oldest = entries.pop()
+            try:
+                os.remove(os.path.join(self.trace_dir, oldest['name']))
+            except OSError:
+                pass
+            total -= oldest['bytes']
+
+    def status(self) -> Dict[str, Any]:
+        traces = self.traces()
+        with self._lock:
+            return {
+                'armed': self.armed,
+                'remaining_requests': self._remaining,
+                'sample_rate': self._sample_rate,
+                'seconds_left': max(0.0, self._deadline - time.monotonic()) if self._deadline else None,
+                'profiling': self._profiling,
+                'captured': self.captured,
+                'last_error': self.last_error,
+                'trace_dir': self.trace_dir,
+                'total_bytes': sum(t['bytes'] for t in traces),
+                'max_bytes': self.max_bytes,
+                'traces': traces[:20]
+            }
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Dynamic INT8 quantization of CamelBeautyScorer for CPU inference.
+
+    python quantization.py --images ref_images/ [--output report.json]
+
+builds (or reuses) the cached INT8 scorer and reports its speed-up and
+per-attribute score deviation against the FP32 scorer on the given images.
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+import torch.nn as nn
+
+from inference_utils import (
+    CamelBeautyScorer,
+    BEAUTY_ATTRIBUTES,
+    score_scorer_samples
+)
+from result_cache import cached_sha256
+
+
+# ==========================================================
+# DYNAMIC INT8 QUANTIZATION (CPU)
+# ==========================================================
+#
+# Every nn.Linear (ViT attention/MLP projections of both encoders, the
+# CrossModalFusion FFN, shared_mlp and the attribute heads) gets INT8 weights
+# and dynamically quantized activations. Convolutions, LayerNorm/BatchNorm,
+# embeddings and nn.MultiheadAttention's fused projections stay FP32 (PyTorch
+# does not dynamically quantize those).
+
+def quantize_scorer_dynamic(model: CamelBeautyScorer) -> CamelBeautyScorer:
+    """Quantize model in place (it must be on CPU) and return it."""
+    model.cpu().eval()
+    torch.ao.quantization.quantize_dynamic(
+        model, {nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+    # The FP32 leftovers may still be views into a memory-mapped checkpoint;
+    # give them their own storage so the cached state_dict holds only what is used
+    for module in model.modules():
+        for _, param in module.named_parameters(recurse=False):
+            param.data = param.data.clone()
+        for name, buf in module.named_buffers(recurse=False):
+            setattr(module, name, buf.clone())
+    return model
+
+
+def quantized_cache_path(checkpoint_path: str, cache_dir: Optional[str] = None) -> str:
+    """Cache file of the INT8 model, keyed by the source checkpoint's SHA-256."""
+    digest = cached_sha256(checkpoint_path)[:16]
+    stem = os.path.splitext(os.path.basename(checkpoint_path))[0]
+    directory = cache_dir or os.path.dirname(os.path.abspath(checkpoint_path))
+    return os.path.join(directory, f'{stem}.int8-{digest}.pt')
+
+
+def load_quantized_scorer(
+    checkpoint_path: str,
+    load_fp32: Callable[[], CamelBeautyScorer],
+    cache_dir: Optional[str] = None
+) -> CamelBeautyScorer:
+    """
+    INT8 scorer for checkpoint_path: load_fp32() (a CPU FP32 scorer)
+    quantized in place, with its INT8 weights taken from the on-disk
+    state_dict cache when present. Without a usable cache the quantized
+    weights are written to it; an unreadable cache file is rebuilt, and a
+    cache directory that cannot be written (read-only image, full disk) only
+    costs the cache: the in-memory model is served either way.
+    """
+    cache_path = quantized_cache_path(checkpoint_path, cache_dir)
+    model = quantize_scorer_dynamic(load_fp32())
+
+    if os.path.exists(cache_path):
+        try:
+            state_dict = torch.load(cache_path, map_location='cpu', weights_only=True)
+            # Checked before loading so a cache from another layout (torch
+            # version, code change) never half-overwrites the model
+            if set(state_dict) != set(model.state_dict()):
+                raise ValueError('state_dict keys do not match the quantized scorer')
+            model.load_state_dict(state_dict)
+            return model.eval()
+        except Exception as e:
+            print(f"Ignoring unreadable quantized scorer cache {cache_path}: {e}")
+
+    tmp_path = cache_path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        torch.save(model.state_dict(), tmp_path)
+        os.replace(tmp_path, cache_path)
+        print(f"Cached quantized scorer at {cache_path}")
+    except OSError as e:
+        print(f"Not caching quantized scorer at {cache_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return model
+
+
+# ==========================================================
+# ACCURACY / LATENCY REPORT AGAINST FP32
+# ==========================================================
+
+def _timed_scores(model, samples, repeats: int, batch_size: int):
+    device = next(model.parameters()).device
+    # Warm-up forward (allocations, kernel selection) is not timed
+    score_scorer_samples(samples[:batch_size], model, device=device, max_batch_size=batch_size)
+
+    latencies = []
+    results = None
+    for _ in range(max(1, repeats)):
+        started = time.perf_counter()
+        results = score_scorer_samples(samples, model, device=device, max_batch_size=batch_size)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return results, latencies
+
+
+def _abs_diff_stats(pairs) -> Dict[str, float]:
+    diffs = [abs(a - b) for a, b in pairs]
+    return {
+        'mean_abs': statistics.fmean(diffs) if diffs else 0.0,
+        'max_abs': max(diffs) if diffs else 0.0
+    }
+
+
+def compare_scorers(
+    reference: CamelBeautyScorer,
+    candidate: CamelBeautyScorer,
+    samples: List[Dict[str, torch.Tensor]],
+    repeats: int = 5,
+    batch_size: int = 8
+) -> Dict[str, Any]:
+    """
+    Score the same scorer samples with both models and report latency
+    (ms per pass over all samples), speed-up and score deviation: per
+    attribute (0-100 scale), total score, star rating and category agreement.
+    """
+    if not samples:
+        raise ValueError('No reference samples to compare on')
+
+    ref_results, ref_ms = _timed_scores(reference, samples, repeats, batch_size)
+    cand_results, cand_ms = _timed_scores(candidate, samples, repeats, batch_size)
+
+    ref_p50 = statistics.median(ref_ms)
+    cand_p50 = statistics.median(cand_ms)
+
+    attributes = {
+        attr: _abs_diff_stats(
+            (r['scores_dict'][attr]['score_0_100'], c['scores_dict'][attr]['score_0_100'])
+            for r, c in zip(ref_results, cand_results)
+        )
+        for attr in BEAUTY_ATTRIBUTES
+    }
+    category_agreement = statistics.fmean(
+        float(r['scores_dict']['category_encoded']['predicted_class']
+              == c['scores_dict']['category_encoded']['predicted_class'])
+        for r, c in zip(ref_results, cand_results)
+    )
+
+    return {
+        'num_samples': len(samples),
+        'batch_size': batch_size,
+        'latency_ms': {
+            'reference_p50': ref_p50,
+            'candidate_p50': cand_p50,
+            'reference_per_image': ref_p50 / len(samples),
+            'candidate_per_image': cand_p50 / len(samples)
+        },
+        'speedup': ref_p50 / cand_p50 if cand_p50 > 0 else float('inf'),
+        'attribute_deviation': attributes,
+        'total_score_deviation': _abs_diff_stats(
+            (r['total_score_0_100'], c['total_score_0_100'])
+            for r, c in zip(ref_results, cand_results)
+        ),
+        'star_rating_deviation': _abs_diff_stats(
+            (r['star_rating_0_5'], c['star_rating_0_5'])
+            for r, c in zip(ref_results, cand_results)
+        ),
+        'category_agreement': category_agreement
+    }
+
+
+def reference_samples_from_images(
+    image_paths: List[str],
+    body_yolo_model,
+    face_yolo_model
+) -> List[Optional[Dict[str, torch.Tensor]]]:
+    """
+    Detect + crop reference images; one scorer sample per readable image,
+    None where no body was detected.
+    """
+    from inference_utils import load_image_rgb, prepare_images_for_scoring, image_transform, mask_transform
+
+    images = [img for img in (load_image_rgb(p) for p in image_paths) if img is not None]
+    prepared = prepare_images_for_scoring(
+        images, body_yolo_model, face_yolo_model,
+        image_transform, mask_transform
+    )
+    return [sample for _, sample in prepared]
+
+
+def main() -> int:
+    from model_runtime import ModelRuntime
+
+    parser = argparse.ArgumentParser(description="Build the INT8 scorer and compare it with FP32")
+    parser.add_argument("--images", required=True, help="directory (or glob) of reference camel images")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--cache-dir", default=None, help="where to cache the INT8 model")
+    parser.add_argument("--output", default=None, help="write the report as JSON here")
+    args = parser.parse_args()
+
+    pattern = os.path.join(args.images, '*') if os.path.isdir(args.images) else args.images
+    image_paths = sorted(glob.glob(pattern))
+
+    cpu = torch.device('cpu')
+    fp32 = ModelRuntime(device=cpu, warmup=False)
+    int8 = ModelRuntime(device=cpu, warmup=False, scorer_precision='int8',
+                        quantized_cache_dir=args.cache_dir)
+
+    samples = [
+        sample for sample in reference_samples_from_images(
+            image_paths, fp32.body_yolo_model, fp32.face_yolo_model
+        )
+        if sample is not None
+    ]
+    print(f"{len(samples)} / {len(image_paths)} reference images with a detected body")
+
+    report = compare_scorers(
+        fp32.beauty_scorer_model, int8.beauty_scorer_model, samples,
+        repeats=args.repeats, batch_size=args.batch_size
+    )
+    report['torch_threads'] = torch.get_num_threads()
+    report['quantized_engine'] = torch.backends.quantized.engine
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
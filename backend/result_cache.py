@@ -0,0 +1,429 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+
+# ==========================================================
+# CONTENT-ADDRESSED RESULT CACHE
+# ==========================================================
+
+def sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def cached_sha256(path: str) -> str:
+    """
+    sha256_file(path), computed once per file version: the digest is kept in
+    memory and in a '<path>.sha256-cache' file keyed on (size, mtime), so other
+    workers and restarts skip reading the file. A file rewritten with the same
+    size and mtime would go unnoticed; an unwritable directory only costs the
+    on-disk cache. Fine for naming artifacts and cache keys, not for integrity
+    checks (checkpoint_io.verify_checksum hashes the bytes itself).
+    """
+    st = os.stat(path)
+    version = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(version)
+    if digest is not None:
+        return digest
+
+    cache_path = path + '.sha256-cache'
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            digest = cached['sha256']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    if digest is None:
+        digest = sha256_file(path)
+        try:
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+
+    with _digests_lock:
+        _digests[version] = digest
+    return digest
+
+
+def compute_model_fingerprint(
+    checkpoint_paths: List[str],
+    score_weights: Dict[str, float],
+    extra: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Fingerprint of everything that determines a scoring result: the hashes of
+    the served body/face/scorer model files, the SCORE_WEIGHTS and any extra
+    settings. Missing files contribute their path only.
+    """
+    parts = {
+        'checkpoints': [
+            cached_sha256(path) if os.path.exists(path) else f'missing:{path}'
+            for path in checkpoint_paths
+        ],
+        'score_weights': score_weights,
+        'extra': extra or {}
+    }
+    blob = json.dumps(parts, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+class PersistentResultStore:
+    """
+    Optional on-disk result store (SQLite file under `directory`) that survives
+    restarts. Values must be JSON-serialisable (tuples come back as lists).
+
+    Entries are keyed like ResultCache (model fingerprint + image hash). When
+    the stored payload exceeds max_bytes, the least recently used entries are
+    evicted down to 90% of the limit; compact() additionally drops entries of
+    other model fingerprints and VACUUMs the file.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, evict_every: int = 64):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'results.sqlite3')
+        self.max_bytes = int(max_bytes)
+        self.evict_every = max(1, int(evict_every))
+
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' key TEXT PRIMARY KEY,'
+            ' model_fingerprint TEXT NOT NULL,'
+            ' value TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' accessed REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)'
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM results WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            self._conn.execute(
+                'UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key)
+            )
+            self._conn.commit()
+        return True, json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        blob = json.dumps(value)
+        fingerprint = key.split(':', 1)[0]
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, model_fingerprint, value, size, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, fingerprint, blob, len(blob), time.time())
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= self.evict_every:
+                self._puts_since_evict = 0
+                self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = self._conn.execute('SELECT key, size FROM results ORDER BY accessed ASC').fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+            evicted += 1
+        self._conn.executemany('DELETE FROM results WHERE key = ?', doomed)
+        self._conn.commit()
+        return evicted
+
+    def compact(self, keep_fingerprint: Optional[str] = None) -> Dict[str, int]:
+        """Drop stale-model entries, enforce max_bytes and reclaim file space."""
+        with self._lock:
+            dropped = 0
+            if keep_fingerprint is not None:
+                dropped = self._conn.execute(
+                    'DELETE FROM results WHERE model_fingerprint != ?', (keep_fingerprint,)
+                ).rowcount
+                self._conn.commit()
+            evicted = self._evict_locked()
+            self._conn.execute('VACUUM')
+        return {'stale_dropped': dropped, 'evicted': evicted}
+
+    def load_recent(self, model_fingerprint: str, limit: int) -> List[Tuple[str, Any]]:
+        """Most recently used (key, value) pairs of one model, newest last."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, value FROM results WHERE model_fingerprint = ? '
+                'ORDER BY accessed DESC LIMIT ?',
+                (model_fingerprint, int(limit))
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in reversed(rows)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results'
+            ).fetchone()
+        return {
+            'path': self.path,
+            'entries': count,
+            'payload_bytes': total,
+            'max_bytes': self.max_bytes,
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    Bounded in-memory LRU cache with TTL, keyed by SHA-256(image bytes) plus a
+    model fingerprint.
+
+    model_fingerprint may be a callable (e.g. one that needs the models
+    loaded); it is then resolved by prepare(), at the latest on first use,
+    which also drops other fingerprints from the store and warms up from it.
+
+    Identical in-flight requests are collapsed: the first caller for a key
+    computes, concurrent callers for the same key wait for its result, in
+    get_or_compute for at most wait_timeout_s (None: no limit).
+    Cached values are shared between callers and must not be mutated.
+
+    With a PersistentResultStore, in-memory misses fall back to the store and
+    computed results are written through to it.
+    """
+
+    def __init__(
+        self,
+        model_fingerprint: Union[str, Callable[[], str]],
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        store: Optional[PersistentResultStore] = None,
+        wait_timeout_s: Optional[float] = None
+    ):
+        if callable(model_fingerprint):
+            self._fingerprint_fn, self._model_fingerprint = model_fingerprint, None
+        else:
+            self._fingerprint_fn, self._model_fingerprint = None, model_fingerprint
+        self._prepare_lock = threading.Lock()
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.store = store
+        self.wait_timeout_s = wait_timeout_s
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()      # key -> (value, expires_at)
+        self._in_flight = {}               # key -> Future
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'collapsed': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'store_hits': 0
+        }
+
+    @property
+    def model_fingerprint(self) -> str:
+        if self._model_fingerprint is None:
+            return self.prepare()
+        return self._model_fingerprint
+
+    def prepare(self) -> str:
+        """Resolve a lazy model fingerprint, compact the store to it and warm up (once)."""
+        with self._prepare_lock:
+            if self._model_fingerprint is None:
+                fingerprint = self._fingerprint_fn()
+                if self.store is not None:
+                    self.store.compact(keep_fingerprint=fingerprint)
+                self._model_fingerprint = fingerprint
+                self.warm()
+        return self._model_fingerprint
+
+    def key(self, image_bytes: bytes) -> str:
+        return f'{self.model_fingerprint}:{hashlib.sha256(image_bytes).hexdigest()}'
+
+    def _lookup_locked(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if self.ttl_seconds > 0 and time.monotonic() >= expires_at:
+            del self._entries[key]
+            self._counters['expirations'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store_locked(self, key: str, value: Any) -> None:
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _lookup_store(self, key: str) -> Tuple[bool, Any]:
+        """Fall back to the persistent store, promoting hits into memory."""
+        if self.store is None:
+            return False, None
+        found, value = self.store.get(key)
+        if found:
+            with self._lock:
+                self._counters['store_hits'] += 1
+                self._store_locked(key, value)
+        return found, value
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(found, value) without computing anything."""
+        with self._lock:
+            found, value = self._lookup_locked(key)
+        if not found:
+            found, value = self._lookup_store(key)
+        with self._lock:
+            self._counters['hits' if found else 'misses'] += 1
+        return found, value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._store_locked(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def warm(self) -> int:
+        """Load the most recently used entries of this model from the store."""
+        if self.store is None:
+            return 0
+        entries = self.store.load_recent(self.model_fingerprint, self.max_entries)
+        with self._lock:
+            for key, value in entries:
+                self._store_locked(key, value)
+        return len(entries)
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """
+        Returns (future, is_owner).
+        - cached: an already resolved future, is_owner False
+        - being computed by someone else: their future, is_owner False
+        - otherwise: a new future and is_owner True; the caller must then call
+          resolve(key, value) or fail(key, exc).
+        """
+        with self._lock:
+            found, value = self._lookup_locked(key)
+            if not found:
+                future = self._in_flight.get(key)
+                if future is not None:
+                    self._counters['collapsed'] += 1
+                    return future, False
+
+                # Own the key before touching the (slower) persistent store
+                future = Future()
+                self._in_flight[key] = future
+
+        if not found:
+            found, value = self._lookup_store(key)
+            if not found:
+                with self._lock:
+                    self._counters['misses'] += 1
+                return future, True
+
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_result(value)
+
+        with self._lock:
+            self._counters['hits'] += 1
+        done = Future()
+        done.set_result(value)
+        return done, False
+
+    def resolve(self, key: str, value: Any) -> None:
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+            self._store_locked(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        """Errors are propagated to waiters but never cached."""
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future is not None:
+            future.set_exception(exc)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns (value, computed_here). computed_here is False for cache hits
+        and for requests collapsed onto an identical in-flight one; those raise
+        concurrent.futures.TimeoutError after wait_timeout_s.
+        """
+        future, is_owner = self.claim(key)
+        if not is_owner:
+            return future.result(timeout=self.wait_timeout_s), False
+
+        try:
+            value = compute()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.resolve(key, value)
+        return value, True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+            in_flight = len(self._in_flight)
+        lookups = counters['hits'] + counters['misses'] + counters['collapsed']
+        return {
+            # None until a lazy fingerprint is resolved
+            'model_fingerprint': self._model_fingerprint,
+            'entries': size,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'in_flight': in_flight,
+            'hit_rate': (counters['hits'] + counters['collapsed']) / lookups if lookups else 0.0,
+            'store': self.store.stats() if self.store is not None else None,
+            **counters
+        }
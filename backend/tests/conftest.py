@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules import each other as top-level modules (app.py is run
+# from this directory), so put it on the path for the tests as well.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,125 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_concurrent_samples_are_collated_into_one_call():
+    calls = []
+
+    def score_fn(samples):
+        calls.append(list(samples))
+        return [s * 10 for s in samples]
+
+    batcher = MicroBatcher(score_fn, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(i) for i in range(4)]
+        assert [f.result(timeout=5) for f in futures] == [0, 10, 20, 30]
+    finally:
+        batcher.shutdown(timeout=5)
+
+    assert calls == [[0, 1, 2, 3]]
+    stats = batcher.stats()
+    assert stats['total_requests'] == 4
+    assert stats['total_batches'] == 1
+    assert stats['batch_size_histogram'] == {4: 1}
+
+
+def test_batches_are_capped_at_max_batch_size():
+    sizes = []
+    gate = threading.Event()
+
+    def score_fn(samples):
+        gate.wait(5)
+        sizes.append(len(samples))
+        return list(samples)
+
+    batcher = MicroBatcher(score_fn, max_batch_size=2, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in range(5)]
+        gate.set()
+        assert [f.result(timeout=5) for f in futures] == list(range(5))
+    finally:
+        batcher.shutdown(timeout=5)
+
+    assert max(sizes) <= 2
+    assert sum(sizes) == 5
+
+
+def test_score_fn_exception_is_raised_for_every_caller():
+    def score_fn(samples):
+        raise ValueError('boom')
+
+    batcher = MicroBatcher(score_fn, max_batch_size=3, max_wait_ms=100)
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        for f in futures:
+            with pytest.raises(ValueError, match='boom'):
+                f.result(timeout=5)
+        # The worker survives a failing batch
+        batcher.score_fn = lambda samples: list(samples)
+        assert batcher.score(7, timeout=5) == 7
+    finally:
+        batcher.shutdown(timeout=5)
+
+
+def test_short_result_list_fails_the_batch_instead_of_hanging():
+    batcher = MicroBatcher(lambda samples: list(samples)[:1], max_batch_size=3, max_wait_ms=100)
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        for f in futures:
+            with pytest.raises(RuntimeError, match='1 results for 3 samples'):
+                f.result(timeout=5)
+    finally:
+        batcher.shutdown(timeout=5)
+
+
+def test_score_times_out():
+    release = threading.Event()
+
+    def score_fn(samples):
+        release.wait(5)
+        return list(samples)
+
+    batcher = MicroBatcher(score_fn, max_batch_size=1, max_wait_ms=0)
+    try:
+        with pytest.raises(FutureTimeoutError):
+            batcher.score(1, timeout=0.05)
+    finally:
+        release.set()
+        batcher.shutdown(timeout=5)
+
+
+def test_shutdown_drains_earlier_samples_and_fails_later_ones():
+    started = threading.Event()
+    release = threading.Event()
+
+    def score_fn(samples):
+        started.set()
+        release.wait(5)
+        return list(samples)
+
+    batcher = MicroBatcher(score_fn, max_batch_size=1, max_wait_ms=0)
+    running = batcher.submit('running')
+    assert started.wait(5)
+    queued = batcher.submit('queued')
+
+    stopper = threading.Thread(target=batcher.shutdown, kwargs={'timeout': 5})
+    stopper.start()
+    while batcher._queue.qsize() < 2:
+        time.sleep(0.001)
+    # A submit racing with shutdown lands behind the sentinel
+    late = Future()
+    batcher._queue.put(('late', late, time.perf_counter(), ()))
+    release.set()
+    stopper.join(5)
+
+    assert running.result(timeout=5) == 'running'
+    assert queued.result(timeout=5) == 'queued'
+    with pytest.raises(RuntimeError, match='shut down'):
+        late.result(timeout=5)
+    with pytest.raises(RuntimeError, match='shut down'):
+        batcher.submit('after')
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip('torch')
+
+import json
+import os
+
+import checkpoint_io
+import result_cache
+from checkpoint_io import verify_checksum, write_checksum
+
+
+def test_verify_checksum_hashes_each_file_version_once_per_process(tmp_path, monkeypatch):
+    path = tmp_path / 'scorer.safetensors'
+    path.write_bytes(b'weights')
+    write_checksum(str(path))
+    assert verify_checksum(str(path))
+
+    monkeypatch.setattr(checkpoint_io, 'sha256_file', lambda p: pytest.fail('file was re-hashed'))
+    assert verify_checksum(str(path))
+
+
+def test_new_process_rehashes_the_file(tmp_path, monkeypatch):
+    path = tmp_path / 'scorer.safetensors'
+    path.write_bytes(b'weights')
+    write_checksum(str(path))
+    result_cache.cached_sha256(str(path))
+
+    hashed = []
+    monkeypatch.setattr(checkpoint_io, '_verified_digests', {})
+    monkeypatch.setattr(checkpoint_io, 'sha256_file',
+                        lambda p: hashed.append(p) or result_cache.sha256_file(p))
+    assert verify_checksum(str(path))
+    assert hashed == [str(path)]
+
+
+def test_forged_digest_cache_is_not_trusted(tmp_path, monkeypatch):
+    path = tmp_path / 'scorer.safetensors'
+    path.write_bytes(b'weights')
+    expected = write_checksum(str(path))
+
+    # Swap the file and forge its on-disk digest cache to match the sidecar
+    path.write_bytes(b'tampered')
+    st = os.stat(path)
+    with open(str(path) + '.sha256-cache', 'w') as f:
+        json.dump({'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': expected}, f)
+    monkeypatch.setattr(result_cache, '_digests', {})
+    assert result_cache.cached_sha256(str(path)) == expected
+
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        verify_checksum(str(path))
+
+
+def test_verify_checksum_catches_a_changed_file(tmp_path):
+    path = tmp_path / 'scorer.safetensors'
+    path.write_bytes(b'weights')
+    write_checksum(str(path))
+    verify_checksum(str(path))
+
+    path.write_bytes(b'tampered weights')
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        verify_checksum(str(path))
+
+
+def test_no_sidecar_means_nothing_to_verify(tmp_path):
+    path = tmp_path / 'scorer.safetensors'
+    path.write_bytes(b'weights')
+    assert verify_checksum(str(path)) is False
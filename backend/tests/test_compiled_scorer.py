@@ -0,0 +1,139 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('cv2')
+pytest.importorskip('transformers')
+
+import inference_utils
+from compiled_scorer import BucketedCompiledScorer
+from inference_utils import CamelBeautyScorer
+from onnx_backend import SCORER_INPUTS, SCORER_OUTPUTS
+
+ATOL = 1e-4
+BUCKETS = (1, 2, 4)
+
+TINY_VIT_CONFIG = dict(
+    inference_utils.VIT_BASE_PATCH16_224_CONFIG,
+    hidden_size=32,
+    num_hidden_layers=2,
+    num_attention_heads=2,
+    intermediate_size=64
+)
+
+
+@pytest.fixture(scope='module')
+def tiny_scorer():
+    torch.manual_seed(0)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(inference_utils, 'VIT_BASE_PATCH16_224_CONFIG', TINY_VIT_CONFIG)
+        return CamelBeautyScorer(feature_dim=32, pretrained=False).eval()
+
+
+@pytest.fixture
+def compiled(tiny_scorer, monkeypatch):
+    scorer = BucketedCompiledScorer(tiny_scorer, mode='torchscript', buckets=BUCKETS)
+    run_bucket = scorer._run_bucket
+    scorer.bucket_calls = []
+
+    def recording_run_bucket(args, bucket):
+        scorer.bucket_calls.append((bucket, args))
+        return run_bucket(args, bucket)
+
+    monkeypatch.setattr(scorer, '_run_bucket', recording_run_bucket)
+    return scorer
+
+
+def random_batch(size, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    batch = {}
+    for prefix in ('body', 'face'):
+        batch[f'{prefix}_image'] = torch.randn(size, 3, 224, 224, generator=generator)
+        batch[f'{prefix}_mask'] = (torch.rand(size, 1, 224, 224, generator=generator) > 0.5).float()
+    batch['body_present'] = torch.arange(size) % 3 != 2
+    batch['face_present'] = torch.arange(size) % 2 == 0
+    return {key: batch[key] for key in SCORER_INPUTS}
+
+
+def assert_matches_eager(model, batch, actual):
+    with torch.no_grad():
+        expected = model.forward_dense(**batch)
+    for name in SCORER_OUTPUTS:
+        assert actual[name].shape == expected[name].shape, name
+        assert torch.allclose(actual[name], expected[name], atol=ATOL), (
+            name, float((actual[name] - expected[name]).abs().max())
+        )
+
+
+def test_batch_is_padded_to_the_next_bucket_and_unpadded(compiled, tiny_scorer):
+    batch = random_batch(3)
+    with torch.no_grad():
+        outputs = compiled(**batch)
+
+    ((bucket, args),) = compiled.bucket_calls
+    assert bucket == 4
+    padded = dict(zip(SCORER_INPUTS, args))
+    assert all(t.shape[0] == 4 for t in args)
+    for name in SCORER_INPUTS:
+        assert torch.equal(padded[name][:3], batch[name])
+        assert not padded[name][3].any(), name
+
+    assert compiled.fallback_error is None
+    assert set(compiled.compile_seconds) == {4}
+    assert_matches_eager(tiny_scorer, batch, outputs)
+
+
+def test_exact_bucket_is_not_padded(compiled, tiny_scorer):
+    batch = random_batch(2, seed=1)
+    with torch.no_grad():
+        outputs = compiled(**batch)
+
+    assert [bucket for bucket, _ in compiled.bucket_calls] == [2]
+    assert_matches_eager(tiny_scorer, batch, outputs)
+
+
+def test_batch_over_the_largest_bucket_is_chunked(compiled, tiny_scorer):
+    batch = random_batch(9, seed=2)
+    with torch.no_grad():
+        outputs = compiled(**batch)
+
+    # 4 + 4 + 1, each traced once
+    assert [bucket for bucket, _ in compiled.bucket_calls] == [4, 4, 1]
+    assert set(compiled._traced) == {1, 4}
+    assert_matches_eager(tiny_scorer, batch, outputs)
+
+
+def test_warm_up_compiles_every_bucket(compiled):
+    seconds = compiled.warm_up()
+    assert set(seconds) == set(BUCKETS)
+    assert set(compiled._traced) == set(BUCKETS)
+    assert compiled.fallback_error is None
+
+
+def test_compile_failure_falls_back_to_eager(tiny_scorer, monkeypatch):
+    traces = []
+
+    def failing_trace(*args, **kwargs):
+        traces.append(1)
+        raise RuntimeError('tracing not supported')
+
+    monkeypatch.setattr(torch.jit, 'trace', failing_trace)
+    scorer = BucketedCompiledScorer(tiny_scorer, mode='torchscript', buckets=BUCKETS)
+
+    batch = random_batch(3, seed=3)
+    with torch.no_grad():
+        outputs = scorer(**batch)
+        expected = tiny_scorer(**batch)
+
+    assert scorer.fallback_error == 'RuntimeError: tracing not supported'
+    for name in SCORER_OUTPUTS:
+        assert torch.equal(outputs[name], expected[name]), name
+
+    # The fallback is permanent: no more compile attempts
+    with torch.no_grad():
+        scorer(**random_batch(1, seed=4))
+    assert traces == [1]
+
+
+def test_unknown_mode_is_rejected(tiny_scorer):
+    with pytest.raises(ValueError):
+        BucketedCompiledScorer(tiny_scorer, mode='tensorrt')
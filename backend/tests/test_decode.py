@@ -0,0 +1,137 @@
+import io
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+Image = pytest.importorskip('PIL.Image')
+ImageOps = pytest.importorskip('PIL.ImageOps')
+pytest.importorskip('torch')
+pytest.importorskip('torchvision')
+
+from inference_utils import DecompressionBombError, ImageContext, decode_image_bounded
+
+
+def quadrants(width, height):
+    """RGB image with four flat coloured quadrants (survives JPEG well)."""
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:height // 2, :width // 2] = (255, 0, 0)
+    image[:height // 2, width // 2:] = (0, 255, 0)
+    image[height // 2:, :width // 2] = (0, 0, 255)
+    image[height // 2:, width // 2:] = (255, 255, 0)
+    return Image.fromarray(image)
+
+
+def encode(image, fmt='JPEG', orientation=None):
+    buf = io.BytesIO()
+    kwargs = {'quality': 95} if fmt == 'JPEG' else {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kwargs['exif'] = exif
+    image.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+# ----------------------------------------------------------------------
+# Native and reduced decoding
+# ----------------------------------------------------------------------
+
+def test_native_resolution_by_default():
+    rgb, info = decode_image_bounded(encode(quadrants(640, 480)))
+    assert rgb.shape == (480, 640, 3)
+    assert info['original_size'] == info['decoded_size'] == [640, 480]
+    assert info['scale'] == 1.0
+    assert info['decoder_reduction'] == 1
+
+
+def test_reduced_jpeg_decode():
+    data = encode(quadrants(1600, 1200))
+    rgb, info = decode_image_bounded(data, max_side=300)
+
+    # 1/4 DCT scaling (400 px), then resized down to 300
+    assert info['decoder_reduction'] == 4
+    assert rgb.shape == (225, 300, 3)
+    assert info['original_size'] == [1600, 1200]
+    assert info['decoded_size'] == [300, 225]
+    assert info['scale'] == pytest.approx(300 / 1600)
+
+    # Same picture as a full decode shrunk afterwards
+    full, _ = decode_image_bounded(data)
+    import cv2
+    expected = cv2.resize(full, (300, 225), interpolation=cv2.INTER_AREA)
+    assert np.abs(rgb.astype(int) - expected.astype(int)).mean() < 4
+
+
+def test_reduced_png_decode():
+    rgb, info = decode_image_bounded(encode(quadrants(1000, 500), fmt='PNG'), max_side=250)
+    assert rgb.shape == (125, 250, 3)
+    assert info['scale'] == pytest.approx(0.25)
+
+
+def test_cap_above_image_size_keeps_native_resolution():
+    rgb, info = decode_image_bounded(encode(quadrants(320, 240)), max_side=2048)
+    assert rgb.shape == (240, 320, 3)
+    assert info['decoder_reduction'] == 1
+    assert info['scale'] == 1.0
+
+
+# ----------------------------------------------------------------------
+# EXIF orientation
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize('orientation', range(1, 9))
+@pytest.mark.parametrize('max_side', [None, 64])
+def test_exif_orientation_matches_pillow(orientation, max_side):
+    data = encode(quadrants(160, 96), orientation=orientation)
+    rgb, info = decode_image_bounded(data, max_side=max_side)
+
+    with Image.open(io.BytesIO(data)) as image:
+        upright = ImageOps.exif_transpose(image).convert('RGB')
+    upright_w, upright_h = upright.size
+    assert info['exif_orientation'] == orientation
+    assert info['original_size'] == [upright_w, upright_h]
+
+    if max_side is not None:
+        upright = upright.resize((rgb.shape[1], rgb.shape[0]), Image.BILINEAR)
+    assert rgb.shape[:2] == (upright.size[1], upright.size[0])
+    assert np.abs(rgb.astype(int) - np.asarray(upright).astype(int)).mean() < 8
+
+
+# ----------------------------------------------------------------------
+# Limits and bad input
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize('fmt', ['JPEG', 'PNG'])
+def test_pixel_limit_rejects_before_decoding(fmt):
+    data = encode(quadrants(200, 100), fmt=fmt)
+    with pytest.raises(DecompressionBombError):
+        decode_image_bounded(data, max_pixels=200 * 100 - 1)
+    assert decode_image_bounded(data, max_pixels=200 * 100) is not None
+    with pytest.raises(DecompressionBombError):
+        ImageContext.from_source(data, max_pixels=1000)
+
+
+def test_undecodable_bytes():
+    assert decode_image_bounded(b'') is None
+    assert decode_image_bounded(b'not an image') is None
+    assert ImageContext.from_source(b'not an image') is None
+
+
+def test_single_endpoint_returns_413_over_the_pixel_limit(monkeypatch):
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_cors')
+    # Keep the import from loading models or starting threads
+    for name, value in (('CAMEL_EAGER_MODEL_LOAD', '0'), ('CAMEL_DYNAMIC_BATCHING', '0'),
+                        ('CAMEL_RESULT_CACHE', '0'), ('CAMEL_MEMORY_WATCHDOG_INTERVAL_S', '0')):
+        monkeypatch.setenv(name, value)
+    import app
+
+    monkeypatch.setattr(app, 'DECODE_MAX_PIXELS', 10_000)
+    response = app.app.test_client().post(
+        '/api/v1/detect/single',
+        data={'image': (io.BytesIO(encode(quadrants(200, 100))), 'large.jpg')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 413
+    assert response.get_json()['success'] is False
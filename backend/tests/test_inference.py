@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+torch = pytest.importorskip('torch')
+pytest.importorskip('torchvision')
+
+from benchmark import synthetic_detection, synthetic_image
+from inference_utils import BEAUTY_ATTRIBUTES, image_transform, infer_images_batched, mask_transform
+
+
+class FakeYOLO:
+    """predict() returning one centred detection per input image."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        self.calls.append(len(images))
+        return [synthetic_detection(*img.shape[:2]) for img in images]
+
+
+class StubScorer:
+    """Scorer like OnnxScorer: callable, but no nn.Module .to() / .eval()."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, **inputs):
+        batch = inputs['body_image'].shape[0]
+        self.batch_sizes.append(batch)
+        # Class 7 everywhere, 'Beautiful' category
+        logits = torch.zeros(batch, 10)
+        logits[:, 7] = 5.0
+        outputs = {name: logits.clone() for name in BEAUTY_ATTRIBUTES}
+        outputs['category_encoded'] = torch.tensor([[3.0, 0.0]]).repeat(batch, 1)
+        return outputs
+
+
+def test_batched_inference_with_a_non_module_scorer():
+    images = [synthetic_image(320, 240, seed=0), synthetic_image(200, 300, seed=1), b'not an image']
+    scorer = StubScorer()
+    results = infer_images_batched(
+        images, FakeYOLO(), FakeYOLO(), scorer,
+        image_transform, mask_transform,
+        device=torch.device('cpu'), max_batch_size=16
+    )
+
+    assert scorer.batch_sizes == [2]
+    assert results[2] == (None, None)
+    for bbox, result in results[:2]:
+        assert bbox is not None
+        assert result['scores_dict']['category_encoded']['predicted_class'] == 0
+        assert 0.0 <= result['total_score_0_100'] <= 100.0
@@ -0,0 +1,58 @@
+import pytest
+
+from instrumentation import (
+    _request_timings_hook,
+    attribute_timings,
+    begin_request_timings,
+    enable_request_timings,
+    end_request_timings,
+    remove_stage_hook,
+    stage
+)
+
+
+@pytest.fixture
+def timings():
+    enable_request_timings()
+    timings, token = begin_request_timings()
+    yield timings
+    end_request_timings(token)
+    remove_stage_hook(_request_timings_hook)
+
+
+def test_stages_are_recorded(timings):
+    with stage('decode'):
+        pass
+    with stage('scorer_forward', items=3):
+        pass
+    assert set(timings.stages_ms) == {'decode', 'scorer_forward'}
+    assert timings.scorer_batch_sizes == [3]
+
+
+def test_failed_stage_is_still_recorded(timings):
+    with pytest.raises(RuntimeError):
+        with stage('body_detection'):
+            raise RuntimeError('boom')
+    assert 'body_detection' in timings.stages_ms
+
+
+def test_untracked_requests_record_nothing():
+    enable_request_timings()
+    try:
+        timings, token = begin_request_timings()
+        end_request_timings(token)
+        with stage('decode'):
+            pass
+        assert timings.stages_ms == {}
+    finally:
+        remove_stage_hook(_request_timings_hook)
+
+
+def test_attribute_timings_covers_other_threads_work(timings):
+    other, token = begin_request_timings()
+    end_request_timings(token)
+    with attribute_timings([timings, other]):
+        with stage('scorer_forward', items=2):
+            pass
+    assert timings.scorer_batch_sizes == [2]
+    assert other.scorer_batch_sizes == [2]
@@ -0,0 +1,111 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+torch = pytest.importorskip('torch')
+pytest.importorskip('torchvision')
+
+from onnx_yolo import DetectionBoxes, DetectionMasks, DetectionResults
+from inference_utils import _select_best_body, _unletterbox_mask, enlarge_bbox, mask_transform
+
+IMGSZ = 640
+# Non-square, odd padding (x.5 split between the sides) and near-square shapes
+SHAPES = [(480, 640), (640, 480), (333, 1000), (1000, 333), (479, 641), (101, 640), (500, 700), (640, 640)]
+# Same rounding as the images themselves (see onnx_yolo.letterbox)
+MAX_MISMATCH = 1e-3
+
+
+def content_mask(h, w, seed=0):
+    """0/1 float mask at the letterboxed (unpadded) resolution of an h x w image."""
+    r = min(IMGSZ / h, IMGSZ / w)
+    new_h, new_w = int(round(h * r)), int(round(w * r))
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((new_h, new_w), dtype=np.uint8)
+    cv2.ellipse(mask, (new_w // 2, new_h // 2), (max(1, new_w // 3), max(1, new_h // 4)),
+                float(rng.uniform(0, 180)), 0, 360, 1, -1)
+    mask[:, :2] = 1          # mark the edges so an off-by-one strip shows
+    mask[-1, :] = 1
+    return mask.astype(np.float32)
+
+
+def pad(content, auto):
+    """
+    Pad like ultralytics LetterBox: to IMGSZ x IMGSZ (batched predict on
+    mixed shapes) or, with auto, only up to a multiple of 32 (single image).
+    """
+    new_h, new_w = content.shape
+    dh, dw = IMGSZ - new_h, IMGSZ - new_w
+    if auto:
+        dh, dw = dh % 32, dw % 32
+    top, bottom = int(round(dh / 2 - 0.1)), int(round(dh / 2 + 0.1))
+    left, right = int(round(dw / 2 - 0.1)), int(round(dw / 2 + 0.1))
+    return cv2.copyMakeBorder(content, top, bottom, left, right, cv2.BORDER_CONSTANT, value=0)
+
+
+def detection(h, w, mask):
+    box = np.array([[w * 0.2, h * 0.2, w * 0.8, h * 0.8]], dtype=np.float32)
+    return DetectionResults(
+        DetectionBoxes(box, np.array([0.9], np.float32), np.array([0.0], np.float32)),
+        DetectionMasks(mask[None]), orig_shape=(h, w), names={0: 'Body_seg'}
+    )
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('auto', [False, True])
+def test_unletterbox_strips_exactly_the_padding(shape, auto):
+    content = content_mask(*shape)
+    padded = pad(content, auto)
+    assert np.array_equal(_unletterbox_mask(padded, *shape), content)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_round_trip_to_original_geometry(shape):
+    h, w = shape
+    original = np.zeros((h, w), dtype=np.uint8)
+    cv2.rectangle(original, (w // 4, h // 3), (w * 3 // 4, h * 2 // 3), 1, -1)
+    r = min(IMGSZ / h, IMGSZ / w)
+    content = cv2.resize(original, (int(round(w * r)), int(round(h * r))), interpolation=cv2.INTER_NEAREST)
+
+    restored = cv2.resize(_unletterbox_mask(pad(content, auto=False), h, w), (w, h),
+                          interpolation=cv2.INTER_NEAREST)
+    assert restored.shape == original.shape
+    # Only pixels on the rectangle's border may move, by resampling
+    mismatch = restored != original
+    assert mismatch.mean() <= 2 * (h + w) * 2 / (h * w) + 1e-9
+
+
+def previous_body_mask_crop(image, results):
+    """The per-image path before batching: mask resized straight to the image."""
+    h, w = image.shape[:2]
+    x1, y1, x2, y2 = map(int, results.boxes.xyxy[0].numpy())
+    ex1, ey1, ex2, ey2 = enlarge_bbox((x1, y1, x2, y2), w, h, percentage=0.05)
+    full = cv2.resize(results.masks.data[0].numpy(), (w, h), interpolation=cv2.INTER_NEAREST)
+    return mask_transform((full[ey1:ey2, ex1:ex2] > 0.5).astype(np.uint8))[0].numpy()
+
+
+def test_mixed_shape_batch_matches_previous_per_image_path():
+    # Shapes whose single-image letterbox needs no padding, so the previous
+    # per-image path (no unletterboxing) is exact and comparable
+    shapes = [(480, 640), (640, 480), (320, 640), (640, 640), (448, 640),
+              (960, 1280), (1500, 2000), (2048, 1536)]
+    for i, (h, w) in enumerate(shapes):
+        image = np.zeros((h, w, 3), dtype=np.uint8)
+        content = content_mask(h, w, seed=i)
+        assert pad(content, auto=True).shape == content.shape
+
+        per_image = previous_body_mask_crop(image, detection(h, w, content))
+        batched = _select_best_body(image, detection(h, w, pad(content, auto=False)))['body_mask_crop']
+        assert batched.shape == per_image.shape == (224, 224)
+        assert (batched != per_image).mean() <= MAX_MISMATCH, (h, w)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_batched_and_single_image_masks_agree(shape):
+    # The same detection letterboxed for a mixed batch (square) or for a single
+    # image (stride padding) must give the same crop mask
+    h, w = shape
+    image = np.zeros((h, w, 3), dtype=np.uint8)
+    content = content_mask(h, w)
+    square = _select_best_body(image, detection(h, w, pad(content, auto=False)))['body_mask_crop']
+    rect = _select_best_body(image, detection(h, w, pad(content, auto=True)))['body_mask_crop']
+    assert np.array_equal(square, rect)
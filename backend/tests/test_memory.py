@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+import memory
+from memory import MemoryAccounting, RssWatchdog
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """Set the RSS the memory module samples: rss.value = bytes."""
+    state = SimpleNamespace(value=100 * MB)
+    monkeypatch.setattr(memory, 'process_rss_bytes', lambda: state.value)
+    return state
+
+
+def feed(watchdog, rss, values_mb):
+    results = []
+    for value in values_mb:
+        rss.value = value * MB
+        watchdog.request_finished()
+        results.append(watchdog.check())
+    return results
+
+
+# ----------------------------------------------------------------------
+# RssWatchdog
+# ----------------------------------------------------------------------
+
+def test_watchdog_flags_sustained_growth(rss):
+    watchdog = RssWatchdog(window=5, min_growth_mb=64)
+    results = feed(watchdog, rss, [100, 130, 160, 190, 220])
+    assert results == [False, False, False, False, True]
+    assert watchdog.alerts == 1
+    assert memory.metrics.MEMORY_GROWTH_SUSPECTED._values[()] == 1.0
+
+    # Still growing: no second alert for the same episode
+    assert feed(watchdog, rss, [250]) == [True]
+    assert watchdog.alerts == 1
+
+
+def test_watchdog_ignores_small_or_noisy_growth(rss):
+    watchdog = RssWatchdog(window=5, min_growth_mb=64)
+    # Steady rise below min_growth_mb
+    assert feed(watchdog, rss, [100, 110, 120, 130, 140]) == [False] * 5
+    # Large net growth, but RSS fell in half of the steps
+    watchdog = RssWatchdog(window=5, min_growth_mb=64)
+    assert feed(watchdog, rss, [100, 300, 200, 400, 300]) == [False] * 5
+
+
+def test_watchdog_clears_once_growth_stops(rss):
+    watchdog = RssWatchdog(window=3, min_growth_mb=10)
+    assert feed(watchdog, rss, [100, 150, 200])[-1] is True
+    assert feed(watchdog, rss, [200, 200]) == [False, False]
+    assert watchdog.suspected is False
+    assert memory.metrics.MEMORY_GROWTH_SUSPECTED._values[()] == 0.0
+
+
+def test_watchdog_skips_samples_without_new_requests(rss):
+    watchdog = RssWatchdog(window=3, min_growth_mb=10)
+    feed(watchdog, rss, [100])
+    rss.value = 500 * MB
+    watchdog.check()
+    watchdog.check()
+    assert [s['rss_bytes'] for s in watchdog.status()['samples']] == [100 * MB]
+
+
+# ----------------------------------------------------------------------
+# MemoryAccounting
+# ----------------------------------------------------------------------
+
+def test_stage_deltas_are_signed(rss):
+    accounting = MemoryAccounting(SimpleNamespace(type='cpu'))
+    with accounting.stage_hook('decode', 1):
+        rss.value += 8 * MB
+    with accounting.stage_hook('decode', 1):
+        rss.value -= 2 * MB
+    with pytest.raises(RuntimeError):
+        with accounting.stage_hook('decode', 1):
+            rss.value += 1 * MB
+            raise RuntimeError('boom')
+
+    stats = accounting.stats()['stages']['decode']
+    assert stats['calls'] == 3
+    assert stats['rss_delta_total_bytes'] == 7 * MB
+    assert stats['rss_delta_max_bytes'] == 8 * MB
+    assert stats['rss_delta_min_bytes'] == -2 * MB
+
+
+def test_request_records(rss):
+    accounting = MemoryAccounting(SimpleNamespace(type='cpu'))
+    begin = accounting.begin_request()
+    rss.value += 3 * MB
+    record = accounting.end_request(begin, 'detect_single')
+    assert record['rss_delta_bytes'] == 3 * MB
+    stats = accounting.stats()
+    assert stats['completed_requests'] == 1
+    assert stats['largest_request_growth'] == [record]
+    assert 'process_peak_rss_bytes' in stats
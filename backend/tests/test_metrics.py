@@ -0,0 +1,26 @@
+import pytest
+
+from metrics import Histogram, Registry
+
+
+def test_histogram_time_observes_on_success_and_failure():
+    histogram = Histogram('stage_seconds', 'help', ['stage'], registry=Registry())
+    with histogram.time(stage='ok'):
+        pass
+    with pytest.raises(RuntimeError):
+        with histogram.time(stage='failed'):
+            raise RuntimeError('boom')
+
+    assert histogram._values[('ok',)]['count'] == 1
+    assert histogram._values[('failed',)]['count'] == 1
+    assert 'stage_seconds_count{stage="failed"} 1' in histogram.samples()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('sizes', 'help', buckets=(1, 4), registry=Registry())
+    for value in (1, 2, 3, 8):
+        histogram.observe(value)
+    samples = histogram.samples()
+    assert 'sizes_bucket{le="1.0"} 1' in samples
+    assert 'sizes_bucket{le="4.0"} 3' in samples
+    assert 'sizes_bucket{le="+Inf"} 4' in samples
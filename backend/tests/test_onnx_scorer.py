@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+pytest.importorskip('onnx')
+pytest.importorskip('onnxruntime')
+
+import inference_utils
+from inference_utils import CamelBeautyScorer
+from onnx_backend import SCORER_INPUTS, SCORER_OUTPUTS, OnnxScorer, export_scorer_onnx, onnx_model_path
+
+ATOL = 1e-4
+
+TINY_VIT_CONFIG = dict(
+    inference_utils.VIT_BASE_PATCH16_224_CONFIG,
+    hidden_size=32,
+    num_hidden_layers=2,
+    num_attention_heads=2,
+    intermediate_size=64
+)
+
+
+@pytest.fixture(scope='module')
+def exported(tmp_path_factory):
+    torch.manual_seed(0)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(inference_utils, 'VIT_BASE_PATCH16_224_CONFIG', TINY_VIT_CONFIG)
+        model = CamelBeautyScorer(feature_dim=32, pretrained=False).eval()
+    path = export_scorer_onnx(model, str(tmp_path_factory.mktemp('onnx') / 'scorer.onnx'))
+    return model, OnnxScorer(path)
+
+
+def random_batch(size, seed):
+    generator = torch.Generator().manual_seed(seed)
+    batch = {}
+    for prefix in ('body', 'face'):
+        batch[f'{prefix}_image'] = torch.randn(size, 3, 224, 224, generator=generator)
+        batch[f'{prefix}_mask'] = (torch.rand(size, 1, 224, 224, generator=generator) > 0.5).float()
+    # Every presence combination, at a batch size the export was not traced with
+    batch['body_present'] = torch.tensor([True, True, False, True, False])[:size]
+    batch['face_present'] = torch.tensor([True, False, True, False, False])[:size]
+    return {key: batch[key] for key in SCORER_INPUTS}
+
+
+def assert_close(expected, actual):
+    for name in SCORER_OUTPUTS:
+        assert actual[name].shape == expected[name].shape, name
+        assert torch.allclose(actual[name], expected[name], atol=ATOL), (
+            name, float((actual[name] - expected[name]).abs().max())
+        )
+
+
+@pytest.mark.parametrize('size', [1, 5])
+def test_onnx_matches_forward_dense(exported, size):
+    model, onnx_scorer = exported
+    batch = random_batch(size, seed=size)
+    with torch.no_grad():
+        expected = model.forward_dense(**batch)
+    assert_close(expected, onnx_scorer(**batch))
+
+
+def test_onnx_matches_forward(exported):
+    model, onnx_scorer = exported
+    batch = random_batch(4, seed=1)
+    with torch.no_grad():
+        expected = model(**batch)
+    assert_close(expected, onnx_scorer(**batch))
+
+
+def test_onnx_model_path_follows_checkpoint_contents(tmp_path):
+    checkpoint = tmp_path / 'scorer.pth'
+    checkpoint.write_bytes(b'old weights')
+    old = onnx_model_path(str(checkpoint))
+    assert old.startswith(str(tmp_path / 'scorer.')) and old.endswith('.onnx')
+    assert onnx_model_path(str(checkpoint)) == old
+
+    checkpoint.write_bytes(b'new weights!')
+    assert onnx_model_path(str(checkpoint)) != old
+
+
+def test_unwritable_export_serves_torch_scorer(exported, tmp_path):
+    from model_runtime import ModelRuntime
+
+    model, _ = exported
+    blocker = tmp_path / 'blocker'
+    blocker.write_bytes(b'')
+    onnx_path = str(blocker / 'scorer.onnx')
+
+    runtime = ModelRuntime(device=torch.device('cpu'), warmup=False, scorer_backend='onnxruntime')
+    assert runtime._load_onnx_scorer(lambda: model, onnx_path) is model
+    assert runtime._effective_scorer_backend == 'torch'
+    assert not os.path.exists(onnx_path + '.tmp')
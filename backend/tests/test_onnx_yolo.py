@@ -0,0 +1,245 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+torch = pytest.importorskip('torch')
+
+from onnx_yolo import OnnxYOLO, letterbox, nms, process_masks, scale_boxes, xywh2xyxy, yolo_onnx_path
+
+
+def random_boxes(rng, count, extent=200.0):
+    xy = rng.uniform(0, extent, size=(count, 2))
+    wh = rng.uniform(1, extent / 2, size=(count, 2))
+    return np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+
+
+# ----------------------------------------------------------------------
+# NMS
+# ----------------------------------------------------------------------
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    boxes = np.array([
+        [0, 0, 10, 10],
+        [1, 1, 11, 11],      # IoU 0.68 with the first
+        [20, 20, 30, 30],
+        [0, 0, 10, 10.5]
+    ], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+    assert nms(boxes, scores, 0.7).tolist() == [1, 0, 2]
+    assert nms(boxes, scores, 1.0).tolist() == [1, 0, 3, 2]
+
+
+def test_nms_empty():
+    kept = nms(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), 0.5)
+    assert kept.dtype == np.int64 and kept.size == 0
+
+
+def test_nms_matches_torchvision():
+    torchvision = pytest.importorskip('torchvision')
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        boxes = random_boxes(rng, 64)
+        scores = rng.uniform(size=64).astype(np.float32)
+        expected = torchvision.ops.nms(torch.from_numpy(boxes), torch.from_numpy(scores), 0.5)
+        assert nms(boxes, scores, 0.5).tolist() == expected.tolist()
+
+
+def test_class_offset_keeps_overlapping_boxes_of_other_classes():
+    boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 10]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+    cls = np.array([0, 1])
+    assert nms(boxes, scores, 0.5).tolist() == [0]
+    assert nms(boxes + cls[:, None] * 7680.0, scores, 0.5).tolist() == [0, 1]
+
+
+def test_xywh2xyxy():
+    xywh = np.array([[10, 20, 4, 6]], dtype=np.float32)
+    assert xywh2xyxy(xywh).tolist() == [[8, 17, 12, 23]]
+
+
+# ----------------------------------------------------------------------
+# Letterbox and box mapping
+# ----------------------------------------------------------------------
+
+@pytest.mark.parametrize('shape', [(480, 640), (640, 480), (100, 100), (333, 1000), (1000, 333), (640, 640)])
+def test_letterbox_pads_to_square_with_centred_image(shape):
+    image = np.full(shape + (3,), 7, dtype=np.uint8)
+    boxed = letterbox(image, 640)
+    assert boxed.shape == (640, 640, 3)
+
+    content = np.argwhere((boxed != 114).any(axis=2))
+    (top, left), (bottom, right) = content.min(axis=0), content.max(axis=0) + 1
+    gain = min(640 / shape[0], 640 / shape[1])
+    assert abs((bottom - top) - shape[0] * gain) <= 1
+    assert abs((right - left) - shape[1] * gain) <= 1
+    # Centred: the two paddings differ by at most one pixel
+    assert abs(top - (640 - bottom)) <= 1
+    assert abs(left - (640 - right)) <= 1
+    assert (boxed[:top] == 114).all() and (boxed[:, :left] == 114).all()
+
+
+@pytest.mark.parametrize('shape', [(480, 640), (640, 480), (333, 1000), (1234, 777)])
+def test_scale_boxes_inverts_letterbox(shape):
+    rng = np.random.default_rng(1)
+    h, w = shape
+    orig = random_boxes(rng, 32, extent=min(h, w) / 2)
+
+    gain = min(640 / h, 640 / w)
+    pad_x = round((640 - w * gain) / 2 - 0.1)
+    pad_y = round((640 - h * gain) / 2 - 0.1)
+    letterboxed = orig * gain + np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)
+
+    np.testing.assert_allclose(scale_boxes(letterboxed, (640, 640), shape), orig, atol=1e-2)
+
+
+def test_scale_boxes_finds_the_letterboxed_content():
+    # A box around the visible image content maps back to the full frame
+    shape = (300, 800)
+    boxed = letterbox(np.zeros(shape + (3,), dtype=np.uint8), 640)
+    content = np.argwhere((boxed != 114).any(axis=2))
+    (top, left), (bottom, right) = content.min(axis=0), content.max(axis=0) + 1
+    box = np.array([[left, top, right, bottom]], dtype=np.float32)
+
+    mapped = scale_boxes(box, (640, 640), shape)[0]
+    np.testing.assert_allclose(mapped, [0, 0, shape[1], shape[0]], atol=2.0)
+
+
+def test_scale_boxes_clips_to_the_image():
+    boxes = np.array([[-50, -50, 700, 700]], dtype=np.float32)
+    assert scale_boxes(boxes, (640, 640), (480, 640)).tolist() == [[0, 0, 640, 480]]
+
+
+# ----------------------------------------------------------------------
+# Mask decoding and predict() on a fake onnxruntime session
+# ----------------------------------------------------------------------
+#
+# 64x64 input, 16x16 protos (stride 4). Box edges on multiples of 4 land on
+# proto pixel edges, and a saturated mask upsampled bilinearly crosses 0.5
+# exactly there, so the expected masks are the boxes themselves.
+
+IMGSZ = 64
+PROTO = np.full((1, 16, 16), 10.0, dtype=np.float32)     # sigmoid(10 * coeff)
+
+
+def box_mask(x1, y1, x2, y2):
+    mask = np.zeros((IMGSZ, IMGSZ), dtype=np.float32)
+    mask[y1:y2, x1:x2] = 1.0
+    return mask
+
+
+def test_process_masks_crops_to_boxes():
+    boxes = np.array([[8, 24, 40, 40], [0, 0, 64, 64], [4, 4, 12, 8]], dtype=np.float32)
+    coeffs = np.array([[1.0], [1.0], [-1.0]], dtype=np.float32)
+    masks = process_masks(PROTO, coeffs, boxes, (IMGSZ, IMGSZ))
+
+    assert masks.shape == (3, IMGSZ, IMGSZ) and masks.dtype == np.float32
+    np.testing.assert_array_equal(masks[0], box_mask(8, 24, 40, 40))
+    np.testing.assert_array_equal(masks[1], np.ones((IMGSZ, IMGSZ), dtype=np.float32))
+    # Negative coefficient: sigmoid(-10) is below 0.5 inside the box too
+    np.testing.assert_array_equal(masks[2], np.zeros((IMGSZ, IMGSZ), dtype=np.float32))
+
+
+class FakeSession:
+    """Returns fixed (preds, protos) and records the batch it was fed."""
+
+    def __init__(self, preds, protos):
+        self.outputs = [preds, protos]
+        self.feeds = []
+
+    def run(self, output_names, feeds):
+        assert output_names is None
+        self.feeds.append(feeds)
+        return self.outputs
+
+
+def fake_yolo(preds, protos):
+    model = OnnxYOLO.__new__(OnnxYOLO)
+    model.session = FakeSession(preds, protos)
+    model.input_name = 'images'
+    model.names = {0: 'camel', 1: 'other'}
+    model.imgsz = IMGSZ
+    return model
+
+
+def anchor(cx, cy, w, h, class_scores, coeff):
+    return [cx, cy, w, h, *class_scores, coeff]
+
+
+def fake_outputs():
+    # Rows are anchors (4 box + 2 classes + 1 coefficient), transposed to the
+    # (batch, 7, anchors) layout of the export
+    first = [
+        anchor(24, 32, 32, 16, (0.9, 0.1), 1.0),    # kept
+        anchor(25, 32, 32, 16, (0.8, 0.1), 1.0),    # IoU 0.94 with the first: suppressed
+        anchor(24, 32, 32, 16, (0.2, 0.7), 1.0),    # same box, other class: kept
+        anchor(48, 48, 8, 8, (0.1, 0.2), 1.0),      # below conf
+    ]
+    second = [anchor(32, 32, 16, 16, (0.1, 0.2), 1.0)] * 4
+    preds = np.array([first, second], dtype=np.float32).transpose(0, 2, 1)
+    protos = np.stack([PROTO, PROTO])
+    return preds, protos
+
+
+def test_predict_decodes_boxes_classes_and_masks():
+    model = fake_yolo(*fake_outputs())
+    # 32x64 BGR image: letterboxed with 16 rows of padding above and below
+    wide = np.zeros((32, 64, 3), dtype=np.uint8)
+    wide[..., 2] = 255
+    square = np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8)
+
+    results = model.predict([wide, square], conf=0.25, iou=0.7)
+
+    (feeds,) = model.session.feeds
+    batch = feeds['images']
+    assert batch.shape == (2, 3, IMGSZ, IMGSZ) and batch.dtype == np.float32
+    # RGB channel order, 0-1 range, grey letterbox padding
+    np.testing.assert_allclose(batch[0, 0, 16:48], 1.0)
+    np.testing.assert_allclose(batch[0, 2, 16:48], 0.0)
+    np.testing.assert_allclose(batch[0, :, :16], 114 / 255, rtol=1e-6)
+    np.testing.assert_allclose(batch[0, :, 48:], 114 / 255, rtol=1e-6)
+
+    first, second = results
+    assert first.orig_shape == (32, 64)
+    assert first.names == {0: 'camel', 1: 'other'}
+    assert first.boxes.cls.tolist() == [0.0, 1.0]
+    np.testing.assert_allclose(first.boxes.conf.numpy(), [0.9, 0.7], rtol=1e-6)
+    # Input box (8, 24, 40, 40) minus the 16 rows of top padding
+    np.testing.assert_allclose(first.boxes.xyxy.numpy(), [[8, 8, 40, 24]] * 2)
+
+    # Masks stay in letterboxed input coordinates, like ultralytics' masks.data
+    assert first.masks.data.shape == (2, IMGSZ, IMGSZ)
+    for mask in first.masks.data.numpy():
+        np.testing.assert_array_equal(mask, box_mask(8, 24, 40, 40))
+
+    assert second.orig_shape == (IMGSZ, IMGSZ)
+    assert len(second.boxes) == 0 and second.boxes.xyxy.shape == (0, 4)
+    assert second.masks is None
+
+
+def test_predict_single_image_and_max_det():
+    preds, protos = fake_outputs()
+    model = fake_yolo(preds[:1], protos[:1])
+    wide = np.zeros((32, 64, 3), dtype=np.uint8)
+
+    (result,) = model.predict(wide, conf=0.25, iou=0.7, max_det=1)
+    assert result.boxes.cls.tolist() == [0.0]
+    np.testing.assert_allclose(result.boxes.xyxy.numpy(), [[8, 8, 40, 24]])
+    assert result.masks.data.shape == (1, IMGSZ, IMGSZ)
+
+    assert model.predict([], conf=0.25) == []
+
+
+# ----------------------------------------------------------------------
+# Export path
+# ----------------------------------------------------------------------
+
+def test_yolo_onnx_path_follows_pt_contents(tmp_path):
+    pt = tmp_path / 'best.pt'
+    pt.write_bytes(b'old detector')
+    old = yolo_onnx_path(str(pt))
+    assert old.startswith(str(tmp_path / 'best.')) and old.endswith('.onnx')
+    assert yolo_onnx_path(str(pt)) == old
+
+    pt.write_bytes(b'new detector!')
+    assert yolo_onnx_path(str(pt)) != old
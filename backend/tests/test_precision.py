@@ -0,0 +1,188 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('cv2')
+pytest.importorskip('PIL')
+
+import model_runtime
+from inference_utils import BEAUTY_ATTRIBUTES
+from model_runtime import ModelRuntime
+from precision import AutocastScorer, check_precision_drift
+
+
+def result(total, category):
+    return {
+        'total_score_0_100': total,
+        'scores_dict': {'category_encoded': {'predicted_class': category}}
+    }
+
+
+# ----------------------------------------------------------------------
+# check_precision_drift
+# ----------------------------------------------------------------------
+
+def test_drift_within_thresholds_is_accepted():
+    reference = [result(80.0, 0), result(60.0, 1), None]
+    candidate = [result(81.5, 0), result(59.0, 1), None]
+    report = check_precision_drift(reference, candidate, max_total_drift=2.0)
+
+    assert report['accepted']
+    assert report['num_compared'] == 2
+    assert report['max_total_drift'] == pytest.approx(1.5)
+    assert report['mean_total_drift'] == pytest.approx(1.25)
+    assert report['category_flip_rate'] == 0.0
+
+
+def test_drift_above_max_total_drift_is_refused():
+    reference = [result(80.0, 0), result(60.0, 1)]
+    candidate = [result(80.0, 0), result(62.5, 1)]
+    report = check_precision_drift(reference, candidate, max_total_drift=2.0)
+
+    assert not report['accepted']
+    assert report['max_total_drift'] == pytest.approx(2.5)
+
+
+def test_category_flips_and_detection_mismatches():
+    reference = [result(80.0, 0), result(60.0, 1), result(70.0, 0), None]
+    candidate = [result(80.0, 1), result(60.0, 1), None, result(50.0, 0)]
+
+    report = check_precision_drift(reference, candidate, max_total_drift=2.0)
+    assert report['detection_mismatches'] == 2
+    assert report['num_compared'] == 4
+    assert report['category_flip_rate'] == pytest.approx(0.75)
+    assert not report['accepted']
+
+    assert check_precision_drift(reference, candidate, 2.0, max_category_flip_rate=0.75)['accepted']
+
+
+def test_nothing_to_compare_is_refused():
+    assert not check_precision_drift([None, None], [None, None], 2.0)['accepted']
+    with pytest.raises(ValueError):
+        check_precision_drift([None], [], 2.0)
+
+
+# ----------------------------------------------------------------------
+# AutocastScorer
+# ----------------------------------------------------------------------
+
+class LinearScorer(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.head = torch.nn.Linear(4, 10)
+        self.seen_dtypes = []
+
+    def forward(self, body_image, **_):
+        logits = self.head(body_image)
+        self.seen_dtypes.append(logits.dtype)
+        return {'overall': logits}
+
+
+def test_autocast_scorer_runs_bf16_and_returns_fp32():
+    torch.manual_seed(0)
+    scorer = LinearScorer()
+    wrapped = AutocastScorer(scorer, torch.bfloat16)
+    inputs = torch.randn(3, 4)
+
+    with torch.no_grad():
+        outputs = wrapped(body_image=inputs)
+        expected = scorer(body_image=inputs)['overall']
+
+    assert scorer.seen_dtypes == [torch.bfloat16, torch.float32]
+    assert outputs['overall'].dtype == torch.float32
+    assert torch.allclose(outputs['overall'], expected, atol=0.05)
+
+
+# ----------------------------------------------------------------------
+# ModelRuntime guardrail: refused modes fall back to fp32
+# ----------------------------------------------------------------------
+
+class StubScorer(torch.nn.Module):
+    """fp32 stand-in: class 7 for every attribute, category 0."""
+
+    def __init__(self):
+        super().__init__()
+        self.anchor = torch.nn.Parameter(torch.zeros(()))
+
+    def forward(self, body_image, **_):
+        batch = body_image.shape[0]
+        logits = torch.zeros(batch, 10)
+        logits[:, 7] = 5.0
+        outputs = {name: logits.clone() for name in BEAUTY_ATTRIBUTES}
+        outputs['category_encoded'] = torch.tensor([[3.0, 0.0]]).repeat(batch, 1)
+        return outputs
+
+
+class PerturbedScorer(torch.nn.Module):
+    """Reduced-precision stand-in: the fp32 outputs plus a fixed perturbation."""
+
+    def __init__(self, model, attribute_shift=0.0, flip_category=False):
+        super().__init__()
+        self.model = model
+        self.attribute_shift = attribute_shift
+        self.flip_category = flip_category
+
+    def forward(self, **inputs):
+        outputs = self.model(**inputs)
+        for name in BEAUTY_ATTRIBUTES:
+            outputs[name][:, 2] += self.attribute_shift
+        if self.flip_category:
+            outputs['category_encoded'] = outputs['category_encoded'].flip(-1)
+        return outputs
+
+
+@pytest.fixture
+def make_runtime(monkeypatch):
+    loaded = []
+
+    def load_stub(*args, **kwargs):
+        loaded.append(StubScorer())
+        return loaded[-1]
+
+    monkeypatch.setattr(model_runtime, 'load_camel_beauty_scorer', load_stub)
+
+    def build(mode, **perturbation):
+        if mode == 'bf16':
+            monkeypatch.setattr(model_runtime, 'AutocastScorer',
+                                lambda model, dtype: PerturbedScorer(model, **perturbation))
+        else:
+            monkeypatch.setattr(model_runtime, 'load_quantized_scorer',
+                                lambda path, load_fp32, cache_dir: PerturbedScorer(load_fp32(), **perturbation))
+        runtime = ModelRuntime(device=torch.device('cpu'), warmup=False, scorer_precision=mode,
+                               max_total_drift=2.0, max_category_flip_rate=0.0)
+        return runtime, loaded
+    return build
+
+
+@pytest.mark.parametrize('mode', ['bf16', 'int8'])
+def test_mode_within_thresholds_is_served(make_runtime, mode):
+    runtime, _ = make_runtime(mode, attribute_shift=0.5)
+
+    assert isinstance(runtime.beauty_scorer_model, PerturbedScorer)
+    status = runtime.status()
+    assert status['effective_scorer_precision'] == mode
+    report = status['precision_checks']['scorer']
+    assert report['accepted'] and report['reference'] == 'synthetic'
+    assert 0.0 < report['max_total_drift'] <= 2.0
+
+
+@pytest.mark.parametrize('mode', ['bf16', 'int8'])
+@pytest.mark.parametrize('perturbation', [
+    {'attribute_shift': 20.0},      # every attribute jumps to class 2
+    {'flip_category': True}
+])
+def test_mode_over_thresholds_falls_back_to_fp32(make_runtime, mode, perturbation):
+    runtime, loaded = make_runtime(mode, **perturbation)
+
+    scorer = runtime.beauty_scorer_model
+    assert isinstance(scorer, StubScorer)
+    # int8 quantizes the fp32 model in place, so a fresh fp32 model is loaded
+    assert scorer is loaded[-1] and len(loaded) == (1 if mode == 'bf16' else 2)
+
+    status = runtime.status()
+    assert status['effective_scorer_precision'] == 'fp32'
+    report = status['precision_checks']['scorer']
+    assert not report['accepted'] and report['mode'] == mode
+    if 'flip_category' in perturbation:
+        assert report['category_flip_rate'] == 1.0 and report['max_total_drift'] == 0.0
+    else:
+        assert report['max_total_drift'] > 2.0
@@ -0,0 +1,100 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+torch = pytest.importorskip('torch')
+transforms = pytest.importorskip('torchvision.transforms')
+Image = pytest.importorskip('PIL.Image')
+
+from benchmark import synthetic_detection, synthetic_image
+from inference_utils import IMAGE_SIZE, _select_best_body, image_transform, mask_transform
+from preprocessing import IMAGENET_MEAN, IMAGENET_STD
+
+# Documented in preprocessing.py: one uint8 level after normalisation, and
+# the resulting CamelBeautyScorer logit drift
+MAX_IMAGE_ABS_DIFF = 1.0 / (255.0 * min(IMAGENET_STD)) + 1e-5
+MAX_LOGIT_ABS_DIFF = 1e-2
+
+# The torchvision PIL pipelines the tensor-native transforms replaced
+pil_image_transform = transforms.Compose([
+    transforms.Resize(IMAGE_SIZE),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=list(IMAGENET_MEAN), std=list(IMAGENET_STD))
+])
+pil_mask_transform = transforms.Compose([
+    transforms.Resize(IMAGE_SIZE, interpolation=transforms.InterpolationMode.NEAREST),
+    transforms.ToTensor()
+])
+
+
+def reference_image(crop):
+    return pil_image_transform(Image.fromarray(np.ascontiguousarray(crop)))
+
+
+def reference_mask(mask):
+    return (pil_mask_transform(Image.fromarray(mask * 255)) > 0.5).float()
+
+
+def pipeline_crops():
+    """Body crops and crop-size masks cut the way the pipeline cuts them."""
+    rng = np.random.default_rng(0)
+    crops = []
+    for seed in range(12):
+        w, h = (int(v) for v in rng.integers(64, 1400, size=2))
+        image = synthetic_image(w, h, seed=seed)
+        body = _select_best_body(image, synthetic_detection(h, w, fraction=rng.uniform(0.2, 0.9)))
+        crop = body['body_crop']
+        ch, cw = crop.shape[:2]
+        mask = np.zeros((ch, cw), dtype=np.uint8)
+        cv2.ellipse(mask, (cw // 2, ch // 2), (max(1, cw // 3), max(1, ch // 3)), 0, 0, 360, 1, -1)
+        crops.append((crop, mask, body['body_mask_crop']))
+    return crops
+
+
+def random_crops():
+    rng = np.random.default_rng(1)
+    for _ in range(12):
+        h, w = (int(v) for v in rng.integers(1, 1200, size=2))
+        yield rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8), (rng.random((h, w)) > 0.5).astype(np.uint8)
+
+
+def test_images_within_one_level_of_pil():
+    crops = [c for c, _, _ in pipeline_crops()] + [c for c, _ in random_crops()]
+    for crop in crops:
+        diff = float((image_transform(crop) - reference_image(crop)).abs().max())
+        assert diff <= MAX_IMAGE_ABS_DIFF, (crop.shape, diff)
+
+
+def test_masks_identical_to_pil():
+    masks = [m for _, m, _ in pipeline_crops()] + [m for _, m in random_crops()]
+    masks += [m224 for _, _, m224 in pipeline_crops()]
+    for mask in masks:
+        assert torch.equal(mask_transform(mask), reference_mask(mask)), mask.shape
+
+
+def test_scorer_outputs_within_tolerance(monkeypatch):
+    pytest.importorskip('transformers')
+    import inference_utils
+    from inference_utils import CamelBeautyScorer
+
+    monkeypatch.setattr(inference_utils, 'VIT_BASE_PATCH16_224_CONFIG', dict(
+        inference_utils.VIT_BASE_PATCH16_224_CONFIG,
+        hidden_size=64, num_hidden_layers=2, num_attention_heads=2, intermediate_size=128
+    ))
+    torch.manual_seed(0)
+    model = CamelBeautyScorer(feature_dim=64, pretrained=False).eval()
+
+    crops = pipeline_crops()
+    present = torch.ones(len(crops), dtype=torch.bool)
+    outputs = []
+    for transform_image, transform_mask in ((image_transform, mask_transform),
+                                            (reference_image, reference_mask)):
+        images = torch.stack([transform_image(c) for c, _, _ in crops])
+        masks = torch.stack([transform_mask(m) for _, m, _ in crops])
+        with torch.no_grad():
+            outputs.append(model(body_image=images, face_image=images, body_mask=masks,
+                                 face_mask=masks, body_present=present, face_present=present))
+
+    for name, logits in outputs[0].items():
+        diff = float((logits - outputs[1][name]).abs().max())
+        assert diff <= MAX_LOGIT_ABS_DIFF, (name, diff)
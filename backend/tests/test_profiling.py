@@ -0,0 +1,194 @@
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+import instrumentation
+import profiling
+from profiling import ProfilerCapture
+
+
+class FakeProfile:
+    """Stands in for torch.profiler.profile: no tracing, a small fixed trace."""
+
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.started = self.stopped = False
+        FakeProfile.instances.append(self)
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.stopped = True
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': [{'name': 'camel::scorer_forward'}]}, f)
+
+
+@pytest.fixture
+def capture(tmp_path, monkeypatch):
+    FakeProfile.instances = []
+    monkeypatch.setattr(torch.profiler, 'profile', FakeProfile)
+    capture = ProfilerCapture(str(tmp_path / 'profiles'))
+    yield capture
+    capture.disarm()
+
+
+def profile_request(capture, label='detect_single'):
+    """One request: begin, and finish if it was selected. Returns the trace path."""
+    profiler = capture.begin()
+    if profiler is None:
+        return None
+    return capture.finish(profiler, label)
+
+
+def hooked(capture):
+    return capture._stage_span in instrumentation._hooks
+
+
+# ----------------------------------------------------------------------
+# Arming and selection
+# ----------------------------------------------------------------------
+
+def test_disarmed_capture_selects_nothing(capture):
+    assert capture.begin() is None
+    assert FakeProfile.instances == []
+    assert not hooked(capture)
+
+
+def test_next_n_requests_are_profiled(capture):
+    status = capture.arm(requests=2)
+    assert status['armed'] and status['remaining_requests'] == 2
+    assert hooked(capture)
+
+    paths = [profile_request(capture) for _ in range(3)]
+    assert paths[0] and paths[1] and paths[2] is None
+    assert len(FakeProfile.instances) == 2
+    assert all(p.started and p.stopped for p in FakeProfile.instances)
+
+    status = capture.status()
+    assert not status['armed'] and status['captured'] == 2
+    assert len(status['traces']) == 2
+    # The stage hook goes once the last selected request is written
+    assert not hooked(capture)
+
+
+def test_sample_rate(capture, monkeypatch):
+    draws = iter([0.3, 0.7, 0.49])
+    monkeypatch.setattr(profiling.random, 'random', lambda: next(draws))
+    capture.arm(sample_rate=0.5)
+
+    assert [profile_request(capture) is not None for _ in range(3)] == [True, False, True]
+    # Sampling keeps the capture armed until disarmed
+    assert capture.status()['armed'] and hooked(capture)
+    capture.disarm()
+    assert not capture.status()['armed'] and not hooked(capture)
+
+
+def test_requests_are_counted_before_sampling(capture, monkeypatch):
+    monkeypatch.setattr(profiling.random, 'random', lambda: 0.99)
+    capture.arm(requests=1, sample_rate=0.5)
+
+    assert profile_request(capture) is not None
+    assert profile_request(capture) is None
+    assert capture.status()['remaining_requests'] == 0 and capture.armed
+
+
+def test_duration_expiry_disarms(capture):
+    capture.arm(sample_rate=1.0, duration_s=0.05)
+    assert 0.0 < capture.status()['seconds_left'] <= 0.05
+    assert profile_request(capture) is not None
+
+    time.sleep(0.06)
+    assert capture.begin() is None
+    status = capture.status()
+    assert not status['armed'] and status['seconds_left'] is None
+    assert not hooked(capture)
+
+
+def test_only_one_request_is_profiled_at_a_time(capture):
+    capture.arm(requests=3)
+    first = capture.begin()
+    assert first is not None and capture.status()['profiling']
+
+    # A concurrent request is skipped without using up a slot
+    assert capture.begin() is None
+    assert capture.status()['remaining_requests'] == 2
+
+    capture.finish(first, 'detect_batch')
+    assert not capture.status()['profiling']
+    assert profile_request(capture) is not None
+
+
+def test_invalid_arming_is_rejected(capture):
+    for kwargs in ({}, {'requests': -1}, {'sample_rate': 1.5},
+                   {'requests': 1, 'duration_s': 0}):
+        with pytest.raises(ValueError):
+            capture.arm(**kwargs)
+    assert not capture.armed and not hooked(capture)
+
+
+def test_profiler_start_failure_is_recorded(capture, monkeypatch):
+    def broken_profile(**kwargs):
+        raise RuntimeError('profiler already enabled')
+
+    monkeypatch.setattr(torch.profiler, 'profile', broken_profile)
+    capture.arm(requests=1)
+
+    assert capture.begin() is None
+    status = capture.status()
+    assert status['last_error'] == 'RuntimeError: profiler already enabled'
+    assert not status['profiling'] and status['captured'] == 0
+    assert not hooked(capture)
+
+
+# ----------------------------------------------------------------------
+# Trace files
+# ----------------------------------------------------------------------
+
+def test_trace_is_written_gzipped(capture):
+    capture.arm(requests=1)
+    path = profile_request(capture, 'detect_batch')
+
+    assert path.endswith('-detect_batch.json.gz')
+    with gzip.open(path) as f:
+        assert json.load(f) == {'traceEvents': [{'name': 'camel::scorer_forward'}]}
+    # Only the trace itself is left behind
+    assert os.listdir(capture.trace_dir) == [os.path.basename(path)]
+
+
+def write_trace(directory, name, size, mtime):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_oldest_traces_are_deleted_beyond_max_bytes(tmp_path):
+    capture = ProfilerCapture(str(tmp_path), max_bytes=250)
+    write_trace(str(tmp_path), 'a.json.gz', 100, 1000)
+    write_trace(str(tmp_path), 'b.json.gz', 100, 2000)
+    write_trace(str(tmp_path), 'c.json.gz', 100, 3000)
+    write_trace(str(tmp_path), 'notes.txt', 1000, 500)
+
+    capture._rotate()
+    assert sorted(os.listdir(tmp_path)) == ['b.json.gz', 'c.json.gz', 'notes.txt']
+    assert [t['name'] for t in capture.traces()] == ['c.json.gz', 'b.json.gz']
+    assert capture.status()['total_bytes'] == 200
+
+
+def test_newest_trace_is_kept_even_over_max_bytes(tmp_path):
+    capture = ProfilerCapture(str(tmp_path), max_bytes=50)
+    write_trace(str(tmp_path), 'old.json.gz', 10, 1000)
+    write_trace(str(tmp_path), 'new.json.gz', 100, 2000)
+
+    capture._rotate()
+    assert os.listdir(tmp_path) == ['new.json.gz']
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+import inference_utils
+from inference_utils import CamelBeautyScorer
+from preprocessing import BatchBuffers
+from quantization import load_quantized_scorer, quantized_cache_path
+
+TINY_VIT_CONFIG = dict(
+    inference_utils.VIT_BASE_PATCH16_224_CONFIG,
+    hidden_size=32,
+    num_hidden_layers=2,
+    num_attention_heads=2,
+    intermediate_size=64
+)
+
+
+@pytest.fixture
+def tiny_scorer_factory(monkeypatch):
+    monkeypatch.setattr(inference_utils, 'VIT_BASE_PATCH16_224_CONFIG', TINY_VIT_CONFIG)
+
+    def build(seed):
+        torch.manual_seed(seed)
+        return CamelBeautyScorer(feature_dim=32, pretrained=False).eval()
+    return build
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    path = tmp_path / 'models' / 'scorer.pth'
+    path.parent.mkdir()
+    path.write_bytes(b'checkpoint bytes')
+    return str(path)
+
+
+def scorer_batch(size=3):
+    generator = torch.Generator().manual_seed(0)
+    batch = {}
+    for prefix in ('body', 'face'):
+        batch[f'{prefix}_image'] = torch.randn(size, 3, 224, 224, generator=generator)
+        batch[f'{prefix}_mask'] = torch.ones(size, 1, 224, 224)
+    batch['body_present'] = torch.tensor([True, True, False])[:size]
+    batch['face_present'] = torch.tensor([True, False, True])[:size]
+    return {key: batch[key] for key in BatchBuffers.KEYS}
+
+
+def outputs_of(model):
+    with torch.no_grad():
+        return model(**scorer_batch())
+
+
+def assert_same_outputs(expected, actual):
+    assert expected.keys() == actual.keys()
+    for name in expected:
+        assert torch.equal(expected[name], actual[name]), name
+
+
+def test_quantizes_linear_layers(tiny_scorer_factory, checkpoint):
+    model = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(0))
+
+    linear_types = {type(m) for m in model.modules() if isinstance(m, torch.nn.Linear)}
+    assert torch.nn.Linear not in linear_types
+    assert any(
+        type(m).__module__.startswith('torch.ao.nn.quantized') for m in model.modules()
+    )
+
+
+def test_cache_round_trip(tiny_scorer_factory, checkpoint):
+    first = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(0))
+    cache_path = quantized_cache_path(checkpoint)
+    assert os.path.exists(cache_path)
+    assert not os.path.exists(cache_path + '.tmp')
+    # A state_dict, not a pickled module
+    assert isinstance(torch.load(cache_path, map_location='cpu', weights_only=True), dict)
+
+    # Different fp32 weights: identical outputs prove the INT8 weights came from the cache
+    second = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(1))
+    assert_same_outputs(outputs_of(first), outputs_of(second))
+
+
+def test_unreadable_cache_is_rebuilt(tiny_scorer_factory, checkpoint):
+    cache_path = quantized_cache_path(checkpoint)
+    with open(cache_path, 'wb') as f:
+        f.write(b'not a state_dict')
+
+    model = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(0))
+    expected = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(1))
+    assert_same_outputs(outputs_of(model), outputs_of(expected))
+
+
+def test_unwritable_cache_dir_serves_in_memory_model(tiny_scorer_factory, checkpoint, tmp_path):
+    # A cache "directory" below a regular file cannot be created, even as root
+    blocker = tmp_path / 'blocker'
+    blocker.write_bytes(b'')
+    cache_dir = str(blocker / 'int8')
+
+    model = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(0), cache_dir)
+    expected = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(0))
+    assert_same_outputs(outputs_of(expected), outputs_of(model))
+    assert not os.path.exists(cache_dir)
+
+
+def test_failed_save_leaves_no_cache(tiny_scorer_factory, checkpoint, monkeypatch):
+    def read_only_save(obj, path, *args, **kwargs):
+        with open(path, 'wb') as f:
+            f.write(b'partial')
+        raise PermissionError(13, 'Read-only file system', path)
+
+    monkeypatch.setattr(torch, 'save', read_only_save)
+    model = load_quantized_scorer(checkpoint, lambda: tiny_scorer_factory(0))
+
+    cache_path = quantized_cache_path(checkpoint)
+    assert not os.path.exists(cache_path)
+    assert not os.path.exists(cache_path + '.tmp')
+    assert outputs_of(model).keys()
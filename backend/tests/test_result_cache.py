@@ -0,0 +1,257 @@
+import threading
+import time
+
+import pytest
+
+import result_cache
+from result_cache import PersistentResultStore, ResultCache, cached_sha256, sha256_file
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PersistentResultStore(str(tmp_path), max_bytes=10_000)
+    yield store
+    store.close()
+
+
+# ----------------------------------------------------------------------
+# ResultCache
+# ----------------------------------------------------------------------
+
+def test_key_combines_fingerprint_and_image_hash():
+    cache = ResultCache('fp1')
+    assert cache.key(b'abc') == cache.key(b'abc')
+    assert cache.key(b'abc') != cache.key(b'abd')
+    assert cache.key(b'abc') != ResultCache('fp2').key(b'abc')
+    assert cache.key(b'abc').startswith('fp1:')
+
+
+def test_lru_eviction():
+    cache = ResultCache('fp', max_entries=2, ttl_seconds=0)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == (True, 1)      # a is now most recently used
+    cache.put('c', 3)
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    cache = ResultCache('fp', ttl_seconds=10)
+    cache.put('a', 1)
+
+    now[0] += 9
+    assert cache.get('a') == (True, 1)
+    now[0] += 2
+    assert cache.get('a') == (False, None)
+    assert cache.stats()['expirations'] == 1
+
+
+def test_get_or_compute_computes_once_and_caches():
+    cache = ResultCache('fp')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_compute('k', compute) == ('value', True)
+    assert cache.get_or_compute('k', compute) == ('value', False)
+    assert len(calls) == 1
+
+
+def test_concurrent_identical_requests_are_collapsed():
+    cache = ResultCache('fp')
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+    owner.start()
+    assert started.wait(5)
+
+    future, is_owner = cache.claim('k')
+    assert not is_owner and not future.done()
+    release.set()
+    owner.join(5)
+
+    assert future.result(timeout=5) == 42
+    assert results == [(42, True)]
+    assert len(calls) == 1
+    assert cache.stats()['collapsed'] == 1
+
+
+def test_collapsed_wait_is_bounded():
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+
+    cache = ResultCache('fp', wait_timeout_s=0.05)
+    future, is_owner = cache.claim('k')
+    assert is_owner
+
+    started = time.monotonic()
+    with pytest.raises(FutureTimeoutError):
+        cache.get_or_compute('k', lambda: pytest.fail('computed a claimed key'))
+    assert time.monotonic() - started < 5
+
+    # The owner can still finish; later callers get its result
+    cache.resolve('k', 7)
+    assert cache.get_or_compute('k', lambda: pytest.fail('recomputed')) == (7, False)
+
+
+def test_claim_resolve_and_fail():
+    cache = ResultCache('fp')
+    future, is_owner = cache.claim('k')
+    assert is_owner
+    waiter, waiter_owns = cache.claim('k')
+    assert not waiter_owns and waiter is future
+
+    cache.fail('k', ValueError('boom'))
+    with pytest.raises(ValueError):
+        waiter.result(timeout=1)
+    # Errors are not cached: the next caller owns the key again
+    future, is_owner = cache.claim('k')
+    assert is_owner
+
+    cache.resolve('k', 'ok')
+    assert future.result(timeout=1) == 'ok'
+    done, is_owner = cache.claim('k')
+    assert not is_owner and done.result(timeout=1) == 'ok'
+
+
+def test_compute_errors_propagate_and_are_not_cached():
+    cache = ResultCache('fp')
+
+    def broken():
+        raise RuntimeError('nope')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('k', broken)
+    assert cache.get_or_compute('k', lambda: 1) == (1, True)
+
+
+# ----------------------------------------------------------------------
+# PersistentResultStore
+# ----------------------------------------------------------------------
+
+def test_store_round_trip_survives_reopen(tmp_path):
+    store = PersistentResultStore(str(tmp_path))
+    store.put('fp:a', [[1, 2, 3, 4], {'total_score_0_100': 90.0}])
+    store.close()
+
+    reopened = PersistentResultStore(str(tmp_path))
+    try:
+        assert reopened.get('fp:a') == (True, [[1, 2, 3, 4], {'total_score_0_100': 90.0}])
+        assert reopened.get('fp:b') == (False, None)
+    finally:
+        reopened.close()
+
+
+def test_store_evicts_least_recently_used_down_to_90_percent(tmp_path):
+    store = PersistentResultStore(str(tmp_path), max_bytes=1000, evict_every=1)
+    try:
+        payload = 'x' * 98          # json.dumps adds the quotes: 100 bytes
+        for i in range(10):
+            store.put(f'fp:{i}', payload)
+            time.sleep(0.002)
+        assert store.stats()['payload_bytes'] == 1000
+
+        store.get('fp:0')           # touch the oldest entry
+        store.put('fp:10', payload)
+
+        stats = store.stats()
+        assert stats['payload_bytes'] <= 900
+        assert store.get('fp:0')[0]
+        assert not store.get('fp:1')[0]
+        assert store.get('fp:10')[0]
+    finally:
+        store.close()
+
+
+def test_compact_drops_other_fingerprints(store):
+    store.put('old:a', 1)
+    store.put('new:a', 2)
+    store.put('new:b', 3)
+
+    report = store.compact(keep_fingerprint='new')
+
+    assert report['stale_dropped'] == 1
+    assert store.get('old:a') == (False, None)
+    assert store.get('new:a') == (True, 2)
+    assert store.stats()['entries'] == 2
+
+
+def test_cache_falls_back_to_and_writes_through_the_store(store):
+    cache = ResultCache('fp', store=store)
+    cache.put('fp:a', 1)
+    assert store.get('fp:a') == (True, 1)
+
+    fresh = ResultCache('fp', store=store)
+    assert fresh.get('fp:a') == (True, 1)
+    assert fresh.stats()['store_hits'] == 1
+
+
+def test_warm_loads_most_recent_entries_of_this_model(store):
+    for i in range(5):
+        store.put(f'fp:{i}', i)
+        time.sleep(0.002)
+    store.put('other:x', 'x')
+
+    cache = ResultCache('fp', max_entries=3, store=store)
+    assert cache.warm() == 3
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['store_hits'] == 0
+    # The three most recent entries are in memory
+    assert [cache._lookup_locked(f'fp:{i}')[0] for i in range(5)] == [False, False, True, True, True]
+
+
+def test_lazy_fingerprint_compacts_and_warms_once(store):
+    store.put('old:a', 'stale')
+    store.put('fp:a', 'fresh')
+    calls = []
+
+    def fingerprint():
+        calls.append(1)
+        return 'fp'
+
+    cache = ResultCache(fingerprint, store=store)
+    assert cache.stats()['model_fingerprint'] is None
+    assert not calls
+
+    assert cache.key(b'img').startswith('fp:')
+    assert cache.key(b'img').startswith('fp:')
+    assert len(calls) == 1
+    assert store.get('old:a') == (False, None)
+    assert cache.stats()['entries'] == 1
+
+
+# ----------------------------------------------------------------------
+# File digests
+# ----------------------------------------------------------------------
+
+def test_cached_sha256_is_reused_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / 'model.bin'
+    path.write_bytes(b'weights v1')
+    digest = cached_sha256(str(path))
+    assert digest == sha256_file(str(path))
+    assert (tmp_path / 'model.bin.sha256-cache').exists()
+
+    # Another process: nothing in memory, the on-disk cache is used
+    result_cache._digests.clear()
+    monkeypatch.setattr(result_cache, 'sha256_file', lambda p: pytest.fail('file was re-hashed'))
+    assert cached_sha256(str(path)) == digest
+
+    monkeypatch.undo()
+    path.write_bytes(b'weights version 2')
+    assert cached_sha256(str(path)) == sha256_file(str(path)) != digest
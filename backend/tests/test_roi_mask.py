@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+Image = pytest.importorskip('PIL.Image')
+pytest.importorskip('torch')
+pytest.importorskip('torchvision')
+
+from inference_utils import upsample_mask_roi
+
+# PIL accumulates NEAREST sample coordinates in floating point, so an isolated
+# pixel exactly on a sampling boundary may land on the neighbouring source pixel
+MAX_MISMATCH = 1e-3
+
+
+def full_frame_reference(mask, H, W, roi, out_size=(224, 224)):
+    """The path upsample_mask_roi replaces: full-image resize -> threshold -> crop -> PIL NEAREST."""
+    x1, y1, x2, y2 = roi
+    full = cv2.resize(mask, (W, H), interpolation=cv2.INTER_NEAREST)
+    crop = ((full > 0.5).astype(np.uint8) * 255)[y1:y2, x1:x2]
+    return np.asarray(Image.fromarray(crop).resize(out_size, Image.NEAREST)) > 127
+
+
+def random_case(rng):
+    src_h, src_w = (int(v) for v in rng.integers(16, 256, size=2))
+    H, W = (int(v) for v in rng.integers(64, 4000, size=2))
+    mask = rng.random((src_h, src_w), dtype=np.float32)
+    return mask, H, W
+
+
+def mismatch(mask, H, W, roi):
+    reference = full_frame_reference(mask, H, W, roi)
+    roi_mask = upsample_mask_roi(mask, H, W, roi)
+    assert roi_mask.shape == (224, 224)
+    assert roi_mask.dtype == np.uint8
+    return float((reference != roi_mask.astype(bool)).mean())
+
+
+def test_random_boxes_match_full_frame_upsample():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        mask, H, W = random_case(rng)
+        x1 = int(rng.integers(0, W - 1))
+        y1 = int(rng.integers(0, H - 1))
+        x2 = int(rng.integers(x1 + 1, W + 1))
+        y2 = int(rng.integers(y1 + 1, H + 1))
+        assert mismatch(mask, H, W, (x1, y1, x2, y2)) <= MAX_MISMATCH
+
+
+def test_boxes_touching_the_image_edges():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        mask, H, W = random_case(rng)
+        x1 = int(rng.integers(0, W // 2))
+        y1 = int(rng.integers(0, H // 2))
+        for roi in ((0, 0, W, H), (0, y1, x1 + 1, H), (x1, 0, W, y1 + 1), (x1, y1, W, H)):
+            assert mismatch(mask, H, W, roi) <= MAX_MISMATCH
+
+
+def test_one_pixel_boxes():
+    rng = np.random.default_rng(2)
+    for _ in range(50):
+        mask, H, W = random_case(rng)
+        x = int(rng.integers(0, W))
+        y = int(rng.integers(0, H))
+        for roi in ((x, y, x + 1, y + 1), (0, 0, 1, 1), (W - 1, H - 1, W, H)):
+            # A single pixel is replicated, so there is no sampling boundary to miss
+            assert mismatch(mask, H, W, roi) == 0.0
+        for roi in ((0, y, W, y + 1), (x, 0, x + 1, H)):
+            assert mismatch(mask, H, W, roi) <= MAX_MISMATCH
+
+
+def test_empty_box_gives_an_empty_mask():
+    mask = np.ones((32, 32), dtype=np.float32)
+    assert not upsample_mask_roi(mask, 100, 100, (10, 10, 10, 50)).any()
+    assert not upsample_mask_roi(mask, 100, 100, (10, 50, 40, 20)).any()
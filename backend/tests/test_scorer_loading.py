@@ -0,0 +1,104 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('cv2')
+pytest.importorskip('transformers')
+
+import inference_utils
+import model_runtime
+from inference_utils import CamelBeautyScorer, load_camel_beauty_scorer
+from model_runtime import ModelRuntime
+from onnx_backend import SCORER_INPUTS, SCORER_OUTPUTS
+
+FEATURE_DIM = 32
+
+TINY_VIT_CONFIG = dict(
+    inference_utils.VIT_BASE_PATCH16_224_CONFIG,
+    hidden_size=32,
+    num_hidden_layers=2,
+    num_attention_heads=2,
+    intermediate_size=64
+)
+
+
+@pytest.fixture
+def reference(monkeypatch):
+    """A normally constructed (randomly initialised) tiny scorer."""
+    monkeypatch.setattr(inference_utils, 'VIT_BASE_PATCH16_224_CONFIG', TINY_VIT_CONFIG)
+    monkeypatch.setattr(model_runtime, 'FEATURE_DIM', FEATURE_DIM)
+    torch.manual_seed(0)
+    return CamelBeautyScorer(feature_dim=FEATURE_DIM, pretrained=False).eval()
+
+
+@pytest.fixture
+def checkpoint(reference, tmp_path):
+    path = tmp_path / 'scorer.pth'
+    torch.save({'model_state_dict': reference.state_dict()}, str(path))
+    return str(path)
+
+
+def random_batch(size=3, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    batch = {}
+    for prefix in ('body', 'face'):
+        batch[f'{prefix}_image'] = torch.randn(size, 3, 224, 224, generator=generator)
+        batch[f'{prefix}_mask'] = (torch.rand(size, 1, 224, 224, generator=generator) > 0.5).float()
+    batch['body_present'] = torch.tensor([True, True, False])[:size]
+    batch['face_present'] = torch.tensor([True, False, True])[:size]
+    return {key: batch[key] for key in SCORER_INPUTS}
+
+
+def assert_same_model(reference, loaded):
+    assert not loaded.training
+    tensors = dict(loaded.named_parameters())
+    tensors.update(loaded.named_buffers())
+    on_meta = [name for name, t in tensors.items() if t.is_meta]
+    assert on_meta == []
+
+    expected = dict(reference.named_parameters())
+    expected.update(reference.named_buffers())
+    assert tensors.keys() == expected.keys()
+    for name, t in expected.items():
+        assert torch.equal(tensors[name], t), name
+
+    batch = random_batch()
+    with torch.no_grad():
+        expected_out = reference(**batch)
+        actual_out = loaded(**batch)
+    # Same weights; only the memory layout (e.g. mmapped views) may differ
+    for name in SCORER_OUTPUTS:
+        assert torch.allclose(actual_out[name], expected_out[name], atol=1e-6), name
+
+
+def test_meta_construction_matches_normal_construction(reference, checkpoint):
+    loaded = load_camel_beauty_scorer(
+        checkpoint, torch.device('cpu'), feature_dim=FEATURE_DIM, verify=False
+    )
+    assert_same_model(reference, loaded)
+
+
+def test_runtime_loads_the_checkpoint_through_meta_construction(reference, checkpoint):
+    runtime = ModelRuntime(scorer_checkpoint_path=checkpoint, device=torch.device('cpu'), warmup=False)
+    assert_same_model(reference, runtime.beauty_scorer_model)
+    assert runtime.status()['effective_scorer_precision'] == 'fp32'
+
+
+def test_runtime_prefers_the_mmapped_safetensors_twin(reference, checkpoint):
+    pytest.importorskip('safetensors')
+    from checkpoint_io import convert_checkpoint_to_safetensors
+
+    safetensors_path = convert_checkpoint_to_safetensors(checkpoint)
+    runtime = ModelRuntime(scorer_checkpoint_path=checkpoint, device=torch.device('cpu'), warmup=False)
+    assert runtime.scorer_weights_path() == safetensors_path
+    assert_same_model(reference, runtime.beauty_scorer_model)
+
+
+def test_checkpoint_missing_weights_is_rejected(reference, tmp_path):
+    state_dict = reference.state_dict()
+    missing = next(iter(state_dict))
+    del state_dict[missing]
+    path = tmp_path / 'partial.pth'
+    torch.save(state_dict, str(path))
+
+    with pytest.raises(RuntimeError, match=missing):
+        load_camel_beauty_scorer(str(path), torch.device('cpu'), feature_dim=FEATURE_DIM, verify=False)
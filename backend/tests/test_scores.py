@@ -0,0 +1,111 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('cv2')
+pytest.importorskip('torchvision')
+
+from inference_utils import (
+    ARABIC_SCORE_LABELS,
+    BEAUTY_ATTRIBUTES,
+    SCORE_WEIGHTS,
+    calculate_beauty_scores_batch
+)
+
+# The batched version reduces in float32 like the loop; only the order of
+# the top-K sum may differ, so scores agree to float32 rounding
+SCORE_ATOL = 1e-4
+
+
+def reference_scores(outputs, num_beauty_classes=10, top_k=10):
+    """The original per-attribute loop, for one (1, C) row of outputs."""
+    scores_dict = {}
+    total_weighted = 0.0
+    for attr in BEAUTY_ATTRIBUTES:
+        probs_full = torch.softmax(outputs[attr], dim=-1)[0]
+        k = min(top_k, num_beauty_classes)
+        top_probs, top_indices = torch.topk(probs_full, k=k, dim=-1)
+        top_probs = top_probs / (top_probs.sum() + 1e-8)
+        expected_idx = (top_probs * top_indices.float()).sum()
+        raw_score = expected_idx.item() + 1.0
+        score_0_100 = (raw_score - 1) / (num_beauty_classes - 1) * 100.0
+        scores_dict[attr] = {
+            'raw_class_score': raw_score,
+            'score_0_100': score_0_100,
+            'label_ar': ARABIC_SCORE_LABELS.get(attr, attr),
+            'top_indices': top_indices.tolist(),
+            'top_probs': top_probs.tolist()
+        }
+        total_weighted += SCORE_WEIGHTS.get(attr, 0.0) * score_0_100
+
+    cat_logits = outputs['category_encoded']
+    cat_pred = int(torch.argmax(cat_logits, dim=-1).item())
+    scores_dict['category_encoded'] = {
+        'predicted_class': cat_pred,
+        'predicted_label': 'Beautiful' if cat_pred == 0 else 'Ugly',
+        'probs': torch.softmax(cat_logits, dim=-1)[0].tolist(),
+        'label_ar': ARABIC_SCORE_LABELS['category_encoded']
+    }
+    return scores_dict, total_weighted, total_weighted / 20.0
+
+
+def make_outputs(batch, num_classes=10, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    outputs = {attr: torch.randn(batch, num_classes, generator=generator) * 3 for attr in BEAUTY_ATTRIBUTES}
+    outputs['category_encoded'] = torch.randn(batch, 2, generator=generator)
+    # Ties: a flat row, duplicated top logits, and a tied category
+    outputs['head_beauty_score'][0] = 0.0
+    outputs['neck_beauty_score'][1, 2:5] = 4.0
+    outputs['body_size_beauty_score'][2, :] = torch.tensor([1.0, 1.0, 2.0, 2.0] * (num_classes // 4) +
+                                                          [0.0] * (num_classes % 4))
+    outputs['category_encoded'][3] = torch.tensor([0.5, 0.5])
+    # Both categories present
+    outputs['category_encoded'][4] = torch.tensor([-2.0, 2.0])
+    outputs['category_encoded'][5] = torch.tensor([2.0, -2.0])
+    return outputs
+
+
+def assert_same(batched, reference):
+    scores, total, stars = batched
+    ref_scores, ref_total, ref_stars = reference
+    assert scores['category_encoded']['predicted_class'] == ref_scores['category_encoded']['predicted_class']
+    assert scores['category_encoded']['predicted_label'] == ref_scores['category_encoded']['predicted_label']
+    assert scores['category_encoded']['probs'] == pytest.approx(ref_scores['category_encoded']['probs'], abs=1e-6)
+
+    for attr in BEAUTY_ATTRIBUTES:
+        got, want = scores[attr], ref_scores[attr]
+        assert got['label_ar'] == want['label_ar']
+        assert got['score_0_100'] == pytest.approx(want['score_0_100'], abs=SCORE_ATOL)
+        assert got['raw_class_score'] == pytest.approx(want['raw_class_score'], abs=SCORE_ATOL)
+        # Tied classes may come out of topk in another order; as pairs they match
+        got_pairs = sorted(zip(got['top_indices'], got['top_probs']))
+        want_pairs = sorted(zip(want['top_indices'], want['top_probs']))
+        assert [i for i, _ in got_pairs] == [i for i, _ in want_pairs]
+        assert [p for _, p in got_pairs] == pytest.approx([p for _, p in want_pairs], abs=1e-6)
+    assert total == pytest.approx(ref_total, abs=SCORE_ATOL)
+    assert stars == pytest.approx(ref_stars, abs=SCORE_ATOL / 20)
+
+
+@pytest.mark.parametrize('top_k', [1, 3, 10, 20])
+@pytest.mark.parametrize('batch', [6, 17])
+def test_batch_matches_per_attribute_loop(batch, top_k):
+    outputs = make_outputs(batch, seed=batch + top_k)
+    batched = calculate_beauty_scores_batch(outputs, top_k=top_k)
+    assert len(batched) == batch
+    for b in range(batch):
+        row = {name: logits[b:b + 1] for name, logits in outputs.items()}
+        assert_same(batched[b], reference_scores(row, top_k=top_k))
+
+
+def test_other_class_count():
+    outputs = make_outputs(6, num_classes=5, seed=3)
+    batched = calculate_beauty_scores_batch(outputs, num_beauty_classes=5, top_k=3)
+    for b in range(6):
+        row = {name: logits[b:b + 1] for name, logits in outputs.items()}
+        assert_same(batched[b], reference_scores(row, num_beauty_classes=5, top_k=3))
+
+
+def test_categories_selected_per_row():
+    batched = calculate_beauty_scores_batch(make_outputs(6))
+    assert batched[3][0]['category_encoded']['predicted_class'] == 0     # tie -> first class
+    assert batched[4][0]['category_encoded']['predicted_label'] == 'Ugly'
+    assert batched[5][0]['category_encoded']['predicted_label'] == 'Beautiful'